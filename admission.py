@@ -0,0 +1,218 @@
+"""
+Ограничение одновременных генераций (admission control)
+
+Генерация архива нагружает CPU и память: если пустить все запросы сразу, все они
+идут медленно и процесс может исчерпать память. Лимитер пропускает не больше
+ADMISSION_CONCURRENCY единиц работы одновременно, остальные запросы ждут в
+ограниченной очереди (по порядку поступления). Если очередь полна или место не
+освободилось за ADMISSION_MAX_WAIT секунд, запрос сразу получает 503 с Retry-After.
+
+Вес запроса — число должников (1, в пакете — сколько есть) плюс число кредиторов /
+ADMISSION_CREDITORS_PER_UNIT, но не больше всей емкости: самый тяжелый запрос
+выполняется один.
+
+Задачи (?async=1) занимают те же единицы, но ждут без отказа в своей очереди: она
+не входит в ADMISSION_QUEUE и не вызывает 503 у синхронных запросов. Синхронные
+запросы (клиент ждет ответа) идут первыми; задача получает свободные единицы,
+когда их очередь пуста, или раньше запросов, если сама ждет дольше
+ADMISSION_MAX_WAIT — так задачи не голодают при постоянной нагрузке.
+
+Лимит действует в каждом процессе gunicorn отдельно. Чтобы лишние запросы получали
+503 быстро, потоков процесса (WEB_THREADS) должно быть больше, чем
+ADMISSION_CONCURRENCY + ADMISSION_QUEUE: иначе они ждут свободного потока в gunicorn.
+
+Настройки окружения:
+  ADMISSION_CONCURRENCY         — единиц работы одновременно (0 — без ограничения)
+  ADMISSION_QUEUE               — запросов в очереди ожидания
+  ADMISSION_MAX_WAIT            — максимальное ожидание в очереди, секунды
+  ADMISSION_CREDITORS_PER_UNIT  — кредиторов на одну дополнительную единицу веса
+"""
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import Counter, Gauge, Histogram, registry
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_CONCURRENCY = int(os.environ.get('ADMISSION_CONCURRENCY', '2'))
+ADMISSION_QUEUE = int(os.environ.get('ADMISSION_QUEUE', '4'))
+ADMISSION_MAX_WAIT = float(os.environ.get('ADMISSION_MAX_WAIT', '5'))
+ADMISSION_CREDITORS_PER_UNIT = int(os.environ.get('ADMISSION_CREDITORS_PER_UNIT', '100'))
+
+IN_FLIGHT = registry.register(Gauge(
+    'bankruptcy_admission_in_flight', 'Занятые единицы работы (генерации, которые выполняются сейчас)'))
+QUEUE_DEPTH = registry.register(Gauge(
+    'bankruptcy_admission_queue_depth', 'Запросы в очереди ожидания генерации'))
+JOBS_WAITING = registry.register(Gauge(
+    'bankruptcy_admission_jobs_waiting', 'Задачи (?async=1), ожидающие генерации'))
+WAIT_SECONDS = registry.register(Histogram(
+    'bankruptcy_admission_wait_seconds', 'Ожидание в очереди перед генерацией',
+    ('route',)))
+REJECTED = registry.register(Counter(
+    'bankruptcy_admission_rejected_total', 'Запросы, отклоненные с 503 (reason: queue_full, timeout)',
+    ('route', 'reason')))
+
+
+class Overloaded(Exception):
+    """Генерация не допущена: очередь полна или ожидание превысило лимит"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Slot:
+    """Занятые единицы работы; release() можно вызывать несколько раз"""
+
+    def __init__(self, limiter, weight):
+        self._limiter = limiter
+        self._weight = weight
+
+    def release(self):
+        weight, self._weight = self._weight, 0
+        if weight:
+            self._limiter._release(weight)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class _Ticket:
+    """Место в очереди ожидания"""
+
+    __slots__ = ('since',)
+
+    def __init__(self, since):
+        self.since = since
+
+
+class AdmissionLimiter:
+    """
+    Ограниченная по весу параллельность с очередями ожидания FIFO: запросов
+    (ограничена) и задач (без ограничения, см. описание модуля)
+
+    capacity — единиц работы одновременно (0 — без ограничения), queue_size — мест
+    в очереди, max_wait — сколько ждать, секунд
+    """
+
+    def __init__(self, capacity=ADMISSION_CONCURRENCY, queue_size=ADMISSION_QUEUE,
+                 max_wait=ADMISSION_MAX_WAIT, creditors_per_unit=ADMISSION_CREDITORS_PER_UNIT):
+        self.capacity = capacity
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.creditors_per_unit = creditors_per_unit
+        self.retry_after = max(1, math.ceil(max_wait))
+        self._in_flight = 0
+        self._waiters = deque()
+        self._job_waiters = deque()
+        self._condition = threading.Condition()
+
+    def weight(self, creditors=0, debtors=1):
+        """Вес запроса по числу должников (пакет) и кредиторов"""
+        if not self.capacity:
+            return 0
+        return min(self.capacity, debtors + creditors // max(1, self.creditors_per_unit))
+
+    def acquire(self, weight, route='-', bounded=True):
+        """
+        Ждет свободных единиц и возвращает Slot
+        bounded=False — ждать в очереди задач без ограничения длины и времени (клиент
+        не ждет ответа, число задач ограничено JOB_WORKERS); иначе Overloaded
+        """
+        if not self.capacity:
+            return Slot(self, 0)
+
+        start = time.perf_counter()
+        slot = self._acquire(weight, route, bounded, start)
+        WAIT_SECONDS.observe(time.perf_counter() - start, route=route)
+        return slot
+
+    def _acquire(self, weight, route, bounded, start):
+        with self._condition:
+            queue = self._waiters if bounded else self._job_waiters
+            ticket = _Ticket(start)
+            queue.append(ticket)
+            try:
+                if not self._turn(ticket, weight, bounded, start):
+                    if bounded and len(queue) > self.queue_size:
+                        raise self._rejected(route, 'queue_full')
+                    self._update_depth()
+                    deadline = start + self.max_wait if bounded else None
+                    while True:
+                        now = time.perf_counter()
+                        if self._turn(ticket, weight, bounded, now):
+                            break
+                        if deadline is None:
+                            # Задача перестает уступать запросам через max_wait после постановки
+                            overdue = ticket.since + self.max_wait - now
+                            timeout = overdue if overdue > 0 else None
+                        else:
+                            timeout = deadline - now
+                            if timeout <= 0:
+                                raise self._rejected(route, 'timeout')
+                        self._condition.wait(timeout)
+            finally:
+                queue.remove(ticket)
+                self._update_depth()
+                if self._waiters or self._job_waiters:
+                    # Следующий в очереди мог ждать только того, чтобы этот ушел из головы
+                    self._condition.notify_all()
+
+            self._admit(weight)
+            return Slot(self, weight)
+
+    def _turn(self, ticket, weight, bounded, now):
+        # Вызывается под блокировкой: ticket в голове своей очереди и его очередь сейчас
+        if self._in_flight + weight > self.capacity:
+            return False
+        job_overdue = bool(self._job_waiters) and now - self._job_waiters[0].since >= self.max_wait
+        if bounded:
+            return self._waiters[0] is ticket and not job_overdue
+        return self._job_waiters[0] is ticket and (not self._waiters or job_overdue)
+
+    def _update_depth(self):
+        QUEUE_DEPTH.set(len(self._waiters))
+        JOBS_WAITING.set(len(self._job_waiters))
+
+    def check(self, route='-'):
+        """
+        Быстрый отказ до разбора запроса: Overloaded, если очередь запросов уже полна
+        (место не резервируется — его занимает acquire; задачи здесь не учитываются)
+        """
+        if not self.capacity:
+            return
+        with self._condition:
+            if len(self._waiters) < self.queue_size:
+                return
+            raise self._rejected(route, 'queue_full')
+
+    def _admit(self, weight):
+        # Вызывается под блокировкой
+        self._in_flight += weight
+        IN_FLIGHT.set(self._in_flight)
+
+    def _rejected(self, route, reason):
+        # Вызывается под блокировкой: учитывает отказ и возвращает исключение
+        REJECTED.inc(route=route, reason=reason)
+        registry.changed()
+        logger.warning("Генерация отклонена (%s): занято %d из %d, в очереди %d",
+                       reason, self._in_flight, self.capacity, len(self._waiters))
+        return Overloaded(reason, self.retry_after)
+
+    def _release(self, weight):
+        with self._condition:
+            self._in_flight -= weight
+            IN_FLIGHT.set(self._in_flight)
+            self._condition.notify_all()
+        registry.changed()
+
+
+admission = AdmissionLimiter()
@@ -1,627 +1,71 @@
-from flask import Flask, render_template, request, send_file, flash, redirect, url_for
-from docx import Document
+from flask import Flask, Response, g, has_request_context, render_template, request, session, flash, redirect, send_file, url_for, jsonify
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 import io
+import json
+import logging
 import os
 import copy
-import zipfile
-import re
+import threading
+
+from docx.oxml.ns import qn
+
+from admission import Overloaded, admission
+from archive import archive_response, build_archive
+from courts import resolve_court, resolve_many
+from jobs import DONE, job_queue
+from logs import configure_logging, new_request_id, request_id
+from metrics import CREDITORS, DOCUMENTS, FAILURES, StageTimer, registry, server_timing_header, stage
+from page_cache import page_cache
+from payload import Errors, PayloadError, iter_csv_rows, json_creditors, read_creditors, read_debtor
+from placeholders import compile_replacements, part_roots, replace_in_runs_preserve_formatting
+from result_cache import build_result_cache, document_cache_key
+from template_cache import template_cache
+from template_snapshot import warm_start
+from template_watcher import TemplateWatcher
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # В продакшене используйте настоящий секретный ключ
 
-# Словарь всех 89 субъектов РФ с арбитражными судами
-RUSSIAN_REGIONS_COURTS = {
-    # Республики
-    "Республика Адыгея": {
-        "nominative": "Арбитражный суд Республики Адыгея",
-        "genitive": "Арбитражного суда Республики Адыгея",
-        "pattern": r"Республик[аеуы]\s+Адыге[яюйи]|Адыге[яюйи]"
-    },
-    "Республика Алтай": {
-        "nominative": "Арбитражный суд Республики Алтай",
-        "genitive": "Арбитражного суда Республики Алтай",
-        "pattern": r"Республик[аеуы]\s+Алтай\b"
-    },
-    "Республика Башкортостан": {
-        "nominative": "Арбитражный суд Республики Башкортостан",
-        "genitive": "Арбитражного суда Республики Башкортостан",
-        "pattern": r"Республик[аеуы]\s+Башкортостан|Башкортостан|Башкири[яюйи]"
-    },
-    "Республика Бурятия": {
-        "nominative": "Арбитражный суд Республики Бурятия",
-        "genitive": "Арбитражного суда Республики Бурятия",
-        "pattern": r"Республик[аеуы]\s+Буряти[яюйи]|Буряти[яюйи]"
-    },
-    "Республика Дагестан": {
-        "nominative": "Арбитражный суд Республики Дагестан",
-        "genitive": "Арбитражного суда Республики Дагестан",
-        "pattern": r"Республик[аеуы]\s+Дагестан|Дагестан"
-    },
-    "Республика Ингушетия": {
-        "nominative": "Арбитражный суд Республики Ингушетия",
-        "genitive": "Арбитражного суда Республики Ингушетия",
-        "pattern": r"Республик[аеуы]\s+Ингушети[яюйи]|Ингушети[яюйи]"
-    },
-    "Кабардино-Балкарская Республика": {
-        "nominative": "Арбитражный суд Кабардино-Балкарской Республики",
-        "genitive": "Арбитражного суда Кабардино-Балкарской Республики",
-        "pattern": r"Кабардино[-\s]?Балкарск[ауеоий]|КБР"
-    },
-    "Республика Калмыкия": {
-        "nominative": "Арбитражный суд Республики Калмыкия",
-        "genitive": "Арбитражного суда Республики Калмыкия",
-        "pattern": r"Республик[аеуы]\s+Калмыки[яюйи]|Калмыки[яюйи]"
-    },
-    "Карачаево-Черкесская Республика": {
-        "nominative": "Арбитражный суд Карачаево-Черкесской Республики",
-        "genitive": "Арбитражного суда Карачаево-Черкесской Республики",
-        "pattern": r"Карачаево[-\s]?Черкесск[ауеоий]|КЧР"
-    },
-    "Республика Карелия": {
-        "nominative": "Арбитражный суд Республики Карелия",
-        "genitive": "Арбитражного суда Республики Карелия",
-        "pattern": r"Республик[аеуы]\s+Карели[яюйи]|Карели[яюйи]"
-    },
-    "Республика Коми": {
-        "nominative": "Арбитражный суд Республики Коми",
-        "genitive": "Арбитражного суда Республики Коми",
-        "pattern": r"Республик[аеуы]\s+Коми\b"
-    },
-    "Республика Крым": {
-        "nominative": "Арбитражный суд Республики Крым",
-        "genitive": "Арбитражного суда Республики Крым",
-        "pattern": r"Республик[аеуы]\s+Крым\b"
-    },
-    "Республика Марий Эл": {
-        "nominative": "Арбитражный суд Республики Марий Эл",
-        "genitive": "Арбитражного суда Республики Марий Эл",
-        "pattern": r"Республик[аеуы]\s+Марий\s+Эл|Марий\s+Эл"
-    },
-    "Республика Мордовия": {
-        "nominative": "Арбитражный суд Республики Мордовия",
-        "genitive": "Арбитражного суда Республики Мордовия",
-        "pattern": r"Республик[аеуы]\s+Мордови[яюйи]|Мордови[яюйи]"
-    },
-    "Республика Саха (Якутия)": {
-        "nominative": "Арбитражный суд Республики Саха (Якутия)",
-        "genitive": "Арбитражного суда Республики Саха (Якутия)",
-        "pattern": r"Республик[аеуы]\s+Саха|Якути[яюйи]|Саха"
-    },
-    "Республика Северная Осетия - Алания": {
-        "nominative": "Арбитражный суд Республики Северная Осетия - Алания",
-        "genitive": "Арбитражного суда Республики Северная Осетия - Алания",
-        "pattern": r"Северн[ауеоий]\s+Осети[яюйи]|Алани[яюйи]|РСО[-\s]?Алани[яюйи]"
-    },
-    "Республика Татарстан": {
-        "nominative": "Арбитражный суд Республики Татарстан",
-        "genitive": "Арбитражного суда Республики Татарстан",
-        "pattern": r"Республик[аеуы]\s+Татарстан|Татарстан"
-    },
-    "Республика Тыва": {
-        "nominative": "Арбитражный суд Республики Тыва",
-        "genitive": "Арбитражного суда Республики Тыва",
-        "pattern": r"Республик[аеуы]\s+Тыв[ауы]|Тыв[ауы]|Тув[ауы]"
-    },
-    "Удмуртская Республика": {
-        "nominative": "Арбитражный суд Удмуртской Республики",
-        "genitive": "Арбитражного суда Удмуртской Республики",
-        "pattern": r"Удмуртск[ауеоий]\s+Республик|Удмурти[яюйи]"
-    },
-    "Республика Хакасия": {
-        "nominative": "Арбитражный суд Республики Хакасия",
-        "genitive": "Арбитражного суда Республики Хакасия",
-        "pattern": r"Республик[аеуы]\s+Хакаси[яюйи]|Хакаси[яюйи]"
-    },
-    "Чеченская Республика": {
-        "nominative": "Арбитражный суд Чеченской Республики",
-        "genitive": "Арбитражного суда Чеченской Республики",
-        "pattern": r"Чеченск[ауеоий]\s+Республик|Чечн[яюйи]|Чечен"
-    },
-    "Чувашская Республика": {
-        "nominative": "Арбитражный суд Чувашской Республики",
-        "genitive": "Арбитражного суда Чувашской Республики",
-        "pattern": r"Чувашск[ауеоий]\s+Республик|Чуваш[иі][яюйи]"
-    },
-    # Края
-    "Алтайский край": {
-        "nominative": "Арбитражный суд Алтайского края",
-        "genitive": "Арбитражного суда Алтайского края",
-        "pattern": r"(?:^|,\s*)Алтайск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
-    },
-    "Забайкальский край": {
-        "nominative": "Арбитражный суд Забайкальского края",
-        "genitive": "Арбитражного суда Забайкальского края",
-        "pattern": r"(?:^|,\s*)Забайкальск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
-    },
-    "Камчатский край": {
-        "nominative": "Арбитражный суд Камчатского края",
-        "genitive": "Арбитражного суда Камчатского края",
-        "pattern": r"(?:^|,\s*)Камчатск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
-    },
-    "Краснодарский край": {
-        "nominative": "Арбитражный суд Краснодарского края",
-        "genitive": "Арбитражного суда Краснодарского края",
-        "pattern": r"(?:^|,\s*)Краснодарск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
-    },
-    "Красноярский край": {
-        "nominative": "Арбитражный суд Красноярского края",
-        "genitive": "Арбитражного суда Красноярского края",
-        "pattern": r"(?:^|,\s*)Красноярск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
-    },
-    "Пермский край": {
-        "nominative": "Арбитражный суд Пермского края",
-        "genitive": "Арбитражного суда Пермского края",
-        "pattern": r"(?:^|,\s*)Пермск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
-    },
-    "Приморский край": {
-        "nominative": "Арбитражный суд Приморского края",
-        "genitive": "Арбитражного суда Приморского края",
-        "pattern": r"(?:^|,\s*)Приморск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
-    },
-    "Ставропольский край": {
-        "nominative": "Арбитражный суд Ставропольского края",
-        "genitive": "Арбитражного суда Ставропольского края",
-        "pattern": r"(?:^|,\s*)Ставропольск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
-    },
-    "Хабаровский край": {
-        "nominative": "Арбитражный суд Хабаровского края",
-        "genitive": "Арбитражного суда Хабаровского края",
-        "pattern": r"(?:^|,\s*)Хабаровск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
-    },
-    # Области
-    "Амурская область": {
-        "nominative": "Арбитражный суд Амурской области",
-        "genitive": "Арбитражного суда Амурской области",
-        "pattern": r"(?:^|,\s*)Амурск[ауеоий](?:[,\s]+область)?"
-    },
-    "Архангельская область": {
-        "nominative": "Арбитражный суд Архангельской области",
-        "genitive": "Арбитражного суда Архангельской области",
-        "pattern": r"(?:^|,\s*)Архангельск[ауеоий](?:[,\s]+область)?"
-    },
-    "Астраханская область": {
-        "nominative": "Арбитражный суд Астраханской области",
-        "genitive": "Арбитражного суда Астраханской области",
-        "pattern": r"(?:^|,\s*)Астраханск[ауеоий](?:[,\s]+область)?"
-    },
-    "Белгородская область": {
-        "nominative": "Арбитражный суд Белгородской области",
-        "genitive": "Арбитражного суда Белгородской области",
-        "pattern": r"(?:^|,\s*)Белгородск[ауеоий](?:[,\s]+область)?"
-    },
-    "Брянская область": {
-        "nominative": "Арбитражный суд Брянской области",
-        "genitive": "Арбитражного суда Брянской области",
-        "pattern": r"(?:^|,\s*)Брянск[ауеоий](?:[,\s]+область)?"
-    },
-    "Владимирская область": {
-        "nominative": "Арбитражный суд Владимирской области",
-        "genitive": "Арбитражного суда Владимирской области",
-        "pattern": r"(?:^|,\s*)Владимирск[ауеоий](?:[,\s]+область)?"
-    },
-    "Волгоградская область": {
-        "nominative": "Арбитражный суд Волгоградской области",
-        "genitive": "Арбитражного суда Волгоградской области",
-        "pattern": r"(?:^|,\s*)Волгоградск[ауеоий](?:[,\s]+область)?"
-    },
-    "Вологодская область": {
-        "nominative": "Арбитражный суд Вологодской области",
-        "genitive": "Арбитражного суда Вологодской области",
-        "pattern": r"(?:^|,\s*)Вологодск[ауеоий](?:[,\s]+область)?"
-    },
-    "Воронежская область": {
-        "nominative": "Арбитражный суд Воронежской области",
-        "genitive": "Арбитражного суда Воронежской области",
-        "pattern": r"(?:^|,\s*)Воронежск[ауеоий](?:[,\s]+область)?"
-    },
-    "Ивановская область": {
-        "nominative": "Арбитражный суд Ивановской области",
-        "genitive": "Арбитражного суда Ивановской области",
-        "pattern": r"(?:^|,\s*)Ивановск[ауеоий](?:[,\s]+область)?"
-    },
-    "Иркутская область": {
-        "nominative": "Арбитражный суд Иркутской области",
-        "genitive": "Арбитражного суда Иркутской области",
-        "pattern": r"(?:^|,\s*)Иркутск[ауеоий](?:[,\s]+область)?"
-    },
-    "Калининградская область": {
-        "nominative": "Арбитражный суд Калининградской области",
-        "genitive": "Арбитражного суда Калининградской области",
-        "pattern": r"(?:^|,\s*)Калининградск[ауеоий](?:[,\s]+область)?"
-    },
-    "Калужская область": {
-        "nominative": "Арбитражный суд Калужской области",
-        "genitive": "Арбитражного суда Калужской области",
-        "pattern": r"(?:^|,\s*)Калужск[ауеоий](?:[,\s]+область)?"
-    },
-    "Кемеровская область": {
-        "nominative": "Арбитражный суд Кемеровской области",
-        "genitive": "Арбитражного суда Кемеровской области",
-        "pattern": r"(?:^|,\s*)(?:Кемеровск[ауеоий](?:[,\s]+область)?|Кузбасс)"
-    },
-    "Кировская область": {
-        "nominative": "Арбитражный суд Кировской области",
-        "genitive": "Арбитражного суда Кировской области",
-        "pattern": r"(?:^|,\s*)Кировск[ауеоий](?:[,\s]+область)?"
-    },
-    "Костромская область": {
-        "nominative": "Арбитражный суд Костромской области",
-        "genitive": "Арбитражного суда Костромской области",
-        "pattern": r"(?:^|,\s*)Костромск[ауеоий](?:[,\s]+область)?"
-    },
-    "Курганская область": {
-        "nominative": "Арбитражный суд Курганской области",
-        "genitive": "Арбитражного суда Курганской области",
-        "pattern": r"(?:^|,\s*)Курганск[ауеоий](?:[,\s]+область)?"
-    },
-    "Курская область": {
-        "nominative": "Арбитражный суд Курской области",
-        "genitive": "Арбитражного суда Курской области",
-        "pattern": r"(?:^|,\s*)Курск[ауеоий](?:[,\s]+область)?"
-    },
-    "Ленинградская область": {
-        "nominative": "Арбитражный суд Ленинградской области",
-        "genitive": "Арбитражного суда Ленинградской области",
-        "pattern": r"(?:^|,\s*)Ленинградск[ауеоий](?:[,\s]+область)?"
-    },
-    "Липецкая область": {
-        "nominative": "Арбитражный суд Липецкой области",
-        "genitive": "Арбитражного суда Липецкой области",
-        "pattern": r"(?:^|,\s*)Липецк[ауеоий](?:[,\s]+область)?"
-    },
-    "Магаданская область": {
-        "nominative": "Арбитражный суд Магаданской области",
-        "genitive": "Арбитражного суда Магаданской области",
-        "pattern": r"(?:^|,\s*)Магаданск[ауеоий](?:[,\s]+область)?"
-    },
-    "Московская область": {
-        "nominative": "Арбитражный суд Московской области",
-        "genitive": "Арбитражного суда Московской области",
-        "pattern": r"(?:^|,\s*)(?:Московск[ауеоий](?:[,\s]+область)?|Подмосковье)"
-    },
-    "Мурманская область": {
-        "nominative": "Арбитражный суд Мурманской области",
-        "genitive": "Арбитражного суда Мурманской области",
-        "pattern": r"(?:^|,\s*)Мурманск[ауеоий](?:[,\s]+область)?"
-    },
-    "Нижегородская область": {
-        "nominative": "Арбитражный суд Нижегородской области",
-        "genitive": "Арбитражного суда Нижегородской области",
-        "pattern": r"(?:^|,\s*)Нижегородск[ауеоий](?:[,\s]+область)?"
-    },
-    "Новгородская область": {
-        "nominative": "Арбитражный суд Новгородской области",
-        "genitive": "Арбитражного суда Новгородской области",
-        "pattern": r"(?:^|,\s*)Новгородск[ауеоий](?:[,\s]+область)?"
-    },
-    "Новосибирская область": {
-        "nominative": "Арбитражный суд Новосибирской области",
-        "genitive": "Арбитражного суда Новосибирской области",
-        "pattern": r"(?:^|,\s*)Новосибирск[ауеоий](?:[,\s]+область)?"
-    },
-    "Омская область": {
-        "nominative": "Арбитражный суд Омской области",
-        "genitive": "Арбитражного суда Омской области",
-        "pattern": r"(?:^|,\s*)Омск[ауеоий](?:[,\s]+область)?"
-    },
-    "Оренбургская область": {
-        "nominative": "Арбитражный суд Оренбургской области",
-        "genitive": "Арбитражного суда Оренбургской области",
-        "pattern": r"(?:^|,\s*)Оренбургск[ауеоий](?:[,\s]+область)?"
-    },
-    "Орловская область": {
-        "nominative": "Арбитражный суд Орловской области",
-        "genitive": "Арбитражного суда Орловской области",
-        "pattern": r"(?:^|,\s*)Орловск[ауеоий](?:[,\s]+область)?"
-    },
-    "Пензенская область": {
-        "nominative": "Арбитражный суд Пензенской области",
-        "genitive": "Арбитражного суда Пензенской области",
-        "pattern": r"(?:^|,\s*)Пензенск[ауеоий](?:[,\s]+область)?"
-    },
-    "Псковская область": {
-        "nominative": "Арбитражный суд Псковской области",
-        "genitive": "Арбитражного суда Псковской области",
-        "pattern": r"(?:^|,\s*)Псковск[ауеоий](?:[,\s]+область)?"
-    },
-    "Ростовская область": {
-        "nominative": "Арбитражный суд Ростовской области",
-        "genitive": "Арбитражного суда Ростовской области",
-        "pattern": r"(?:^|,\s*)Ростовск[ауеоий](?:[,\s]+область)?"
-    },
-    "Рязанская область": {
-        "nominative": "Арбитражный суд Рязанской области",
-        "genitive": "Арбитражного суда Рязанской области",
-        "pattern": r"(?:^|,\s*)Рязанск[ауеоий](?:[,\s]+область)?"
-    },
-    "Самарская область": {
-        "nominative": "Арбитражный суд Самарской области",
-        "genitive": "Арбитражного суда Самарской области",
-        "pattern": r"(?:^|,\s*)Самарск[ауеоий](?:[,\s]+область)?"
-    },
-    "Саратовская область": {
-        "nominative": "Арбитражный суд Саратовской области",
-        "genitive": "Арбитражного суда Саратовской области",
-        "pattern": r"(?:^|,\s*)Саратовск[ауеоий](?:[,\s]+область)?"
-    },
-    "Сахалинская область": {
-        "nominative": "Арбитражный суд Сахалинской области",
-        "genitive": "Арбитражного суда Сахалинской области",
-        "pattern": r"(?:^|,\s*)Сахалинск[ауеоий](?:[,\s]+область)?"
-    },
-    "Свердловская область": {
-        "nominative": "Арбитражный суд Свердловской области",
-        "genitive": "Арбитражного суда Свердловской области",
-        "pattern": r"(?:^|,\s*)Свердловск[ауеоий](?:[,\s]+область)?"
-    },
-    "Смоленская область": {
-        "nominative": "Арбитражный суд Смоленской области",
-        "genitive": "Арбитражного суда Смоленской области",
-        "pattern": r"(?:^|,\s*)Смоленск[ауеоий](?:[,\s]+область)?"
-    },
-    "Тамбовская область": {
-        "nominative": "Арбитражный суд Тамбовской области",
-        "genitive": "Арбитражного суда Тамбовской области",
-        "pattern": r"(?:^|,\s*)Тамбовск[ауеоий](?:[,\s]+область)?"
-    },
-    "Тверская область": {
-        "nominative": "Арбитражный суд Тверской области",
-        "genitive": "Арбитражного суда Тверской области",
-        "pattern": r"(?:^|,\s*)Тверск[ауеоий](?:[,\s]+область)?"
-    },
-    "Томская область": {
-        "nominative": "Арбитражный суд Томской области",
-        "genitive": "Арбитражного суда Томской области",
-        "pattern": r"(?:^|,\s*)Томск[ауеоий](?:[,\s]+область)?"
-    },
-    "Тульская область": {
-        "nominative": "Арбитражный суд Тульской области",
-        "genitive": "Арбитражного суда Тульской области",
-        "pattern": r"(?:^|,\s*)Тульск[ауеоий](?:[,\s]+область)?"
-    },
-    "Тюменская область": {
-        "nominative": "Арбитражный суд Тюменской области",
-        "genitive": "Арбитражного суда Тюменской области",
-        "pattern": r"(?:^|,\s*)Тюменск[ауеоий](?:[,\s]+область)?"
-    },
-    "Ульяновская область": {
-        "nominative": "Арбитражный суд Ульяновской области",
-        "genitive": "Арбитражного суда Ульяновской области",
-        "pattern": r"(?:^|,\s*)Ульяновск[ауеоий](?:[,\s]+область)?"
-    },
-    "Челябинская область": {
-        "nominative": "Арбитражный суд Челябинской области",
-        "genitive": "Арбитражного суда Челябинской области",
-        "pattern": r"(?:^|,\s*)Челябинск[ауеоий](?:[,\s]+область)?"
-    },
-    "Ярославская область": {
-        "nominative": "Арбитражный суд Ярославской области",
-        "genitive": "Арбитражного суда Ярославской области",
-        "pattern": r"(?:^|,\s*)Ярославск[ауеоий](?:[,\s]+область)?"
-    },
-    # Города федерального значения
-    "Москва": {
-        "nominative": "Арбитражный суд города Москвы",
-        "genitive": "Арбитражного суда города Москвы",
-        "pattern": r"(?:^|,\s*)(?:г\.?\s*)?Москв[ауеы](?!\s*ск[ауеоий])"
-    },
-    "Санкт-Петербург": {
-        "nominative": "Арбитражный суд города Санкт-Петербурга",
-        "genitive": "Арбитражного суда города Санкт-Петербурга",
-        "pattern": r"(?:^|,\s*)(?:г\.?\s*)?(?:Санкт[-\s]?Петербург|СПб|С\.Петербург)"
-    },
-    "Севастополь": {
-        "nominative": "Арбитражный суд города Севастополя",
-        "genitive": "Арбитражного суда города Севастополя",
-        "pattern": r"(?:^|,\s*)(?:г\.?\s*)?Севастопол[ьяюе]"
-    },
-    # Автономная область
-    "Еврейская автономная область": {
-        "nominative": "Арбитражный суд Еврейской автономной области",
-        "genitive": "Арбитражного суда Еврейской автономной области",
-        "pattern": r"Еврейск[ауеоий](?:[,\s]+(?:автономн[ауеоий][,\s]+)?область)?|ЕАО"
-    },
-    # Автономные округа
-    "Ненецкий автономный округ": {
-        "nominative": "Арбитражный суд Ненецкого автономного округа",
-        "genitive": "Арбитражного суда Ненецкого автономного округа",
-        "pattern": r"Ненецк(?:ий|ого)(?:[,\s]+(?:автономн[ыого]+[,\s]+)?округ)?|НАО"
-    },
-    "Ханты-Мансийский автономный округ": {
-        "nominative": "Арбитражный суд Ханты-Мансийского автономного округа - Югры",
-        "genitive": "Арбитражного суда Ханты-Мансийского автономного округа - Югры",
-        "pattern": r"Ханты[-\s]?Мансийск(?:ий|ого)(?:[,\s]+(?:автономн[ыого]+[,\s]+)?округ)?|ХМАО|Югр[ауеы]"
-    },
-    "Чукотский автономный округ": {
-        "nominative": "Арбитражный суд Чукотского автономного округа",
-        "genitive": "Арбитражного суда Чукотского автономного округа",
-        "pattern": r"Чукотск(?:ий|ого)(?:[,\s]+(?:автономн[ыого]+[,\s]+)?округ)?|ЧАО"
-    },
-    "Ямало-Ненецкий автономный округ": {
-        "nominative": "Арбитражный суд Ямало-Ненецкого автономного округа",
-        "genitive": "Арбитражного суда Ямало-Ненецкого автономного округа",
-        "pattern": r"Ямало[-\s]?Ненецк(?:ий|ого)(?:[,\s]+(?:автономн[ыого]+[,\s]+)?округ)?|ЯНАО"
-    },
-}
-
-
-def determine_court_by_address(address):
-    """
-    Определяет арбитражный суд по адресу регистрации
-    Возвращает кортеж (суд в именительном падеже, суд в родительном падеже)
-    """
-    if not address:
-        return ("", "")
-    
-    # Нормализуем адрес для поиска
-    normalized_address = address.strip()
-    
-    # Сортируем регионы по приоритету: сначала более специфичные названия
-    # (например, "Московская область" перед "Москва", "Алтайский край" перед "Республика Алтай")
-    priority_order = []
-    
-    for region_name, court_data in RUSSIAN_REGIONS_COURTS.items():
-        # Определяем приоритет: более длинные и специфичные названия идут первыми
-        if "область" in region_name.lower():
-            priority = 1  # Области - высокий приоритет
-        elif "край" in region_name.lower():
-            priority = 2  # Края
-        elif "автономн" in region_name.lower():
-            priority = 3  # Автономные округа и области
-        elif region_name in ["Москва", "Санкт-Петербург", "Севастополь"]:
-            priority = 5  # Города - низкий приоритет (проверяются после областей)
-        else:
-            priority = 4  # Республики
-        
-        priority_order.append((priority, len(region_name), region_name, court_data))
-    
-    # Сортируем: сначала по приоритету, потом по длине названия (от большего к меньшему)
-    priority_order.sort(key=lambda x: (x[0], -x[1]))
-    
-    # Проходим по отсортированному списку регионов
-    for _, _, region_name, court_data in priority_order:
-        pattern = court_data["pattern"]
-        if re.search(pattern, normalized_address, re.IGNORECASE):
-            print(f"✅ Определен регион: {region_name}")
-            print(f"   Суд (именительный): {court_data['nominative']}")
-            print(f"   Суд (родительный): {court_data['genitive']}")
-            return (court_data["nominative"], court_data["genitive"])
-    
-    # Если регион не определен
-    print(f"⚠️ Не удалось определить регион по адресу: {normalized_address}")
-    return ("", "")
+# Шаблоны, которые загружаются в кэш при старте
+DOCUMENT_TEMPLATES = [
+    "zayav.docx",
+    "list-of-creditors.docx",
+    "properties.docx",
+    "inform-message.docx",
+    "zayavSRO1.docx",
+    "zayavAgreement.docx",
+]
 
-def replace_in_runs_preserve_formatting(paragraph, replacements):
-    """
-    Заменяет плейсхолдеры с максимальным сохранением форматирования
-    """
-    if not paragraph.runs:
-        return
-    
-    # Собираем информацию о каждом символе и его форматировании
-    char_data = []
-    
-    for run in paragraph.runs:
-        for char in run.text:
-            char_data.append({
-                'char': char,
-                'run': run,
-                'font_name': run.font.name,
-                'font_size': run.font.size,
-                'bold': run.font.bold,
-                'italic': run.font.italic,
-                'underline': run.font.underline,
-                'color': run.font.color.rgb if run.font.color.rgb else None
-            })
-    
-    if not char_data:
-        return
-    
-    # Получаем исходный текст
-    original_text = "".join(cd['char'] for cd in char_data)
-    
-    # Выполняем замены
-    new_text = original_text
-    for placeholder, replacement in replacements.items():
-        new_text = new_text.replace(placeholder, replacement)
-    
-    if new_text == original_text:
-        return  # Нет изменений
-    
-    # Удаляем все существующие runs
-    for run in paragraph.runs[:]:
-        paragraph._element.remove(run._element)
-    
-    # Создаем новые runs с сохранением форматирования
-    if not new_text:
-        return
-    
-    # Берем форматирование первого символа как базовое
-    base_formatting = char_data[0] if char_data else None
-    
-    # Создаем новый run с базовым форматированием
-    new_run = paragraph.add_run(new_text)
-    
-    if base_formatting:
-        if base_formatting['font_name']:
-            new_run.font.name = base_formatting['font_name']
-        if base_formatting['font_size']:
-            new_run.font.size = base_formatting['font_size']
-        if base_formatting['bold'] is not None:
-            new_run.font.bold = base_formatting['bold']
-        if base_formatting['italic'] is not None:
-            new_run.font.italic = base_formatting['italic']
-        if base_formatting['underline'] is not None:
-            new_run.font.underline = base_formatting['underline']
-        if base_formatting['color']:
-            new_run.font.color.rgb = base_formatting['color']
-
-
-def add_additional_creditors_to_text(doc, creditors):
+
+def add_additional_creditors_to_text(doc, creditors, creditor_block):
     """
     Добавляет информацию о дополнительных кредиторах в таблицу заявления (шапка документа)
-    ВЫЗЫВАЕТСЯ ПОСЛЕ замены плейсхолдеров, поэтому ищем по названию первого кредитора
+    creditor_block — CreditorBlock шаблона: ячейка найдена при загрузке шаблона,
+    поэтому документ не просматривается и порядок плейсхолдеров не важен
     """
     if len(creditors) <= 1:
         return  # Нет дополнительных кредиторов
-    
-    # Ищем ячейку с информацией о первом кредиторе в таблице (шапка документа)
-    # После замены плейсхолдеров там может быть "Кредитор 1" или название первого кредитора
-    creditor_cell = None
-    first_creditor_name = creditors[0]['name']
-    
-    for table_idx, table in enumerate(doc.tables):
-        for row_idx, row in enumerate(table.rows):
-            for cell_idx, cell in enumerate(row.cells):
-                cell_text = cell.text.strip()
-                # Ищем ячейку с "Кредитор 1" или с названием первого кредитора
-                if ("Кредитор 1" in cell_text or first_creditor_name in cell_text) and len(cell_text) < 300:
-                    creditor_cell = cell
-                    print(f"Найдена ячейка с кредитором в таблице {table_idx}, строка {row_idx}, ячейка {cell_idx}")
-                    break
-            if creditor_cell is not None:
-                break
-        if creditor_cell is not None:
-            break
-    
-    if creditor_cell is None:
-        print(f"⚠️ Не найдена ячейка с информацией о кредиторе (искали '{first_creditor_name[:30]}...')")
+
+    if creditor_block is None:
+        logger.warning("В шаблоне не найдена ячейка с информацией о кредиторе")
         return
-    
-    # Добавляем параграфы для дополнительных кредиторов в ячейку
-    for creditor_idx in range(1, len(creditors)):  # Начинаем со второго
-        creditor = creditors[creditor_idx]
-        creditor_num = creditor_idx + 1
-        
-        try:
-            # 0. Пустая строка для отступа (перед каждым кредитором)
-            creditor_cell.add_paragraph()
-            
-            # 1. Заголовок "Кредитор N" - жирным
-            p_header = creditor_cell.add_paragraph()
-            run_header = p_header.add_run(f"Кредитор {creditor_num}")
-            run_header.bold = True
-            
-            # 2. Название кредитора - жирным
-            p_name = creditor_cell.add_paragraph()
-            run_name = p_name.add_run(creditor['name'])
-            run_name.bold = True
-            
-            # 3. Адрес кредитора - жирным
-            p_address = creditor_cell.add_paragraph()
-            run_address = p_address.add_run(creditor['address'])
-            run_address.bold = True
-            
-            print(f"✅ Добавлен текст о кредиторе {creditor_num}: {creditor['name']}")
-        except Exception as e:
-            print(f"❌ Ошибка при добавлении кредитора {creditor_num}: {e}")
+
+    added = creditor_block.insert(doc.element, creditors)
+    logger.debug("Добавлен текст о дополнительных кредиторах: %d", added)
 
 
 def replace_placeholders_advanced(doc, replacements):
     """
     Улучшенная замена плейсхолдеров с обработкой всех элементов документа
     """
+    # Компилируем замены один раз на весь документ
+    replacements = compile_replacements(replacements)
+    
     # Обрабатываем все параграфы
     for paragraph in doc.paragraphs:
         replace_in_runs_preserve_formatting(paragraph, replacements)
@@ -644,159 +88,232 @@ def replace_placeholders_advanced(doc, replacements):
                 replace_in_runs_preserve_formatting(paragraph, replacements)
 
 
+def replace_placeholders_indexed(roots, index, replacements):
+    """
+    Замена плейсхолдеров только в тех параграфах, где они есть по индексу шаблона
+    roots — корневые элементы частей копии документа: {имя части: элемент}
+    """
+    replacer = compile_replacements(replacements)
+    for paragraph in index.paragraphs(roots, replacer):
+        replace_in_runs_preserve_formatting(paragraph, replacer)
+
+
+def _row_grid(tr):
+    """Ячейки строки по колонкам сетки: объединенная по горизонтали ячейка повторяется"""
+    grid = []
+    for tc in tr.tc_lst:
+        grid.extend([tc] * tc.grid_span)
+    return grid
+
+
+def set_cell_text(tc, text):
+    """
+    Записывает текст в ячейку, сохраняя форматирование первого параграфа и первого run
+    (в отличие от cell.text = ..., который пересоздает параграф без свойств)
+    """
+    paragraphs = tc.p_lst
+    if not paragraphs:
+        paragraphs = [tc.add_p()]
+    paragraph = paragraphs[0]
+    for extra in paragraphs[1:]:
+        tc.remove(extra)
+
+    runs = paragraph.r_lst
+    run = runs[0] if runs else None
+    for child in list(paragraph):
+        if child is not run and child is not paragraph.pPr:
+            paragraph.remove(child)
+    if run is None:
+        run = paragraph.add_r()
+    # Сеттер python-docx оставляет rPr и превращает "\n" и "\t" в w:br и w:tab
+    run.text = text
+
+
+def creditor_row_values(number, creditor, width):
+    """Значения ячеек строки кредитора по колонкам сетки (None — в таблице мало колонок)"""
+    if width >= 8:
+        # Полная таблица (как в list-of-creditors.docx)
+        return [
+            f"1.{number}",
+            creditor.get("Содержание обязательства", ""),
+            creditor.get("Кредитор", ""),
+            creditor.get("Место нахождения", ""),
+            creditor.get("Основание", ""),
+            format_amount(creditor.get("Сумма обязательства", "")),
+            format_amount(creditor.get("Задолженность", "")),
+            format_amount(creditor.get("Штрафы", "")),
+        ]
+    if width >= 4:
+        # Упрощенная таблица (возможно в zayav.docx)
+        return [
+            f"1.{number}",
+            creditor.get("Содержание обязательства", ""),
+            creditor.get("Кредитор", ""),
+            creditor.get("Основание", ""),
+        ]
+    logger.warning("Таблица имеет недостаточно колонок для кредитора %d: %d", number, width)
+    return None
+
+
+def fill_creditor_row(cells, number, creditor):
+    """Заполняет строку кредитора; cells — элементы w:tc по колонкам сетки"""
+    values = creditor_row_values(number, creditor, len(cells))
+    if values is None:
+        return
+    # Для объединенных ячеек побеждает последнее значение — как при записи через cells[i].text
+    for tc, value in zip(cells, values):
+        set_cell_text(tc, value)
+
+
+class CreditorRowPrototype:
+    """
+    Строка-образец для новых кредиторов: копия строки шаблона, в каждой ячейке
+    которой остался один параграф с одним run и одним w:t (форматирование сохранено).
+    Новая строка — копия образца, в которой меняется только текст w:t.
+    """
+
+    def __init__(self, tr):
+        self.tr = copy.deepcopy(tr)
+        self.columns = []  # номер ячейки (и ее w:t) для каждой колонки сетки
+        for index, tc in enumerate(self.tr.tc_lst):
+            set_cell_text(tc, "")
+            t = tc.p_lst[0].r_lst[0]._add_t()
+            t.set(qn('xml:space'), 'preserve')
+            self.columns.extend([index] * tc.grid_span)
+
+    def clone(self, number, creditor):
+        values = creditor_row_values(number, creditor, len(self.columns))
+        tr = copy.deepcopy(self.tr)
+        if values is None:
+            return tr
+        # Для объединенных ячеек побеждает последнее значение, как в fill_creditor_row
+        cell_values = dict(zip(self.columns, values))
+        texts = list(tr.iter(qn('w:t')))
+        for index, value in cell_values.items():
+            if "\n" in value or "\t" in value:
+                # Переносы и табуляции превращаются в w:br и w:tab сеттером run
+                texts[index].getparent().text = value
+            else:
+                texts[index].text = value
+        return tr
+
+
+def _cell_text(tc):
+    """Текст ячейки (как cell.text) без создания оберток python-docx"""
+    return "\n".join("".join(t.text or "" for t in p.iter(qn('w:t'))) for p in tc.p_lst)
+
+
+def _is_creditors_table(header_text):
+    return (
+        ("кредитор" in header_text and ("обязательство" in header_text or "денежным обязательствам" in header_text)) or
+        ("кредитор" in header_text and "задолженность" in header_text) or
+        ("кредитор" in header_text and "основание" in header_text)
+    )
+
+
 def add_creditors_rows_improved(doc, creditors):
     """
-    Улучшенное добавление строк кредиторов с сохранением форматирования
+    Заполняет таблицу кредиторов: строки шаблона 1.1, 1.2, ... заменяются данными,
+    лишние удаляются, недостающие добавляются перед разделом "2. Обязательные платежи"
+
+    Сетка ячеек таблицы строится один раз, строки удаляются и вставляются по ссылкам
+    на элементы — время линейно по числу кредиторов. Новые строки клонируются
+    из последней строки кредитора шаблона и сохраняют ее форматирование.
     """
-    for table_idx, table in enumerate(doc.tables):
-        # Ищем таблицу с кредиторами (проверяем заголовки)
-        if len(table.rows) > 0:
-            header_row = table.rows[0]
-            header_text = " ".join(cell.text.strip().lower() for cell in header_row.cells)
-            
-            # Если это таблица кредиторов (ищем по нескольким критериям)
-            is_creditors_table = (
-                ("кредитор" in header_text and ("обязательство" in header_text or "денежным обязательствам" in header_text)) or
-                ("кредитор" in header_text and "задолженность" in header_text) or
-                ("кредитор" in header_text and "основание" in header_text)
-            )
-            
-            if is_creditors_table:
-                print(f"Найдена таблица кредиторов с {len(table.rows)} строками")
-                
-                # Находим существующие строки с данными кредиторов (строки 1.1, 1.2 и т.д.)
-                creditor_rows = {}  # {номер_строки: индекс_кредитора}
-                
-                for i, row in enumerate(table.rows):
-                    row_text = " ".join(cell.text.strip() for cell in row.cells)
-                    
-                    # Ищем строки с номерацией 1.1, 1.2 и т.д. (денежные обязательства)
-                    if row_text.startswith("1."):
-                        try:
-                            # Извлекаем номер кредитора (1.1 -> 1, 1.2 -> 2)
-                            creditor_num = int(row_text.split()[0].split('.')[1])
-                            creditor_rows[i] = creditor_num
-                            print(f"Найдена строка кредитора {creditor_num} в позиции {i}")
-                        except (ValueError, IndexError):
-                            pass
-                
-                print(f"Найдено существующих строк кредиторов: {len(creditor_rows)}")
-                
-                # Список строк для удаления (если кредиторов меньше, чем строк в шаблоне)
-                rows_to_delete = []
-                
-                # Заменяем существующие строки кредиторов
-                for row_idx, creditor_num in creditor_rows.items():
-                    if creditor_num <= len(creditors):  # Есть данные для замены
-                        creditor = creditors[creditor_num - 1]  # creditor_num начинается с 1
-                        cells = table.rows[row_idx].cells
-                        
-                        # Поддерживаем таблицы с разным количеством колонок
-                        if len(cells) >= 8:
-                            # Полная таблица (как в list-of-creditors.docx)
-                            cells[0].text = f"1.{creditor_num}"
-                            cells[1].text = creditor.get("Содержание обязательства", "")
-                            cells[2].text = creditor.get("Кредитор", "")
-                            cells[3].text = creditor.get("Место нахождения", "")
-                            cells[4].text = creditor.get("Основание", "")
-                            cells[5].text = format_amount(creditor.get("Сумма обязательства", ""))
-                            cells[6].text = format_amount(creditor.get("Задолженность", ""))
-                            cells[7].text = format_amount(creditor.get("Штрафы", ""))
-                        elif len(cells) >= 4:
-                            # Упрощенная таблица (возможно в zayav.docx)
-                            cells[0].text = f"1.{creditor_num}"
-                            cells[1].text = creditor.get("Содержание обязательства", "")
-                            cells[2].text = creditor.get("Кредитор", "")
-                            cells[3].text = creditor.get("Основание", "")
-                        else:
-                            print(f"⚠️ Таблица имеет недостаточно колонок: {len(cells)}")
-                        print(f"Заменен кредитор {creditor_num}: {creditor.get('Кредитор', 'Неизвестно')}")
-                    else:
-                        # Кредитора нет - нужно удалить эту строку
-                        rows_to_delete.append(row_idx)
-                        print(f"Строка кредитора {creditor_num} в позиции {row_idx} будет удалена (нет данных)")
-                
-                # Если кредиторов больше, чем существующих строк - добавляем новые
-                max_existing_creditor = max(creditor_rows.values()) if creditor_rows else 0
-                
-                if len(creditors) > max_existing_creditor:
-                    print(f"Нужно добавить еще {len(creditors) - max_existing_creditor} кредиторов")
-                    
-                    # Находим и временно сохраняем строки раздела "2. Обязательные платежи"
-                    section_2_rows = []
-                    section_2_start = None
-                    
-                    for i, row in enumerate(table.rows):
-                        row_text = " ".join(cell.text.strip() for cell in row.cells)
-                        
-                        # Если нашли начало раздела 2
-                        if section_2_start is None and (row_text.strip() == "2" or (row_text.strip().startswith("2") and "обязательные платежи" in row_text.lower())):
-                            section_2_start = i
-                            print(f"Найден раздел 2 в позиции {i}")
-                        
-                        # Если мы в разделе 2, сохраняем полную структуру строк
-                        if section_2_start is not None and i >= section_2_start:
-                            # Сохраняем полный XML элемент строки
-                            section_2_rows.append(copy.deepcopy(row._element))
-                    
-                    # Удаляем строки раздела 2 (в обратном порядке)
-                    if section_2_rows:
-                        print(f"Временно удаляем {len(section_2_rows)} строк раздела 2")
-                        for i in range(len(section_2_rows)):
-                            # Удаляем с конца, начиная с section_2_start
-                            row_to_remove = len(table.rows) - 1
-                            if row_to_remove >= section_2_start:
-                                table._element.remove(table.rows[row_to_remove]._element)
-                    
-                    # Теперь добавляем недостающих кредиторов
-                    for i in range(max_existing_creditor, len(creditors)):
-                        creditor = creditors[i]
-                        
-                        # Добавляем строку в конец таблицы (теперь без раздела 2)
-                        new_row = table.add_row()
-                        cells = new_row.cells
-                        
-                        # Поддерживаем таблицы с разным количеством колонок
-                        if len(cells) >= 8:
-                            # Полная таблица (как в list-of-creditors.docx)
-                            cells[0].text = f"1.{i + 1}"
-                            cells[1].text = creditor.get("Содержание обязательства", "")
-                            cells[2].text = creditor.get("Кредитор", "")
-                            cells[3].text = creditor.get("Место нахождения", "")
-                            cells[4].text = creditor.get("Основание", "")
-                            cells[5].text = format_amount(creditor.get("Сумма обязательства", ""))
-                            cells[6].text = format_amount(creditor.get("Задолженность", ""))
-                            cells[7].text = format_amount(creditor.get("Штрафы", ""))
-                        elif len(cells) >= 4:
-                            # Упрощенная таблица (возможно в zayav.docx)
-                            cells[0].text = f"1.{i + 1}"
-                            cells[1].text = creditor.get("Содержание обязательства", "")
-                            cells[2].text = creditor.get("Кредитор", "")
-                            cells[3].text = creditor.get("Основание", "")
-                        else:
-                            print(f"⚠️ Таблица имеет недостаточно ячеек для кредитора {i + 1}: {len(cells)}")
-                        print(f"Добавлен кредитор {i + 1}: {creditor.get('Кредитор', 'Неизвестно')}")
-                    
-                    # Восстанавливаем строки раздела 2 с сохранением оригинальной структуры
-                    if section_2_rows:
-                        print(f"Восстанавливаем {len(section_2_rows)} строк раздела 2")
-                        table_element = table._element
-                        for row_element in section_2_rows:
-                            # Добавляем сохраненный элемент строки обратно в таблицу
-                            table_element.append(row_element)
-                
-                # Удаляем лишние строки кредиторов (если кредиторов меньше, чем было в шаблоне)
-                # Удаляем в обратном порядке, чтобы индексы не сбивались
-                for row_idx in sorted(rows_to_delete, reverse=True):
-                    print(f"Удаляем лишнюю строку кредитора в позиции {row_idx}")
-                    table._element.remove(table.rows[row_idx]._element)
-                
-                break  # Обработали первую таблицу кредиторов
-
-
-def process_document_in_memory(template_path, replacements, creditors=None):
+    for table in doc.tables:
+        tbl = table._tbl
+        rows = tbl.tr_lst
+        if not rows:
+            continue
+
+        # Ищем таблицу с кредиторами по заголовку
+        header_text = " ".join(_cell_text(tc).strip().lower() for tc in _row_grid(rows[0]))
+        if not _is_creditors_table(header_text):
+            continue
+
+        logger.debug("Найдена таблица кредиторов с %d строками", len(rows))
+
+        # Сетка python-docx (с учетом объединений) строится один раз на всю таблицу
+        grid = table._cells
+        column_count = table._column_count
+        texts = {}
+
+        def row_text(row_idx):
+            cells = grid[row_idx * column_count:(row_idx + 1) * column_count]
+            parts = []
+            for cell in cells:
+                text = texts.get(cell._tc)
+                if text is None:
+                    text = texts[cell._tc] = cell.text.strip()
+                parts.append(text)
+            return " ".join(parts)
+
+        # Строки с данными кредиторов (1.1, 1.2 и т.д.) и начало раздела 2
+        creditor_rows = []  # [(индекс строки, номер кредитора)]
+        section_2_start = None
+        for i in range(len(rows)):
+            text = row_text(i)
+            if text.startswith("1."):
+                try:
+                    creditor_rows.append((i, int(text.split()[0].split('.')[1])))
+                except (ValueError, IndexError):
+                    pass
+            if section_2_start is None and (text.strip() == "2" or (text.strip().startswith("2") and "обязательные платежи" in text.lower())):
+                section_2_start = i
+
+        logger.debug("Найдено существующих строк кредиторов: %d", len(creditor_rows))
+
+        # Заменяем существующие строки, лишние удаляем
+        rows_to_delete = []
+        for row_idx, creditor_num in creditor_rows:
+            if creditor_num <= len(creditors):
+                cells = [cell._tc for cell in grid[row_idx * column_count:(row_idx + 1) * column_count]]
+                fill_creditor_row(cells, creditor_num, creditors[creditor_num - 1])
+            else:
+                rows_to_delete.append(rows[row_idx])
+
+        # Недостающих кредиторов добавляем одной пачкой перед разделом 2 (или в конец таблицы)
+        max_existing_creditor = max((num for _, num in creditor_rows), default=0)
+        if len(creditors) > max_existing_creditor:
+            # Образец новых строк — последняя строка кредитора шаблона, готовится один раз
+            prototype = None
+            if creditor_rows:
+                prototype = CreditorRowPrototype(rows[max(creditor_rows, key=lambda item: item[1])[0]])
+
+            new_rows = []
+            for i in range(max_existing_creditor, len(creditors)):
+                if prototype is not None:
+                    tr = prototype.clone(i + 1, creditors[i])
+                else:
+                    # Строк-образцов нет — пустая строка по сетке таблицы, как table.add_row()
+                    tr = tbl._new_tr()
+                    for grid_col in tbl.tblGrid.gridCol_lst:
+                        tc = tr.add_tc()
+                        tc.width = grid_col.w
+                    fill_creditor_row(_row_grid(tr), i + 1, creditors[i])
+                new_rows.append(tr)
+
+            if section_2_start is not None:
+                anchor = rows[section_2_start]
+                for tr in new_rows:
+                    anchor.addprevious(tr)
+            else:
+                tbl.extend(new_rows)
+            logger.debug("Добавлено кредиторов: %d", len(new_rows))
+
+        for tr in rows_to_delete:
+            tbl.remove(tr)
+        if rows_to_delete:
+            logger.debug("Удалено лишних строк кредиторов: %d", len(rows_to_delete))
+
+        break  # Обработали первую таблицу кредиторов
+
+
+def process_document_in_memory(template_path, replacements, creditors=None, timings=None, template=None):
     """
     Обрабатывает документ в памяти и возвращает байты обработанного документа
+    timings — словарь, в который добавляется время стадий (секунды), см. metrics.stage
+    template — версия шаблона, уже взятая запросом (иначе текущая из template_cache)
     """
     # Проверяем формат файла
     if template_path.endswith('.doc') and not template_path.endswith('.docx'):
@@ -804,28 +321,58 @@ def process_document_in_memory(template_path, replacements, creditors=None):
                         f"Пожалуйста, откройте его в Microsoft Word и сохраните как .docx формат, "
                         f"либо используйте LibreOffice для конвертации.")
     
-    # Загружаем шаблон
-    doc = Document(template_path)
+    if template is None:
+        with stage(timings, 'template'):
+            template = template_cache.get(template_path)
+    if template is None:
+        raise FileNotFoundError(f"Шаблон '{template_path}' не найден")
     
-    # Используем улучшенную функцию замены плейсхолдеров
-    replace_placeholders_advanced(doc, replacements)
+    if RENDER_BACKEND == 'package':
+        # Копируются и переписываются только основной текст и колонтитулы,
+        # остальные части .docx переносятся из шаблона байт в байт
+        with stage(timings, 'copy'):
+            roots = template.package.copy_roots()
+        fill_document(template.package.document(roots), roots, template, replacements, creditors, timings)
+        with stage(timings, 'save'):
+            return template.package.write(roots)
     
-    # Если есть данные кредиторов, добавляем их в таблицы (для заявления о банкротстве и списка кредиторов)
-    if creditors and (template_path.endswith('list-of-creditors.docx') or template_path.endswith('zayav.docx')):
-        add_creditors_rows_improved(doc, creditors)
-    
-    # Для заявления о банкротстве добавляем дополнительных кредиторов в текстовую часть
-    if creditors and template_path.endswith('zayav.docx'):
-        add_additional_creditors_to_text(doc, creditors)
+    # Получаем собственную копию заранее разобранного шаблона
+    with stage(timings, 'copy'):
+        doc = template.open()
+    fill_document(doc, part_roots(doc), template, replacements, creditors, timings)
     
     # Сохраняем документ в память
-    doc_io = io.BytesIO()
-    doc.save(doc_io)
-    doc_io.seek(0)
+    with stage(timings, 'save'):
+        doc_io = io.BytesIO()
+        doc.save(doc_io)
+        doc_io.seek(0)
     
     return doc_io
 
 
+def fill_document(doc, roots, template, replacements, creditors=None, timings=None):
+    """
+    Заполняет копию шаблона: плейсхолдеры и таблицы кредиторов
+    """
+    template_path = template.path
+    
+    # Заменяем плейсхолдеры только в параграфах из индекса шаблона,
+    # в словаре замен — только ключи, которые есть в шаблоне
+    with stage(timings, 'substitute'):
+        replace_placeholders_indexed(roots, template.index, template.index.prune(replacements))
+    
+    # Для заявления о банкротстве добавляем дополнительных кредиторов в текстовую часть
+    # (до изменения таблиц: путь к ячейке шапки взят из шаблона)
+    if creditors and template_path.endswith('zayav.docx'):
+        with stage(timings, 'creditor_header'):
+            add_additional_creditors_to_text(doc, creditors, template.creditor_block)
+    
+    # Если есть данные кредиторов, добавляем их в таблицы (для заявления о банкротстве и списка кредиторов)
+    if creditors and (template_path.endswith('list-of-creditors.docx') or template_path.endswith('zayav.docx')):
+        with stage(timings, 'creditor_rows'):
+            add_creditors_rows_improved(doc, creditors)
+
+
 def format_amount(amount_str):
     """
     Форматирует сумму в формат с разделителями тысяч и копейками
@@ -877,60 +424,226 @@ def calculate_total_debt(creditors):
     return total
 
 
-def generate_initial_documents_archive(replacements, creditors, surname, name, current_date):
+# Состав архивов: (шаблон, префикс имени файла, название документа, нужны ли кредиторы)
+# Порядок списка — порядок документов в архиве
+INITIAL_DOCUMENTS = [
+    ("zayav.docx", "bankruptcy_application", "заявление о банкротстве", True),
+    ("list-of-creditors.docx", "list_of_creditors", "список кредиторов", True),
+    ("properties.docx", "properties", "опись имущества", False),
+]
+
+CASE_DOCUMENTS = [
+    ("inform-message.docx", "inform_message", "информационное сообщение", False),
+    # Используем обновленную версию zayavSRO1.docx
+    ("zayavSRO1.docx", "sro_application", "заявление от СРО", False),
+    ("zayavAgreement.docx", "agreement", "заявление о согласии арбитражного управляющего", False),
+]
+
+# Количество процессов для параллельной генерации документов одного архива.
+# 1 — документы генерируются по очереди в текущем процессе
+RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', '1'))
+
+# Способ сборки .docx:
+#   docx    — копия документа python-docx и Document.save() (все части сериализуются заново)
+#   package — переписываются только document/header/footer XML, остальное копируется из шаблона
+RENDER_BACKEND = os.environ.get('RENDER_BACKEND', 'docx')
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+# Кэш сгенерированных документов (память / диск / общий сервер), см. result_cache.py
+result_cache = build_result_cache()
+
+
+def drop_stale_results(template_path, template):
+    """После обновления шаблона: результаты старой версии не нужны и в памяти"""
+    if result_cache is not None:
+        result_cache.invalidate()
+
+
+# Обновление шаблонов с диска без перезапуска (запускается в wsgi.py и __main__)
+template_watcher = TemplateWatcher(template_cache, on_change=drop_stale_results)
+
+
+def get_render_pool():
+    """
+    Возвращает общий пул процессов для генерации документов (None, если RENDER_WORKERS <= 1)
+    Каждый процесс пула при старте загружает шаблоны в свой кэш
+    """
+    global _render_pool
+    if RENDER_WORKERS <= 1:
+        return None
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=RENDER_WORKERS,
+                initializer=template_cache.preload,
+                initargs=(DOCUMENT_TEMPLATES,),
+            )
+        return _render_pool
+
+
+def _reset_render_pool():
+    """Сбрасывает сломанный пул (например, если процесс был убит), следующий запрос создаст новый"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown(wait=False, cancel_futures=True)
+            _render_pool = None
+
+
+class TemplateVersionMismatch(Exception):
+    """В процессе пула нет версии шаблона, которую взял запрос"""
+
+
+def render_document_bytes(template_path, replacements, creditors=None, digest=None):
+    """
+    Генерирует документ в процессе пула и возвращает его байты для передачи обратно
+    вместе со временем стадий: (байты, {стадия: секунды})
+    digest — хэш версии шаблона, которую взял запрос: если процесс пула еще не
+    заметил обновление шаблона, он перечитывает его сразу. Если и после этого
+    версия другая (файл успел измениться еще раз или запрос взял старую версию) —
+    TemplateVersionMismatch: документ генерируется в процессе запроса по его версии
+    """
+    timings = {}
+    with stage(timings, 'template'):
+        template = template_cache.get(template_path)
+        if template is not None and digest is not None and template.digest != digest:
+            template = template_cache.reload(template_path) or template
+            if template.digest != digest:
+                raise TemplateVersionMismatch(template_path)
+    document_bytes = process_document_in_memory(
+        template_path, replacements, creditors, timings, template).getvalue()
+    return document_bytes, timings
+
+
+def request_timer():
+    """
+    StageTimer текущего запроса (создается в before_request)
+    Вне запроса (задача, скрипт) — отдельный таймер без маршрута
+    """
+    if has_request_context() and 'timer' in g:
+        return g.timer
+    return StageTimer('-')
+
+
+def iter_rendered_documents(documents, replacements, creditors, surname, name, current_date, errors=None, timer=None):
+    """
+    Генерирует документы архива и отдает пары (имя файла, байты) в порядке списка documents.
+    Генератор ленивый: при потоковой отдаче каждый документ уходит клиенту сразу после генерации
+
+    Ошибка в одном шаблоне не мешает остальным: документ пропускается, ошибка пишется в лог
+    и, если передан список errors, добавляется в него как {"document": ..., "error": ...}.
+    При RENDER_WORKERS > 1 все документы генерируются параллельно в пуле процессов.
+    Документы, уже сгенерированные с теми же данными, берутся из result_cache.
+
+    Время стадий каждого документа попадает в гистограммы metrics (метки: маршрут
+    таймера timer и шаблон) и суммируется в timer (по умолчанию — таймер запроса).
+    """
+    if timer is None:
+        timer = request_timer()
+    if creditors is not None:
+        CREDITORS.observe(len(creditors), route=timer.route)
+
+    def report_error(template_path, title, message):
+        logger.error("Ошибка при создании документа «%s»: %s", title, message,
+                     extra={'template': template_path})
+        FAILURES.inc(route=timer.route, template=template_path)
+        if errors is not None:
+            errors.append({"document": title, "error": message})
+
+    jobs = []
+    for template_path, prefix, title, with_creditors in documents:
+        template = template_cache.get(template_path)
+        if template is None:
+            logger.warning("Шаблон «%s» (%s) не найден", title, template_path)
+            FAILURES.inc(route=timer.route, template=template_path)
+            if errors is not None:
+                errors.append({"document": title, "error": f"Шаблон '{template_path}' не найден"})
+            continue
+        filename = f"{prefix}_{surname}_{name}_{current_date.strftime('%Y%m%d')}.docx"
+        job_creditors = creditors if with_creditors else None
+
+        # Шаблон получает только свои ключи (манифест шаблона)
+        job_replacements = template.index.prune(replacements)
+
+        # Тот же шаблон с теми же данными уже генерировался — берем готовые байты.
+        # В ключ входят только плейсхолдеры, которые есть в шаблоне: после правки
+        # одного поля заново генерируются лишь документы, где это поле используется
+        cache_key = cached = None
+        timings = {}
+        if result_cache is not None:
+            with stage(timings, 'cache'):
+                replacer = compile_replacements(job_replacements)
+                used = {key: job_replacements[key] for key in template.index.dependencies(replacer)}
+                cache_key = document_cache_key(template.digest, RENDER_BACKEND, used, job_creditors)
+                cached = result_cache.get(cache_key)
+        # Версия шаблона фиксируется: обновление шаблона во время запроса его не затронет
+        jobs.append((template_path, template, filename, title, job_replacements, job_creditors, cache_key, cached, timings))
+
+    pool = get_render_pool()
+    futures = [
+        pool.submit(render_document_bytes, template_path, job_replacements, job_creditors, template.digest)
+        if pool is not None and cached is None else None
+        for template_path, template, _, _, job_replacements, job_creditors, _, cached, _ in jobs
+    ]
+
+    try:
+        for (template_path, template, filename, title, job_replacements, job_creditors, cache_key, cached, timings), future in zip(jobs, futures):
+            if cached is not None:
+                logger.info("Документ «%s» взят из кэша: %s", title, filename,
+                            extra={'template': template_path, 'source': 'cache'})
+                timer.add_document(template_path, timings)
+                DOCUMENTS.inc(route=timer.route, template=template_path, source='cache')
+                yield filename, cached
+                continue
+            try:
+                if future is None:
+                    # Без лишней копии: архив читает байты прямо из буфера документа
+                    document_bytes = process_document_in_memory(
+                        template_path, job_replacements, job_creditors, timings, template).getbuffer()
+                else:
+                    try:
+                        document_bytes, pool_timings = future.result()
+                        timings.update(pool_timings)
+                    except TemplateVersionMismatch:
+                        # Версия шаблона в ключе кэша — только та, что взял запрос
+                        document_bytes = process_document_in_memory(
+                            template_path, job_replacements, job_creditors, timings, template).getbuffer()
+            except BrokenProcessPool as e:
+                _reset_render_pool()
+                report_error(template_path, title, str(e))
+                continue
+            except Exception as e:
+                report_error(template_path, title, str(e))
+                continue
+            if cache_key is not None:
+                result_cache.set(cache_key, bytes(document_bytes))
+            timer.add_document(template_path, timings)
+            DOCUMENTS.inc(route=timer.route, template=template_path, source='rendered')
+            logger.info("Создан документ «%s»: %s", title, filename,
+                        extra={'template': template_path, 'source': 'rendered'})
+            yield filename, document_bytes
+    finally:
+        # Снимок метрик для /metrics других процессов (если задан METRICS_DIR)
+        registry.changed()
+
+
+def generate_initial_documents_archive(replacements, creditors, surname, name, current_date, timer=None):
     """
     Генерирует первоначальные документы (БЕЗ номера дела):
     - заявление о банкротстве
     - список кредиторов
     - опись имущества
-    """
-    zip_buffer = io.BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        # Генерируем заявление о банкротстве
-        bankruptcy_template = "zayav.docx"
-        if os.path.exists(bankruptcy_template):
-            try:
-                bankruptcy_doc = process_document_in_memory(bankruptcy_template, replacements, creditors)
-                bankruptcy_filename = f"bankruptcy_application_{surname}_{name}_{current_date.strftime('%Y%m%d')}.docx"
-                zip_file.writestr(bankruptcy_filename, bankruptcy_doc.getvalue())
-                print(f"✅ Создано заявление о банкротстве: {bankruptcy_filename}")
-            except Exception as e:
-                print(f"❌ Ошибка при создании заявления о банкротстве: {e}")
-        else:
-            print("⚠️ Шаблон заявления о банкротстве (zayav.docx) не найден")
-        
-        # Генерируем список кредиторов
-        creditors_template = "list-of-creditors.docx"
-        if os.path.exists(creditors_template):
-            try:
-                creditors_doc = process_document_in_memory(creditors_template, replacements, creditors)
-                creditors_filename = f"list_of_creditors_{surname}_{name}_{current_date.strftime('%Y%m%d')}.docx"
-                zip_file.writestr(creditors_filename, creditors_doc.getvalue())
-                print(f"✅ Создан список кредиторов: {creditors_filename}")
-            except Exception as e:
-                print(f"❌ Ошибка при создании списка кредиторов: {e}")
-        else:
-            print("⚠️ Шаблон списка кредиторов (list-of-creditors.docx) не найден")
-        
-        # Генерируем опись имущества
-        properties_template = "properties.docx"
-        if os.path.exists(properties_template):
-            try:
-                properties_doc = process_document_in_memory(properties_template, replacements)
-                properties_filename = f"properties_{surname}_{name}_{current_date.strftime('%Y%m%d')}.docx"
-                zip_file.writestr(properties_filename, properties_doc.getvalue())
-                print(f"✅ Создана опись имущества: {properties_filename}")
-            except Exception as e:
-                print(f"❌ Ошибка при создании описи имущества: {e}")
-        else:
-            print("⚠️ Шаблон описи имущества (properties.docx) не найден")
     
-    zip_buffer.seek(0)
-    return zip_buffer
+    timer — StageTimer, в который пишется время стадий (для задач — таймер запроса)
+    """
+    timer = timer or request_timer()
+    return build_archive(iter_rendered_documents(
+        INITIAL_DOCUMENTS, replacements, creditors, surname, name, current_date, timer=timer), timer.stages)
 
 
-def generate_case_documents_archive(replacements, surname, name, current_date):
+def generate_case_documents_archive(replacements, surname, name, current_date, timer=None):
     """
     Генерирует документы после открытия дела (С номером дела):
     - информационное сообщение
@@ -939,515 +652,1031 @@ def generate_case_documents_archive(replacements, surname, name, current_date):
     
     Примечание: Кредиторы не требуются для этих документов
     """
-    zip_buffer = io.BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        # Генерируем информационное сообщение
-        inform_template = "inform-message.docx"
-        if os.path.exists(inform_template):
-            try:
-                inform_doc = process_document_in_memory(inform_template, replacements)
-                inform_filename = f"inform_message_{surname}_{name}_{current_date.strftime('%Y%m%d')}.docx"
-                zip_file.writestr(inform_filename, inform_doc.getvalue())
-                print(f"✅ Создано информационное сообщение: {inform_filename}")
-            except Exception as e:
-                print(f"❌ Ошибка при создании информационного сообщения: {e}")
-        else:
-            print("⚠️ Шаблон информационного сообщения (inform-message.docx) не найден")
-        
-        # Генерируем заявление от СРО
-        # Используем обновленную версию zayavSRO1.docx
-        sro_template = "zayavSRO1.docx"
-        
-        if os.path.exists(sro_template):
-            try:
-                sro_doc = process_document_in_memory(sro_template, replacements)
-                sro_filename = f"sro_application_{surname}_{name}_{current_date.strftime('%Y%m%d')}.docx"
-                zip_file.writestr(sro_filename, sro_doc.getvalue())
-                print(f"✅ Создано заявление от СРО: {sro_filename}")
-            except Exception as e:
-                print(f"❌ Ошибка при создании заявления от СРО: {e}")
-        else:
-            print("⚠️ Шаблон заявления от СРО (zayavSRO1.docx) не найден")
-        
-        # Генерируем заявление о согласии арбитражного управляющего
-        agreement_template = "zayavAgreement.docx"
-        if os.path.exists(agreement_template):
-            try:
-                agreement_doc = process_document_in_memory(agreement_template, replacements)
-                agreement_filename = f"agreement_{surname}_{name}_{current_date.strftime('%Y%m%d')}.docx"
-                zip_file.writestr(agreement_filename, agreement_doc.getvalue())
-                print(f"✅ Создано заявление о согласии: {agreement_filename}")
-            except Exception as e:
-                print(f"❌ Ошибка при создании заявления о согласии: {e}")
-        else:
-            print("⚠️ Шаблон заявления о согласии (zayavAgreement.docx) не найден")
-    
-    zip_buffer.seek(0)
-    return zip_buffer
+    timer = timer or request_timer()
+    return build_archive(iter_rendered_documents(
+        CASE_DOCUMENTS, replacements, None, surname, name, current_date, timer=timer), timer.stages)
+
+
+# Максимальное число должников в одном пакетном запросе
+BATCH_MAX_DEBTORS = int(os.environ.get('BATCH_MAX_DEBTORS', '100'))
+
+# Максимальное число кредиторов в запросе к API /initial (JSON или CSV)
+API_MAX_CREDITORS = int(os.environ.get('API_MAX_CREDITORS', '1000'))
+
+
+def batch_folder_name(number, debtor):
+    """Имя папки должника в пакетном архиве: 001_Иванов_Иван"""
+    parts = [f"{number:03d}"] + [debtor[field] for field in ('surname', 'name') if debtor.get(field)]
+    return "_".join(part.replace('/', '_').replace('\\', '_') for part in parts)
+
+
+def iter_batch_documents(records, current_date):
+    """
+    Генерирует первоначальные документы для списка должников: папка на каждого должника
+    и отчет report.json в конце архива
+
+    Сначала проверяются все записи и одним вызовом определяются суды должников,
+    затем генерируются документы. Шаблоны и индексы общие для всех записей.
+    Ошибка в записи (или в отдельном документе) не прерывает пакет, а попадает в отчет.
+    """
+    report = []
+    valid = []
+    for number, record in enumerate(records, 1):
+        entry = {"number": number, "status": "ok", "documents": [], "errors": []}
+        report.append(entry)
+
+        if not isinstance(record, dict):
+            entry.update(status="error", errors=[{"error": "Запись должника должна быть объектом"}])
+            continue
+
+        # Та же схема, что у JSON-запроса к /initial: флаги, даты, ИНН, суммы
+        errors = Errors()
+        debtor, creditors = read_initial_json(record, errors)
+        folder = batch_folder_name(number, debtor)
+        entry["debtor"] = " ".join(debtor[field] for field in ('surname', 'name', 'patronymic') if debtor[field])
+        entry["folder"] = folder
+
+        if errors.total:
+            entry.update(status="error", errors=errors.items)
+            logger.warning("Должник №%d: ошибок в данных: %d", number, errors.total)
+            continue
+        valid.append((number, entry, folder, debtor, creditors))
+
+    courts = resolve_many([debtor.get('registered_address', '') for _, _, _, debtor, _ in valid])
+    for (number, entry, folder, debtor, creditors), court in zip(valid, courts):
+        try:
+            replacements = build_initial_replacements(debtor, creditors, current_date, court)
+        except Exception as e:
+            entry.update(status="error", errors=[{"error": str(e)}])
+            logger.error("Должник №%d: %s", number, e)
+            continue
+
+        documents = iter_rendered_documents(
+            INITIAL_DOCUMENTS, replacements, creditors,
+            debtor['surname'], debtor['name'], current_date, errors=entry["errors"])
+        for filename, document_bytes in documents:
+            entry["documents"].append(filename)
+            yield f"{folder}/{filename}", document_bytes
+
+        if entry["errors"]:
+            entry["status"] = "partial" if entry["documents"] else "error"
+
+    summary = {
+        "total": len(report),
+        "ok": sum(1 for entry in report if entry["status"] == "ok"),
+        "failed": sum(1 for entry in report if entry["status"] != "ok"),
+        "records": report,
+    }
+    yield "report.json", json.dumps(summary, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def render_page(name):
+    """
+    Отрисовка страницы без flash-сообщений для page_cache: (html, шаблон)
+
+    page_cache вызывает ее, если страницы еще нет или ее шаблон изменился на диске
+    (templates/ монтируется в контейнер). Jinja без TEMPLATES_AUTO_RELOAD файлы не
+    проверяет, поэтому при изменении кэш шаблонов Jinja сбрасывается здесь
+    """
+    template = app.jinja_env.get_template(name)
+    if not template.is_up_to_date and app.jinja_env.cache is not None:
+        app.jinja_env.cache.clear()
+        template = app.jinja_env.get_template(name)
+    return render_template(template), template
+
+
+def page_response(name):
+    """
+    Страница формы: готовый вариант из page_cache (gzip/br по Accept-Encoding,
+    сильный ETag, 304 при совпадении If-None-Match)
+
+    Если в сессии есть flash-сообщения (после неудачной отправки формы), страница
+    с ними отрисовывается заново и не кэшируется
+    """
+    if '_flashes' in session:
+        response = app.make_response(render_template(name))
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    encoding, body, etag = page_cache.get(name, render_page).select(request.accept_encodings)
+    response = Response(body, mimetype='text/html')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    # Браузер хранит страницу, но каждый раз сверяет ETag: новая версия видна сразу
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 
 @app.route('/')
 def home():
     """Главная страница с выбором типа документов"""
-    return render_template('home.html')
+    return page_response('home.html')
 
 
-@app.route('/initial', methods=['GET', 'POST'])
-def initial_documents():
-    """Форма и генерация первоначальных документов (без номера дела)"""
-    if request.method == 'POST':
-        # Получаем основные данные из формы
-        surname = request.form.get('surname', '').strip()
-        name = request.form.get('name', '').strip()
-        patronymic = request.form.get('patronymic', '').strip()
-        surname_genitive = request.form.get('surname_genitive', '').strip()  # Родительный падеж
-        name_genitive = request.form.get('name_genitive', '').strip()
-        patronymic_genitive = request.form.get('patronymic_genitive', '').strip()
-        surname_dative = request.form.get('surname_dative', '').strip()  # Дательный падеж
-        name_dative = request.form.get('name_dative', '').strip()
-        patronymic_dative = request.form.get('patronymic_dative', '').strip()
-        birth_date = request.form.get('birth_date', '').strip()
-        birth_place = request.form.get('birth_place', '').strip()
-        passport_series = request.form.get('passport_series', '').strip()
-        passport_number = request.form.get('passport_number', '').strip()
-        passport_issued_by = request.form.get('passport_issued_by', '').strip()
-        passport_issue_date = request.form.get('passport_issue_date', '').strip()
-        inn = request.form.get('inn', '').strip()
-        snils = request.form.get('snils', '').strip()
-        
-        # Получаем данные адреса
-        region = request.form.get('region', '').strip()
-        district = request.form.get('district', '').strip()
-        city = request.form.get('city', '').strip()
-        street = request.form.get('street', '').strip()
-        house_number = request.form.get('house_number', '').strip()
-        building_number = request.form.get('building_number', '').strip()
-        apartment_number = request.form.get('apartment_number', '').strip()
-        registered_address = request.form.get('registered_address', '').strip()
-        
-        # Получаем данные о долге
-        debt_amount_digits = request.form.get('debt_amount_digits', '').strip()
-        debt_amount_words = request.form.get('debt_amount_words', '').strip()
+# Поля формы первоначальных документов (и записи должника в пакетной генерации)
+INITIAL_FIELDS = (
+    'surname',
+    'name',
+    'patronymic',
+    'surname_genitive',
+    'name_genitive',
+    'patronymic_genitive',
+    'surname_dative',
+    'name_dative',
+    'patronymic_dative',
+    'birth_date',
+    'birth_place',
+    'passport_series',
+    'passport_number',
+    'passport_issued_by',
+    'passport_issue_date',
+    'inn',
+    'snils',
+    'region',
+    'district',
+    'city',
+    'street',
+    'house_number',
+    'building_number',
+    'apartment_number',
+    'registered_address',
+    'debt_amount_digits',
+    'debt_amount_words',
+    'state_duty',
+    'state_duty_exemption_reason',
+    'has_marriage',
+    'has_children',
+    'case_number',
+    'judge_name',
+)
+
+# Обязательные поля должника
+INITIAL_REQUIRED_FIELDS = (
+    'surname', 'name', 'patronymic', 'surname_genitive', 'name_genitive',
+    'patronymic_genitive', 'surname_dative', 'name_dative', 'patronymic_dative',
+    'birth_date', 'birth_place', 'passport_series', 'passport_number',
+    'passport_issued_by', 'passport_issue_date',
+    'inn', 'snils', 'region', 'street', 'house_number', 'registered_address',
+    'debt_amount_digits', 'debt_amount_words',
+)
+
+# Поля кредитора в форме: (префикс поля формы, ключ в словаре кредитора)
+CREDITOR_FORM_FIELDS = (
+    ('creditor_name', 'name'),
+    ('creditor_address', 'address'),
+    ('obligation_content', 'Содержание обязательства'),
+    ('obligation_basis', 'Основание'),
+    ('obligation_amount', 'Сумма обязательства'),
+    ('debt_amount', 'Задолженность'),
+    ('penalties', 'Штрафы'),
+)
+
+
+def read_initial_form(form):
+    """Читает поля должника из формы: {имя поля: значение без пробелов по краям}"""
+    return {field: form.get(field, '').strip() for field in INITIAL_FIELDS}
+
+
+def read_form_creditors(form):
+    """
+    Читает кредиторов из полей формы creditor_name_1, creditor_address_1, ...
+    Возвращает список в том виде, что используется при генерации документов
+    """
+    creditors = []
+    creditor_num = 1
+    while True:
+        values = {key: form.get(f'{prefix}_{creditor_num}', '').strip() for prefix, key in CREDITOR_FORM_FIELDS}
         
-        # Получаем данные о госпошлине
-        state_duty = request.form.get('state_duty', '').strip()
-        state_duty_exemption_reason = request.form.get('state_duty_exemption_reason', '').strip()
+        # Если основные поля кредитора пусты, прекращаем поиск
+        if not values['name'] and not values['address']:
+            break
         
-        # Формируем значение для плейсхолдера {госпошлина}
-        state_duty_text = ""
-        try:
-            if state_duty and state_duty != '0':
-                duty_amount = float(state_duty.replace(',', '.').replace(' ', ''))
-                if duty_amount > 0:
-                    # Госпошлина указана и больше 0
-                    state_duty_text = f"{state_duty} рублей"
-                elif state_duty_exemption_reason:
-                    # Указан 0 и есть причина освобождения
-                    state_duty_text = f"Освобожден в силу {state_duty_exemption_reason}"
-                else:
-                    # Указан 0, но причины нет - используем дефолт
-                    state_duty_text = "300 рублей"
+        values['Кредитор'] = values['name']
+        values['Место нахождения'] = values['address']
+        creditors.append(values)
+        creditor_num += 1
+    return creditors
+
+
+def validate_initial_debtor(debtor, creditors):
+    """
+    Проверяет данные должника и кредиторов
+    Возвращает текст ошибки или None
+    """
+    if not all(debtor.get(field) for field in INITIAL_REQUIRED_FIELDS):
+        return 'Все основные поля обязательны для заполнения'
+    
+    inn = debtor['inn']
+    if len(inn) != 12 or not inn.isdigit():
+        return 'ИНН должен содержать ровно 12 цифр'
+    
+    # Проверяем, что все поля кредиторов заполнены
+    for creditor_num, creditor in enumerate(creditors, 1):
+        if not all(creditor.get(key) for _, key in CREDITOR_FORM_FIELDS):
+            return f'Заполните все поля для кредитора {creditor_num}'
+    
+    if not creditors:
+        return 'Необходимо указать хотя бы одного кредитора'
+    return None
+
+
+def build_initial_replacements(debtor, creditors, current_date, court=None):
+    """
+    Формирует словарь замен для первоначальных документов
+    debtor — поля должника (как из read_initial_form), creditors — список кредиторов,
+    court — CourtMatch, если суд уже определен (пакетная генерация, resolve_many)
+    """
+    surname = debtor.get('surname', '')
+    name = debtor.get('name', '')
+    patronymic = debtor.get('patronymic', '')
+    surname_genitive = debtor.get('surname_genitive', '')
+    name_genitive = debtor.get('name_genitive', '')
+    patronymic_genitive = debtor.get('patronymic_genitive', '')
+    surname_dative = debtor.get('surname_dative', '')
+    name_dative = debtor.get('name_dative', '')
+    patronymic_dative = debtor.get('patronymic_dative', '')
+    birth_date = debtor.get('birth_date', '')
+    birth_place = debtor.get('birth_place', '')
+    passport_series = debtor.get('passport_series', '')
+    passport_number = debtor.get('passport_number', '')
+    passport_issued_by = debtor.get('passport_issued_by', '')
+    passport_issue_date = debtor.get('passport_issue_date', '')
+    inn = debtor.get('inn', '')
+    snils = debtor.get('snils', '')
+    region = debtor.get('region', '')
+    district = debtor.get('district', '')
+    city = debtor.get('city', '')
+    street = debtor.get('street', '')
+    house_number = debtor.get('house_number', '')
+    building_number = debtor.get('building_number', '')
+    apartment_number = debtor.get('apartment_number', '')
+    registered_address = debtor.get('registered_address', '')
+    debt_amount_digits = debtor.get('debt_amount_digits', '')
+    debt_amount_words = debtor.get('debt_amount_words', '')
+    state_duty = debtor.get('state_duty', '')
+    state_duty_exemption_reason = debtor.get('state_duty_exemption_reason', '')
+    has_marriage = debtor.get('has_marriage', '')
+    has_children = debtor.get('has_children', '')
+    case_number = debtor.get('case_number', '')
+    judge_name = debtor.get('judge_name', '')
+    
+    # Формируем значение для плейсхолдера {госпошлина}
+    state_duty_text = ""
+    try:
+        if state_duty and state_duty != '0':
+            duty_amount = float(state_duty.replace(',', '.').replace(' ', ''))
+            if duty_amount > 0:
+                # Госпошлина указана и больше 0
+                state_duty_text = f"{state_duty} рублей"
             elif state_duty_exemption_reason:
-                # Пустое поле, но есть причина освобождения
+                # Указан 0 и есть причина освобождения
                 state_duty_text = f"Освобожден в силу {state_duty_exemption_reason}"
             else:
-                # Пусто и без причины - стандартная сумма
-                state_duty_text = "300 рублей"
-        except (ValueError, AttributeError):
-            # Ошибка парсинга - используем как есть или дефолт
-            if state_duty:
-                state_duty_text = f"{state_duty} рублей"
-            else:
+                # Указан 0, но причины нет - используем дефолт
                 state_duty_text = "300 рублей"
+        elif state_duty_exemption_reason:
+            # Пустое поле, но есть причина освобождения
+            state_duty_text = f"Освобожден в силу {state_duty_exemption_reason}"
+        else:
+            # Пусто и без причины - стандартная сумма
+            state_duty_text = "300 рублей"
+    except (ValueError, AttributeError):
+        # Ошибка парсинга - используем как есть или дефолт
+        if state_duty:
+            state_duty_text = f"{state_duty} рублей"
+        else:
+            state_duty_text = "300 рублей"
+    
+    # Получаем первые буквы имени и отчества
+    first_letter_name = name[0].upper() if name else ''
+    first_letter_patronymic = patronymic[0].upper() if patronymic else ''
+    
+    # Получаем название месяца на русском языке в родительном падеже
+    months_ru_genitive = [
+        '', 'января', 'февраля', 'марта', 'апреля', 'мая', 'июня',
+        'июля', 'августа', 'сентября', 'октября', 'ноября', 'декабря'
+    ]
+    month_name = months_ru_genitive[current_date.month]
+    month_name_genitive = months_ru_genitive[current_date.month]
+    
+    # Форматируем дату рождения
+    try:
+        birth_date_obj = datetime.strptime(birth_date, '%Y-%m-%d')
+        formatted_birth_date = birth_date_obj.strftime('%d.%m.%Y')
+    except ValueError:
+        formatted_birth_date = birth_date
+    
+    # Форматируем дату выдачи паспорта
+    try:
+        passport_issue_date_obj = datetime.strptime(passport_issue_date, '%Y-%m-%d')
+        formatted_passport_issue_date = passport_issue_date_obj.strftime('%d.%m.%Y')
+    except ValueError:
+        formatted_passport_issue_date = passport_issue_date
+    
+    # Формируем полное ФИО должника в разных падежах
+    full_name = f"{surname} {name} {patronymic}"
+    full_name_genitive = f"{surname_genitive} {name_genitive} {patronymic_genitive}"
+    full_name_dative = f"{surname_dative} {name_dative} {patronymic_dative}"
+    
+    # Определяем суд по адресу регистрации
+    if court is None:
+        court = resolve_court(registered_address)
+    court_nominative, court_genitive = court.nominative, court.genitive
+    
+    # Формируем паспортные данные
+    passport_full = f"{passport_series} {passport_number}"
+    
+    # Формируем полную строку с датой рождения и местом рождения
+    birth_info = f"{formatted_birth_date} г.р., место рождения: {birth_place}"
+    
+    # Формируем полную строку с паспортными данными
+    passport_info = f"Паспорт РФ {passport_full}\nВыдан {passport_issued_by}\nдата выдачи: {formatted_passport_issue_date}"
+    
+    # Вычисляем общую сумму задолженности
+    total_debt = calculate_total_debt(creditors)
+    formatted_total_debt = format_amount(str(total_debt))
+    
+    # Преобразуем данные о браке и детях: полный текст от первого лица
+    marriage_text = "Состою в браке" if has_marriage == 'yes' else "Не состою в браке"
+    children_text = "Имею несовершеннолетних детей" if has_children == 'yes' else "Не имею несовершеннолетних детей"
+    
+    # Подготавливаем основные замены (включая новые поля из list-of-creditors-final.py)
+    replacements = {
+        # Суд (определяется автоматически по адресу регистрации)
+        "{Суд}": court_nominative,
+        "{суд}": court_nominative,
+        "{Суд в родительном падеже}": court_genitive,
+        "{суд в родительном падеже}": court_genitive,
         
-        # Получаем данные о браке и детях
-        has_marriage = request.form.get('has_marriage', '').strip()  # 'yes' или 'no'
-        has_children = request.form.get('has_children', '').strip()  # 'yes' или 'no'
+        # Основные персональные данные (именительный падеж)
+        "{Фамилия}": surname,
+        "{Фамилия} ": surname + " ",
+        "{фамилия}": surname,
+        "{фамилия} ": surname + " ",
+        "{Имя}": name,
+        "{имя}": name,
+        "{Отчество}": patronymic,
+        "{отчество}": patronymic,
+        "{ФИО}": full_name,
+        "{ФИО должника}": full_name,
+        "я я я": full_name_dative,  # Плейсхолдер ФИО в дательном падеже из шаблона
         
-        # Получаем данные о деле и судье (для документа СРО)
-        case_number = request.form.get('case_number', '').strip()
-        judge_name = request.form.get('judge_name', '').strip()
+        # ФИО в родительном падеже (кого? чего?)
+        "{Фамилия родительный}": surname_genitive,
+        "{Имя родительный}": name_genitive,
+        "{Отчество родительный}": patronymic_genitive,
+        "{ФИО родительный}": full_name_genitive,
+        "{Фамилия в родительном падеже}": surname_genitive,
+        "{Имя в родительном падеже}": name_genitive,
+        "{Отчество в родительном падеже}": patronymic_genitive,
+        "{Отчество в родительном падеже }": patronymic_genitive,  # С пробелом в конце
         
-        # Валидация основных полей
-        required_fields = [surname, name, patronymic, surname_genitive, name_genitive, 
-                          patronymic_genitive, surname_dative, name_dative, patronymic_dative,
-                          birth_date, birth_place, passport_series, passport_number,
-                          passport_issued_by, passport_issue_date,
-                          inn, snils, region, street, house_number, registered_address,
-                          debt_amount_digits, debt_amount_words]
-        if not all(required_fields):
-            flash('Все основные поля обязательны для заполнения', 'error')
-            return redirect(url_for('initial_documents'))
+        # ФИО в дательном падеже (кому? чему?)
+        "{Фамилия дательный}": surname_dative,
+        "{Имя дательный}": name_dative,
+        "{Отчество дательный}": patronymic_dative,
+        "{ФИО дательный}": full_name_dative,
+        "{Фамилия в дательном падеже}": surname_dative,
+        "{Имя в дательном падеже}": name_dative,
+        "{Отчество в дательном падеже}": patronymic_dative,
         
-        if len(inn) != 12 or not inn.isdigit():
-            flash('ИНН должен содержать ровно 12 цифр', 'error')
-            return redirect(url_for('initial_documents'))
+        # Дата и место рождения
+        "{дата рождения}": formatted_birth_date,
+        "{dd.mm.yyyy дата рождения}": formatted_birth_date,
+        "{место рождения}": birth_place,
+        "{дата и место рождения}": birth_info,
         
-        # Получаем данные о кредиторах с детальной информацией
-        creditors = []
-        creditor_num = 1
-        while True:
-            creditor_name = request.form.get(f'creditor_name_{creditor_num}', '').strip()
-            creditor_address = request.form.get(f'creditor_address_{creditor_num}', '').strip()
-            obligation_content = request.form.get(f'obligation_content_{creditor_num}', '').strip()
-            obligation_basis = request.form.get(f'obligation_basis_{creditor_num}', '').strip()
-            obligation_amount = request.form.get(f'obligation_amount_{creditor_num}', '').strip()
-            debt_amount = request.form.get(f'debt_amount_{creditor_num}', '').strip()
-            penalties = request.form.get(f'penalties_{creditor_num}', '').strip()
-            
-            # Если основные поля кредитора пусты, прекращаем поиск
-            if not creditor_name and not creditor_address:
-                break
-            
-            # Проверяем, что все поля кредитора заполнены
-            creditor_fields = [creditor_name, creditor_address, obligation_content, 
-                              obligation_basis, obligation_amount, debt_amount, penalties]
-            if not all(creditor_fields):
-                flash(f'Заполните все поля для кредитора {creditor_num}', 'error')
-                return redirect(url_for('initial_documents'))
-            
-            creditors.append({
-                'name': creditor_name,
-                'address': creditor_address,
-                'Содержание обязательства': obligation_content,
-                'Кредитор': creditor_name,
-                'Место нахождения': creditor_address,
-                'Основание': obligation_basis,
-                'Сумма обязательства': obligation_amount,
-                'Задолженность': debt_amount,
-                'Штрафы': penalties
-            })
-            creditor_num += 1
+        # Паспортные данные
+        "{паспортные данные}": passport_info,
+        "{серия и номер паспорта}": passport_full,
+        "{паспорт серия}": passport_series,
+        "{паспорт номер}": passport_number,
+        "{паспорт кем выдан}": passport_issued_by,
+        "{паспорт дата выдачи}": formatted_passport_issue_date,
+        "фываываыфа": passport_issued_by,  # Плейсхолдер для "кем выдан" из шаблона
+        
+        # ИНН и СНИЛС
+        "{ИНН}": inn,
+        "{СНИЛС}": snils,
+        
+        # Брак и дети (все варианты плейсхолдеров) - полный текст
+        "{дети}": children_text,
+        "{брак}": marriage_text,
+        "- нет": f"- {children_text}",
+        "- да": f"- {marriage_text}",
         
-        if not creditors:
-            flash('Необходимо указать хотя бы одного кредитора', 'error')
+        # Детализированный адрес
+        "{субъект РФ}": region,
+        "{район (при наличии)}": district,
+        "{город (при наличии)}": city,
+        "{населенный пункт}": city,
+        "{улица}": street,
+        "{номер дома}": house_number,
+        "{номер корпуса}": building_number,
+        "{номер корпуса (может быть пустым)}": building_number,
+        "{номер квартиры}": apartment_number,
+        "{номер квартиры может быть пустым}": apartment_number,
+        "{Зарегистрирован по адресу}": registered_address,
+        "фываыфва": registered_address,  # Плейсхолдер для адреса из шаблона
+        
+        # Финансовая информация
+        "{сумма долга цифрами}": debt_amount_digits,
+        "{сумма долга буквами}": debt_amount_words,
+        "{общая сумма задолженности}": f"{formatted_total_debt} рублей",
+        "{сумма требований}": formatted_total_debt,
+        "{госпошлина}": state_duty_text,  # Форматированная строка с госпошлиной или причиной освобождения
+        "123213": debt_amount_digits,  # Плейсхолдер для суммы цифрами из шаблона
+        "аываыа": debt_amount_words,  # Плейсхолдер для суммы прописью из шаблона
+        
+        # Дата и подпись
+        "{dd}.{mm}.{yyyy} г.": f"{current_date.day:02d}.{current_date.month:02d}.{current_date.year} г.",
+        "{dd}.{mm}.{yyyy}г.": f"{current_date.day:02d}.{current_date.month:02d}.{current_date.year}г.",
+        "{dd}": f"{current_date.day:02d}",
+        "{mm}": f"{current_date.month:02d}",
+        "{month name}": month_name,
+        "{yyyy}": str(current_date.year),
+        "{дата}": current_date.strftime("%d.%m.%Y"),
+        "{число месяца}": str(current_date.day),
+        "{месяц}": month_name,
+        "{месяц в родительном падеже}": month_name_genitive,
+        "{месяц В РОДИТЕЛЬНОМ ПАДЕЖЕ, ты сам должен определить}": month_name_genitive,
+        "{год}": str(current_date.year),
+        "{Первая буква имени}": first_letter_name,
+        "{первая буква отчества}": first_letter_patronymic,
+        "{Фамилия и первые буквы имени и отчества}": f"{surname} {first_letter_name}.{first_letter_patronymic}.",
+        "я Я.Я.": f"{surname} {first_letter_name}.{first_letter_patronymic}.",  # Плейсхолдер для подписи из шаблона
+        
+        # Плейсхолдеры для информационного сообщения
+        "{ИНН ДОЛЖНИКА}": inn,
+        "{СНИЛС ДОЛЖНИКА}": snils,
+        "{номер дела}": case_number if case_number else "",
+        "{Номер дела}": case_number if case_number else "",
+        "{месторасположение должника}": registered_address,
+        "{сумма требований к должнику}": f"{formatted_total_debt} рублей",
+        
+        # Плейсхолдеры для заявления от СРО
+        "{дело}": case_number if case_number else "",
+        "{судья}": judge_name if judge_name else "",
+        
+        # Кредиторы (общие плейсхолдеры)
+        "{Наименование кредитора}": creditors[0]['name'] if creditors else "",
+        "{Почтовый индекс и адрес}": creditors[0]['address'] if creditors else "",
+        "{место нахождения кредитора}": creditors[0]['address'] if creditors else "",
+        "{основание возникновения}": creditors[0]['Основание'] if creditors else "",
+        "{сумма обязательства}": creditors[0]['Сумма обязательства'] if creditors else "",
+        "{сумма задолженности}": creditors[0]['Задолженность'] if creditors else "",
+        "{штрафы + пени}": creditors[0]['Штрафы'] if creditors else "",
+    }
+    
+    # Добавляем замены для первых кредиторов (из оригинального кода)
+    if len(creditors) >= 1:
+        replacements.update({
+            "{кредит1}": creditors[0]['Содержание обязательства'],
+            "{кредитор1}": creditors[0]['Кредитор'],
+            "{Наименование кредитора 1}": creditors[0]['name'],
+            "{адрес кредитора 1}": creditors[0]['address'],
+            "{Почтовый индекс и адрес 1}": creditors[0]['address'],
+            "{место нахождения кредитора 1}": creditors[0]['address'],
+            "{основание возникновения 1}": creditors[0]['Основание'],
+            "{сумма обязательства 1}": creditors[0]['Сумма обязательства'],
+            "{сумма задолженности 1}": creditors[0]['Задолженность'],
+            "{штрафы + пени 1}": creditors[0]['Штрафы'],
+        })
+        logger.debug("Добавлены плейсхолдеры для кредитора 1: %s", creditors[0].get('name', 'Неизвестно'))
+    else:
+        replacements.update({
+            "{кредит1}": "",
+            "{кредитор1}": "",
+            "{Наименование кредитора 1}": "",
+            "{адрес кредитора 1}": "",
+            "{Почтовый индекс и адрес 1}": "",
+            "{место нахождения кредитора 1}": "",
+            "{основание возникновения 1}": "",
+            "{сумма обязательства 1}": "",
+            "{сумма задолженности 1}": "",
+            "{штрафы + пени 1}": "",
+        })
+    
+    if len(creditors) >= 2:
+        replacements.update({
+            "{кредит2}": creditors[1]['Содержание обязательства'],
+            "{кредитор2}": creditors[1]['Кредитор'],
+            "{Наименование кредитора 2}": creditors[1]['name'],
+            "{адрес кредитора 2}": creditors[1]['address'],
+            "{Почтовый индекс и адрес 2}": creditors[1]['address'],
+            "{место нахождения кредитора 2}": creditors[1]['address'],
+            "{основание возникновения 2}": creditors[1]['Основание'],
+            "{сумма обязательства 2}": creditors[1]['Сумма обязательства'],
+            "{сумма задолженности 2}": creditors[1]['Задолженность'],
+            "{штрафы + пени 2}": creditors[1]['Штрафы'],
+        })
+        logger.debug("Добавлены плейсхолдеры для кредитора 2: %s", creditors[1].get('name', 'Неизвестно'))
+    else:
+        replacements.update({
+            "{кредит2}": "",
+            "{кредитор2}": "",
+            "{Наименование кредитора 2}": "",
+            "{адрес кредитора 2}": "",
+            "{Почтовый индекс и адрес 2}": "",
+            "{место нахождения кредитора 2}": "",
+            "{основание возникновения 2}": "",
+            "{сумма обязательства 2}": "",
+            "{сумма задолженности 2}": "",
+            "{штрафы + пени 2}": "",
+        })
+    
+    # Добавляем замены для всех кредиторов (начиная с 3-го, т.к. 1-2 уже добавлены)
+    for i in range(3, len(creditors) + 1):
+        creditor = creditors[i - 1]  # индекс с 0
+        replacements.update({
+            f"{{кредит{i}}}": creditor['Содержание обязательства'],
+            f"{{кредитор{i}}}": creditor['Кредитор'],
+            f"{{Наименование кредитора {i}}}": creditor['name'],
+            f"{{адрес кредитора {i}}}": creditor['address'],
+            f"{{Почтовый индекс и адрес {i}}}": creditor['address'],
+            f"{{место нахождения кредитора {i}}}": creditor['address'],
+            f"{{основание возникновения {i}}}": creditor['Основание'],
+            f"{{сумма обязательства {i}}}": creditor['Сумма обязательства'],
+            f"{{сумма задолженности {i}}}": creditor['Задолженность'],
+            f"{{штрафы + пени {i}}}": creditor['Штрафы'],
+        })
+        logger.debug("Добавлены плейсхолдеры для кредитора %d: %s", i, creditor.get('name', 'Неизвестно'))
+    
+    # Общие плейсхолдеры для кредиторов
+    for i, creditor in enumerate(creditors, 1):
+        replacements[f"{{Кредитор {i}}}"] = creditor.get('Кредитор', f"Кредитор {i}")
+        # НЕ заменяем "Кредитор 1" без скобок, т.к. это нужно для функции add_additional_creditors_to_text
+        # replacements[f"Кредитор {i}"] = creditor.get('name', f"Кредитор {i}")  # УБРАНО
+        replacements[f"{{Кредитор n}}"] = f"Кредитор {i}" if i == 1 else replacements.get(f"{{Кредитор n}}", f"Кредитор {i}")
+        if i > 1:
+            replacements[f"{{Кредитор n+{i-1}}}"] = f"Кредитор {i}"
+    
+    # Добавляем плейсхолдеры "ЯЯ" для кредиторов
+    if len(creditors) >= 1:
+        replacements["ЯЯ"] = creditors[0]['name']  # Название первого кредитора
+    if len(creditors) >= 2:
+        replacements["ББ"] = creditors[1]['name']  # На случай, если второй кредитор тоже "ЯЯ" или другой
+    
+    return replacements
+
+
+def wants_async():
+    """
+    Клиент просит режим задачи: ?async=1 (или поле формы async=1)
+    либо заголовок Prefer: respond-async
+    """
+    if request.values.get('async') in ('1', 'true', 'yes'):
+        return True
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+
+def job_accepted(job):
+    """Ответ 202 с номером задачи и ссылками для опроса и скачивания"""
+    response = jsonify({
+        **job.to_dict(),
+        'status_url': url_for('job_status', job_id=job.id),
+        'download_url': url_for('job_download', job_id=job.id),
+    })
+    response.status_code = 202
+    response.headers['Location'] = url_for('job_status', job_id=job.id)
+    return response
+
+
+def api_request():
+    """
+    Запрос к API, а не отправка HTML-формы: тело JSON
+    или multipart с загруженным файлом (HTML-формы файлов не отправляют)
+    """
+    return request.is_json or bool(request.files)
+
+
+def read_initial_api_request():
+    """
+    Должник и кредиторы из запроса к API /initial
+      JSON: {поля формы /initial..., "creditors": [{...}, ...]}
+      multipart: поля должника — поля формы, кредиторы — файл creditors_csv
+    Все поля проверяются за один проход; при ошибках — PayloadError со всеми ошибками
+    """
+    errors = Errors()
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            raise PayloadError([{'field': '', 'error': 'Ожидается JSON-объект с полями должника и списком "creditors"'}])
+        debtor, creditors = read_initial_json(payload, errors)
+    else:
+        debtor = read_debtor(request.form, INITIAL_FIELDS, INITIAL_REQUIRED_FIELDS, errors)
+        upload = request.files.get('creditors_csv')
+        if upload is None:
+            errors.add('creditors_csv', 'нужен файл CSV с кредиторами')
+            items = ()
+        else:
+            # Файл читается построчно из потока загрузки
+            items = iter_csv_rows(upload.stream, CREDITOR_FORM_FIELDS, errors)
+        creditors = read_creditors(items, CREDITOR_FORM_FIELDS, API_MAX_CREDITORS, errors)
+    errors.raise_if_any()
+    return debtor, creditors
+
+
+def read_initial_json(payload, errors):
+    """
+    Должник и кредиторы из JSON-объекта /initial: тела запроса или записи пакета
+    /api/batch/initial. Поля проходят схему payload.py; ошибки добавляются в errors
+    """
+    debtor = read_debtor(payload, INITIAL_FIELDS, INITIAL_REQUIRED_FIELDS, errors)
+    items = json_creditors(payload.get('creditors'), errors)
+    return debtor, read_creditors(items, CREDITOR_FORM_FIELDS, API_MAX_CREDITORS, errors)
+
+
+def run_admitted(weight, route, func, *args):
+    """func(*args) в слоте лимитера генераций; задача ждет своей очереди без отказа"""
+    with admission.acquire(weight, route, bounded=False):
+        return func(*args)
+
+
+def overloaded_response(error):
+    """503 с Retry-After: генерация не допущена лимитером"""
+    message = 'Сервис перегружен, повторите запрос через несколько секунд'
+    # По типу тела, без разбора: HTML-формы отправляются как x-www-form-urlencoded
+    if request.mimetype != 'application/x-www-form-urlencoded':
+        response = jsonify(error=message, retry_after=error.retry_after)
+    else:
+        response = Response(message, mimetype='text/plain')
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def release_after(documents, slot):
+    """Документы архива; слот освобождается сразу после последнего (до конца скачивания)"""
+    try:
+        yield from documents
+    finally:
+        slot.release()
+
+
+def admitted_archive_response(documents, filename, weight):
+    """
+    Потоковый ответ с архивом, если лимитер допустил генерацию, иначе 503
+    Слот освобождается, когда документы сгенерированы или ответ закрыт (клиент отключился)
+    """
+    try:
+        with g.timer.stage('queue'):
+            slot = admission.acquire(weight, g.timer.route)
+    except Overloaded as e:
+        return overloaded_response(e)
+    try:
+        response = archive_response(release_after(documents, slot), filename, g.timer.stages)
+    except BaseException:
+        slot.release()
+        raise
+    response.call_on_close(slot.release)
+    return response
+
+
+def initial_archive_response(replacements, creditors, surname, name, current_date):
+    """Архив первоначальных документов (потоком) или задача при ?async=1"""
+    filename = f"initial_documents_{surname}_{name}_{current_date.strftime('%Y%m%d')}.zip"
+    weight = admission.weight(len(creditors))
+
+    if wants_async():
+        # У задачи свой таймер: стадии сохраняются вместе с ней и отдаются при скачивании
+        timer = StageTimer(g.timer.route)
+        job = job_queue.submit(filename, run_admitted, weight, timer.route, generate_initial_documents_archive,
+                               replacements, creditors, surname, name, current_date, timer,
+                               timings=timer.stages)
+        return job_accepted(job)
+
+    # Архив отдается потоково: документы пишутся клиенту по мере генерации
+    return admitted_archive_response(
+        iter_rendered_documents(INITIAL_DOCUMENTS, replacements, creditors, surname, name, current_date),
+        filename,
+        weight
+    )
+
+
+def case_archive_response(replacements, surname, name, current_date):
+    """Архив документов после открытия дела (потоком) или задача при ?async=1"""
+    filename = f"case_documents_{surname}_{name}_{current_date.strftime('%Y%m%d')}.zip"
+    weight = admission.weight()
+
+    if wants_async():
+        timer = StageTimer(g.timer.route)
+        job = job_queue.submit(filename, run_admitted, weight, timer.route, generate_case_documents_archive,
+                               replacements, surname, name, current_date, timer,
+                               timings=timer.stages)
+        return job_accepted(job)
+
+    # Архив отдается потоково: документы пишутся клиенту по мере генерации
+    return admitted_archive_response(
+        iter_rendered_documents(CASE_DOCUMENTS, replacements, None, surname, name, current_date),
+        filename,
+        weight
+    )
+
+
+def initial_templates_exist():
+    """Есть хотя бы один из основных шаблонов первоначальных документов"""
+    return template_cache.exists("zayav.docx") or template_cache.exists("list-of-creditors.docx")
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Состояние задачи генерации"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify(error='Задача не найдена или ее результат уже удален'), 404
+    return jsonify({**job.to_dict(), 'download_url': url_for('job_download', job_id=job.id)})
+
+
+@app.route('/jobs/<job_id>/download')
+def job_download(job_id):
+    """Скачивание готового архива задачи"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify(error='Задача не найдена или ее результат уже удален'), 404
+    if job.status != DONE:
+        return jsonify(job.to_dict()), 409
+    result = job_queue.result_source(job)
+    if result is None:
+        return jsonify(error='Задача не найдена или ее результат уже удален'), 404
+    if isinstance(result, bytes):
+        result = io.BytesIO(result)
+    try:
+        # conditional: Range (докачка, 206), If-Range, If-None-Match; файл с диска
+        # gunicorn отдает через sendfile без копирования в процесс
+        response = send_file(
+            result, mimetype='application/zip', as_attachment=True, download_name=job.filename,
+            conditional=True, etag=job.id, last_modified=job.finished_at, max_age=0,
+        )
+    except FileNotFoundError:
+        # Результат удален по сроку между проверкой и отправкой
+        return jsonify(error='Задача не найдена или ее результат уже удален'), 404
+    # werkzeug объявляет Accept-Ranges только в ответе на Range: клиенту нужно знать заранее
+    response.headers.setdefault('Accept-Ranges', 'bytes')
+    if job.timings:
+        # Стадии генерации архива в задаче (total добавит after_request — время скачивания)
+        response.headers['Server-Timing'] = server_timing_header(job.timings)
+    return response
+
+
+@app.before_request
+def assign_request_id():
+    """Номер запроса для журнала: из X-Request-ID (прокси) или новый"""
+    g.request_id = new_request_id(request.headers.get('X-Request-ID'))
+    request_id.set(g.request_id)
+
+
+@app.after_request
+def add_request_id(response):
+    response.headers['X-Request-ID'] = g.request_id
+    return response
+
+
+@app.before_request
+def start_request_timer():
+    """Таймер стадий запроса; маршрут — шаблон URL (метка метрик)"""
+    g.timer = StageTimer(request.url_rule.rule if request.url_rule else 'unknown')
+
+
+# Маршруты генерации: при полной очереди лимитера отказ до разбора данных
+GENERATION_ENDPOINTS = ('initial_documents', 'case_documents', 'batch_initial_documents')
+
+
+@app.before_request
+def shed_generation_load():
+    """503 сразу, если очередь генераций полна: разбор формы с кредиторами тоже стоит CPU"""
+    if request.method == 'POST' and request.endpoint in GENERATION_ENDPOINTS:
+        try:
+            admission.check(g.timer.route)
+        except Overloaded as e:
+            return overloaded_response(e)
+
+
+@app.after_request
+def add_server_timing(response):
+    """
+    Заголовок Server-Timing: стадии, выполненные до отправки заголовков, и total.
+    У потокового архива документы генерируются уже после заголовков — их стадии
+    видны в /metrics, а в режиме задачи (?async=1) — в Server-Timing скачивания
+    """
+    timer = g.get('timer')
+    if timer is not None:
+        value = timer.server_timing()
+        if response.headers.get('Server-Timing'):
+            value = f"{response.headers['Server-Timing']}, {value}"
+        response.headers['Server-Timing'] = value
+    return response
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Метрики генерации в формате Prometheus"""
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/initial', methods=['GET', 'POST'])
+def initial_documents():
+    """Форма и генерация первоначальных документов (без номера дела)"""
+    if request.method == 'POST':
+        if api_request():
+            return initial_documents_api()
+        
+        # Получаем данные должника и кредиторов из формы
+        with g.timer.stage('parse'):
+            debtor = read_initial_form(request.form)
+            creditors = read_form_creditors(request.form)
+            error = validate_initial_debtor(debtor, creditors)
+        
+        if error:
+            flash(error, 'error')
             return redirect(url_for('initial_documents'))
         
         try:
             # Получаем текущую дату
             current_date = datetime.now()
             
-            # Получаем первые буквы имени и отчества
-            first_letter_name = name[0].upper() if name else ''
-            first_letter_patronymic = patronymic[0].upper() if patronymic else ''
-            
-            # Получаем название месяца на русском языке в родительном падеже
-            months_ru_genitive = [
-                '', 'января', 'февраля', 'марта', 'апреля', 'мая', 'июня',
-                'июля', 'августа', 'сентября', 'октября', 'ноября', 'декабря'
-            ]
-            month_name = months_ru_genitive[current_date.month]
-            month_name_genitive = months_ru_genitive[current_date.month]
-            
-            # Форматируем дату рождения
-            try:
-                birth_date_obj = datetime.strptime(birth_date, '%Y-%m-%d')
-                formatted_birth_date = birth_date_obj.strftime('%d.%m.%Y')
-            except ValueError:
-                formatted_birth_date = birth_date
-            
-            # Форматируем дату выдачи паспорта
-            try:
-                passport_issue_date_obj = datetime.strptime(passport_issue_date, '%Y-%m-%d')
-                formatted_passport_issue_date = passport_issue_date_obj.strftime('%d.%m.%Y')
-            except ValueError:
-                formatted_passport_issue_date = passport_issue_date
-            
-            # Формируем полное ФИО должника в разных падежах
-            full_name = f"{surname} {name} {patronymic}"
-            full_name_genitive = f"{surname_genitive} {name_genitive} {patronymic_genitive}"
-            full_name_dative = f"{surname_dative} {name_dative} {patronymic_dative}"
-            
-            # Определяем суд по адресу регистрации
-            court_nominative, court_genitive = determine_court_by_address(registered_address)
-            
-            # Формируем паспортные данные
-            passport_full = f"{passport_series} {passport_number}"
-            
-            # Формируем полную строку с датой рождения и местом рождения
-            birth_info = f"{formatted_birth_date} г.р., место рождения: {birth_place}"
-            
-            # Формируем полную строку с паспортными данными
-            passport_info = f"Паспорт РФ {passport_full}\nВыдан {passport_issued_by}\nдата выдачи: {formatted_passport_issue_date}"
-            
-            # Вычисляем общую сумму задолженности
-            total_debt = calculate_total_debt(creditors)
-            formatted_total_debt = format_amount(str(total_debt))
-            
-            # Преобразуем данные о браке и детях: полный текст от первого лица
-            marriage_text = "Состою в браке" if has_marriage == 'yes' else "Не состою в браке"
-            children_text = "Имею несовершеннолетних детей" if has_children == 'yes' else "Не имею несовершеннолетних детей"
-            
-            # Подготавливаем основные замены (включая новые поля из list-of-creditors-final.py)
-            replacements = {
-                # Суд (определяется автоматически по адресу регистрации)
-                "{Суд}": court_nominative,
-                "{суд}": court_nominative,
-                "{Суд в родительном падеже}": court_genitive,
-                "{суд в родительном падеже}": court_genitive,
-                
-                # Основные персональные данные (именительный падеж)
-                "{Фамилия}": surname,
-                "{Фамилия} ": surname + " ",
-                "{фамилия}": surname,
-                "{фамилия} ": surname + " ",
-                "{Имя}": name,
-                "{имя}": name,
-                "{Отчество}": patronymic,
-                "{отчество}": patronymic,
-                "{ФИО}": full_name,
-                "{ФИО должника}": full_name,
-                "я я я": full_name_dative,  # Плейсхолдер ФИО в дательном падеже из шаблона
-                
-                # ФИО в родительном падеже (кого? чего?)
-                "{Фамилия родительный}": surname_genitive,
-                "{Имя родительный}": name_genitive,
-                "{Отчество родительный}": patronymic_genitive,
-                "{ФИО родительный}": full_name_genitive,
-                "{Фамилия в родительном падеже}": surname_genitive,
-                "{Имя в родительном падеже}": name_genitive,
-                "{Отчество в родительном падеже}": patronymic_genitive,
-                "{Отчество в родительном падеже }": patronymic_genitive,  # С пробелом в конце
-                
-                # ФИО в дательном падеже (кому? чему?)
-                "{Фамилия дательный}": surname_dative,
-                "{Имя дательный}": name_dative,
-                "{Отчество дательный}": patronymic_dative,
-                "{ФИО дательный}": full_name_dative,
-                "{Фамилия в дательном падеже}": surname_dative,
-                "{Имя в дательном падеже}": name_dative,
-                "{Отчество в дательном падеже}": patronymic_dative,
-                
-                # Дата и место рождения
-                "{дата рождения}": formatted_birth_date,
-                "{dd.mm.yyyy дата рождения}": formatted_birth_date,
-                "{место рождения}": birth_place,
-                "{дата и место рождения}": birth_info,
-                
-                # Паспортные данные
-                "{паспортные данные}": passport_info,
-                "{серия и номер паспорта}": passport_full,
-                "{паспорт серия}": passport_series,
-                "{паспорт номер}": passport_number,
-                "{паспорт кем выдан}": passport_issued_by,
-                "{паспорт дата выдачи}": formatted_passport_issue_date,
-                "фываываыфа": passport_issued_by,  # Плейсхолдер для "кем выдан" из шаблона
-                
-                # ИНН и СНИЛС
-                "{ИНН}": inn,
-                "{СНИЛС}": snils,
-                
-                # Брак и дети (все варианты плейсхолдеров) - полный текст
-                "{дети}": children_text,
-                "{брак}": marriage_text,
-                "- нет": f"- {children_text}",
-                "- да": f"- {marriage_text}",
-                
-                # Детализированный адрес
-                "{субъект РФ}": region,
-                "{район (при наличии)}": district,
-                "{город (при наличии)}": city,
-                "{населенный пункт}": city,
-                "{улица}": street,
-                "{номер дома}": house_number,
-                "{номер корпуса}": building_number,
-                "{номер корпуса (может быть пустым)}": building_number,
-                "{номер квартиры}": apartment_number,
-                "{номер квартиры может быть пустым}": apartment_number,
-                "{Зарегистрирован по адресу}": registered_address,
-                "фываыфва": registered_address,  # Плейсхолдер для адреса из шаблона
-                
-                # Финансовая информация
-                "{сумма долга цифрами}": debt_amount_digits,
-                "{сумма долга буквами}": debt_amount_words,
-                "{общая сумма задолженности}": f"{formatted_total_debt} рублей",
-                "{сумма требований}": formatted_total_debt,
-                "{госпошлина}": state_duty_text,  # Форматированная строка с госпошлиной или причиной освобождения
-                "123213": debt_amount_digits,  # Плейсхолдер для суммы цифрами из шаблона
-                "аываыа": debt_amount_words,  # Плейсхолдер для суммы прописью из шаблона
-                
-                # Дата и подпись
-                "{dd}.{mm}.{yyyy} г.": f"{current_date.day:02d}.{current_date.month:02d}.{current_date.year} г.",
-                "{dd}.{mm}.{yyyy}г.": f"{current_date.day:02d}.{current_date.month:02d}.{current_date.year}г.",
-                "{dd}": f"{current_date.day:02d}",
-                "{mm}": f"{current_date.month:02d}",
-                "{month name}": month_name,
-                "{yyyy}": str(current_date.year),
-                "{дата}": current_date.strftime("%d.%m.%Y"),
-                "{число месяца}": str(current_date.day),
-                "{месяц}": month_name,
-                "{месяц в родительном падеже}": month_name_genitive,
-                "{месяц В РОДИТЕЛЬНОМ ПАДЕЖЕ, ты сам должен определить}": month_name_genitive,
-                "{год}": str(current_date.year),
-                "{Первая буква имени}": first_letter_name,
-                "{первая буква отчества}": first_letter_patronymic,
-                "{Фамилия и первые буквы имени и отчества}": f"{surname} {first_letter_name}.{first_letter_patronymic}.",
-                "я Я.Я.": f"{surname} {first_letter_name}.{first_letter_patronymic}.",  # Плейсхолдер для подписи из шаблона
-                
-                # Плейсхолдеры для информационного сообщения
-                "{ИНН ДОЛЖНИКА}": inn,
-                "{СНИЛС ДОЛЖНИКА}": snils,
-                "{номер дела}": case_number if case_number else "",
-                "{Номер дела}": case_number if case_number else "",
-                "{месторасположение должника}": registered_address,
-                "{сумма требований к должнику}": f"{formatted_total_debt} рублей",
-                
-                # Плейсхолдеры для заявления от СРО
-                "{дело}": case_number if case_number else "",
-                "{судья}": judge_name if judge_name else "",
-                
-                # Кредиторы (общие плейсхолдеры)
-                "{Наименование кредитора}": creditors[0]['name'] if creditors else "",
-                "{Почтовый индекс и адрес}": creditors[0]['address'] if creditors else "",
-                "{место нахождения кредитора}": creditors[0]['address'] if creditors else "",
-                "{основание возникновения}": creditors[0]['Основание'] if creditors else "",
-                "{сумма обязательства}": creditors[0]['Сумма обязательства'] if creditors else "",
-                "{сумма задолженности}": creditors[0]['Задолженность'] if creditors else "",
-                "{штрафы + пени}": creditors[0]['Штрафы'] if creditors else "",
-            }
-            
-            # Добавляем замены для первых кредиторов (из оригинального кода)
-            if len(creditors) >= 1:
-                replacements.update({
-                    "{кредит1}": creditors[0]['Содержание обязательства'],
-                    "{кредитор1}": creditors[0]['Кредитор'],
-                    "{Наименование кредитора 1}": creditors[0]['name'],
-                    "{адрес кредитора 1}": creditors[0]['address'],
-                    "{Почтовый индекс и адрес 1}": creditors[0]['address'],
-                    "{место нахождения кредитора 1}": creditors[0]['address'],
-                    "{основание возникновения 1}": creditors[0]['Основание'],
-                    "{сумма обязательства 1}": creditors[0]['Сумма обязательства'],
-                    "{сумма задолженности 1}": creditors[0]['Задолженность'],
-                    "{штрафы + пени 1}": creditors[0]['Штрафы'],
-                })
-                print(f"✅ Добавлены плейсхолдеры для кредитора 1: {creditors[0].get('name', 'Неизвестно')}")
-            else:
-                replacements.update({
-                    "{кредит1}": "",
-                    "{кредитор1}": "",
-                    "{Наименование кредитора 1}": "",
-                    "{адрес кредитора 1}": "",
-                    "{Почтовый индекс и адрес 1}": "",
-                    "{место нахождения кредитора 1}": "",
-                    "{основание возникновения 1}": "",
-                    "{сумма обязательства 1}": "",
-                    "{сумма задолженности 1}": "",
-                    "{штрафы + пени 1}": "",
-                })
-            
-            if len(creditors) >= 2:
-                replacements.update({
-                    "{кредит2}": creditors[1]['Содержание обязательства'],
-                    "{кредитор2}": creditors[1]['Кредитор'],
-                    "{Наименование кредитора 2}": creditors[1]['name'],
-                    "{адрес кредитора 2}": creditors[1]['address'],
-                    "{Почтовый индекс и адрес 2}": creditors[1]['address'],
-                    "{место нахождения кредитора 2}": creditors[1]['address'],
-                    "{основание возникновения 2}": creditors[1]['Основание'],
-                    "{сумма обязательства 2}": creditors[1]['Сумма обязательства'],
-                    "{сумма задолженности 2}": creditors[1]['Задолженность'],
-                    "{штрафы + пени 2}": creditors[1]['Штрафы'],
-                })
-                print(f"✅ Добавлены плейсхолдеры для кредитора 2: {creditors[1].get('name', 'Неизвестно')}")
-            else:
-                replacements.update({
-                    "{кредит2}": "",
-                    "{кредитор2}": "",
-                    "{Наименование кредитора 2}": "",
-                    "{адрес кредитора 2}": "",
-                    "{Почтовый индекс и адрес 2}": "",
-                    "{место нахождения кредитора 2}": "",
-                    "{основание возникновения 2}": "",
-                    "{сумма обязательства 2}": "",
-                    "{сумма задолженности 2}": "",
-                    "{штрафы + пени 2}": "",
-                })
-            
-            # Добавляем замены для всех кредиторов (начиная с 3-го, т.к. 1-2 уже добавлены)
-            for i in range(3, len(creditors) + 1):
-                creditor = creditors[i - 1]  # индекс с 0
-                replacements.update({
-                    f"{{кредит{i}}}": creditor['Содержание обязательства'],
-                    f"{{кредитор{i}}}": creditor['Кредитор'],
-                    f"{{Наименование кредитора {i}}}": creditor['name'],
-                    f"{{адрес кредитора {i}}}": creditor['address'],
-                    f"{{Почтовый индекс и адрес {i}}}": creditor['address'],
-                    f"{{место нахождения кредитора {i}}}": creditor['address'],
-                    f"{{основание возникновения {i}}}": creditor['Основание'],
-                    f"{{сумма обязательства {i}}}": creditor['Сумма обязательства'],
-                    f"{{сумма задолженности {i}}}": creditor['Задолженность'],
-                    f"{{штрафы + пени {i}}}": creditor['Штрафы'],
-                })
-                print(f"✅ Добавлены плейсхолдеры для кредитора {i}: {creditor.get('name', 'Неизвестно')}")
-            
-            # Общие плейсхолдеры для кредиторов
-            for i, creditor in enumerate(creditors, 1):
-                replacements[f"{{Кредитор {i}}}"] = creditor.get('Кредитор', f"Кредитор {i}")
-                # НЕ заменяем "Кредитор 1" без скобок, т.к. это нужно для функции add_additional_creditors_to_text
-                # replacements[f"Кредитор {i}"] = creditor.get('name', f"Кредитор {i}")  # УБРАНО
-                replacements[f"{{Кредитор n}}"] = f"Кредитор {i}" if i == 1 else replacements.get(f"{{Кредитор n}}", f"Кредитор {i}")
-                if i > 1:
-                    replacements[f"{{Кредитор n+{i-1}}}"] = f"Кредитор {i}"
-            
-            # Добавляем плейсхолдеры "ЯЯ" для кредиторов
-            if len(creditors) >= 1:
-                replacements["ЯЯ"] = creditors[0]['name']  # Название первого кредитора
-            if len(creditors) >= 2:
-                replacements["ББ"] = creditors[1]['name']  # На случай, если второй кредитор тоже "ЯЯ" или другой
+            with g.timer.stage('replacements'):
+                replacements = build_initial_replacements(debtor, creditors, current_date)
             
             # Проверяем наличие хотя бы одного шаблона
-            bankruptcy_template = "zayav.docx"
-            creditors_template = "list-of-creditors.docx"
-            properties_template = "properties.docx"
-            
-            if not os.path.exists(bankruptcy_template) and not os.path.exists(creditors_template):
+            if not initial_templates_exist():
                 flash('Файлы шаблонов не найдены', 'error')
                 return redirect(url_for('initial_documents'))
             
-            # Создаем ZIP-архив с первоначальными документами
-            zip_buffer = generate_initial_documents_archive(replacements, creditors, surname, name, current_date)
-            filename = f"initial_documents_{surname}_{name}_{current_date.strftime('%Y%m%d')}.zip"
-            
-            return send_file(
-                zip_buffer,
-                as_attachment=True,
-                download_name=filename,
-                mimetype='application/zip'
-            )
+            return initial_archive_response(replacements, creditors, debtor['surname'], debtor['name'], current_date)
             
         except Exception as e:
             flash(f'Ошибка при обработке документа: {str(e)}', 'error')
             return redirect(url_for('initial_documents'))
     
-    return render_template('initial.html')
+    return page_response('initial.html')
+
+
+def initial_documents_api():
+    """
+    API /initial: JSON или multipart с CSV кредиторов (см. read_initial_api_request)
+    Ошибки возвращаются JSON: 400 со списком всех ошибок в данных
+    """
+    try:
+        with g.timer.stage('parse'):
+            debtor, creditors = read_initial_api_request()
+    except PayloadError as e:
+        return jsonify(e.to_dict()), 400
+    
+    if not initial_templates_exist():
+        return jsonify(error='Файлы шаблонов не найдены'), 500
+    
+    try:
+        current_date = datetime.now()
+        with g.timer.stage('replacements'):
+            replacements = build_initial_replacements(debtor, creditors, current_date)
+        return initial_archive_response(replacements, creditors, debtor['surname'], debtor['name'], current_date)
+    except Exception as e:
+        return jsonify(error=f'Ошибка при обработке документа: {str(e)}'), 500
+
+
+@app.route('/api/batch/initial', methods=['POST'])
+def batch_initial_documents():
+    """
+    Пакетная генерация первоначальных документов
+
+    Принимает JSON: {"debtors": [{поля формы /initial..., "creditors": [{...}, ...]}, ...]}
+    (или просто список должников). Запись должника — то же, что JSON-запрос к /initial,
+    и проверяется по той же схеме (payload.py); запись с ошибками не генерируется,
+    а попадает в report.json со списком ошибок. Возвращает ZIP с папкой на каждого
+    должника и report.json
+    """
+    payload = request.get_json(silent=True)
+    records = payload.get('debtors') if isinstance(payload, dict) else payload
+    if not isinstance(records, list) or not records:
+        return jsonify(error='Ожидается JSON со списком должников в поле "debtors"'), 400
+    if len(records) > BATCH_MAX_DEBTORS:
+        return jsonify(error=f'Не более {BATCH_MAX_DEBTORS} должников в одном запросе'), 400
+
+    current_date = datetime.now()
+    filename = f"initial_documents_batch_{current_date.strftime('%Y%m%d')}.zip"
+    creditors = sum(
+        len(record['creditors']) for record in records
+        if isinstance(record, dict) and isinstance(record.get('creditors'), list)
+    )
+    return admitted_archive_response(
+        iter_batch_documents(records, current_date), filename, admission.weight(creditors, len(records)))
+
+
+# Поля формы документов после открытия дела
+CASE_FIELDS = (
+    'surname',
+    'name',
+    'patronymic',
+    'inn',
+    'snils',
+    'registered_address',
+    'total_debt',
+    'case_number',
+    'judge_name',
+)
+
+
+def build_case_replacements(debtor, current_date):
+    """
+    Формирует словарь замен для документов после открытия дела
+    debtor — поля формы /with-case: {имя поля: значение}
+    """
+    surname = debtor.get('surname', '')
+    name = debtor.get('name', '')
+    patronymic = debtor.get('patronymic', '')
+    inn = debtor.get('inn', '')
+    snils = debtor.get('snils', '')
+    registered_address = debtor.get('registered_address', '')
+    total_debt = debtor.get('total_debt', '')
+    case_number = debtor.get('case_number', '')
+    judge_name = debtor.get('judge_name', '')
+    
+    # Формируем полное ФИО должника
+    full_name = f"{surname} {name} {patronymic}"
+    
+    # Определяем суд по адресу регистрации
+    court = resolve_court(registered_address)
+    court_nominative, court_genitive = court.nominative, court.genitive
+    
+    # Форматируем сумму требований
+    formatted_total_debt = format_amount(total_debt)
+    
+    # Форматируем имя судьи
+    judge_formatted = format_judge_name(judge_name)
+    
+    # Получаем название месяца на русском языке в родительном падеже
+    months_ru_genitive = [
+        '', 'января', 'февраля', 'марта', 'апреля', 'мая', 'июня',
+        'июля', 'августа', 'сентября', 'октября', 'ноября', 'декабря'
+    ]
+    month_name = months_ru_genitive[current_date.month]
+    month_name_genitive = months_ru_genitive[current_date.month]
+    
+    # Подготавливаем замены (только реально используемые в документах after case)
+    replacements = {
+        # Суд (определяется автоматически по адресу регистрации)
+        "{Суд}": court_nominative,
+        "{суд}": court_nominative,
+        "{Суд в родительном падеже}": court_genitive,
+        "{суд в родительном падеже}": court_genitive,
+        
+        # Основные персональные данные
+        "{ИНН}": inn,
+        "{ФИО}": full_name,
+        "{ФИО должника}": full_name,
+        "{ИНН ДОЛЖНИКА}": inn,
+        "{СНИЛС ДОЛЖНИКА}": snils,
+        
+        # Адрес
+        "{месторасположение должника}": registered_address,
+        
+        # Финансовая информация
+        "{сумма требований}": formatted_total_debt,
+        "{сумма требований к должнику}": f"{formatted_total_debt} рублей",
+        
+        # Информация о деле
+        "{номер дела}": case_number,
+        "{Номер дела}": case_number,
+        "{дело}": case_number,
+        "{судья}": judge_name,
+        "{Фамилия судьи + ее инициалы}": judge_formatted,
+        
+        # Дата
+        "{dd}.{mm}.{yyyy} г.": f"{current_date.day:02d}.{current_date.month:02d}.{current_date.year} г.",
+        "{dd}.{mm}.{yyyy}г.": f"{current_date.day:02d}.{current_date.month:02d}.{current_date.year}г.",
+        "{dd}": f"{current_date.day:02d}",
+        "{mm}": f"{current_date.month:02d}",
+        "{month name}": month_name,
+        "{yyyy}": str(current_date.year),
+        "{дата}": current_date.strftime("%d.%m.%Y"),
+        "{число месяца}": str(current_date.day),
+        "{месяц}": month_name,
+        "{месяц в родительном падеже}": month_name_genitive,
+        "{месяц В РОДИТЕЛЬНОМ ПАДЕЖЕ, ты сам должен определить}": month_name_genitive,
+        "{год}": str(current_date.year),
+    }
+    
+    return replacements
 
 
 @app.route('/with-case', methods=['GET', 'POST'])
 def case_documents():
     """Форма и генерация документов после открытия дела (с номером дела)"""
     if request.method == 'POST':
-        # Получаем основные данные из формы
-        surname = request.form.get('surname', '').strip()
-        name = request.form.get('name', '').strip()
-        patronymic = request.form.get('patronymic', '').strip()
-        inn = request.form.get('inn', '').strip()
-        snils = request.form.get('snils', '').strip()
+        if api_request():
+            return case_documents_api()
         
-        # Получаем адрес
-        registered_address = request.form.get('registered_address', '').strip()
+        # Получаем данные из формы
+        debtor = {field: request.form.get(field, '').strip() for field in CASE_FIELDS}
+        surname = debtor['surname']
+        name = debtor['name']
+        inn = debtor['inn']
         
-        # Получаем общую сумму требований
-        total_debt = request.form.get('total_debt', '').strip()
-        
-        # Получаем данные о деле и судье (ОБЯЗАТЕЛЬНЫ для этой формы)
-        case_number = request.form.get('case_number', '').strip()
-        judge_name = request.form.get('judge_name', '').strip()
-        
-        # Валидация основных полей
-        required_fields = [surname, name, patronymic, inn, snils, 
-                          registered_address, total_debt, case_number, judge_name]
-        if not all(required_fields):
+        # Валидация основных полей (все поля формы обязательны)
+        if not all(debtor.values()):
             flash('Все поля обязательны для заполнения', 'error')
             return redirect(url_for('case_documents'))
         
@@ -1458,87 +1687,53 @@ def case_documents():
         try:
             current_date = datetime.now()
             
-            # Формируем полное ФИО должника
-            full_name = f"{surname} {name} {patronymic}"
-            
-            # Определяем суд по адресу регистрации
-            court_nominative, court_genitive = determine_court_by_address(registered_address)
-            
-            # Форматируем сумму требований
-            formatted_total_debt = format_amount(total_debt)
-            
-            # Форматируем имя судьи
-            judge_formatted = format_judge_name(judge_name)
-            
-            # Получаем название месяца на русском языке в родительном падеже
-            months_ru_genitive = [
-                '', 'января', 'февраля', 'марта', 'апреля', 'мая', 'июня',
-                'июля', 'августа', 'сентября', 'октября', 'ноября', 'декабря'
-            ]
-            month_name = months_ru_genitive[current_date.month]
-            month_name_genitive = months_ru_genitive[current_date.month]
-            
-            # Подготавливаем замены (только реально используемые в документах after case)
-            replacements = {
-                # Суд (определяется автоматически по адресу регистрации)
-                "{Суд}": court_nominative,
-                "{суд}": court_nominative,
-                "{Суд в родительном падеже}": court_genitive,
-                "{суд в родительном падеже}": court_genitive,
-                
-                # Основные персональные данные
-                "{ИНН}": inn,
-                "{ФИО}": full_name,
-                "{ФИО должника}": full_name,
-                "{ИНН ДОЛЖНИКА}": inn,
-                "{СНИЛС ДОЛЖНИКА}": snils,
-                
-                # Адрес
-                "{месторасположение должника}": registered_address,
-                
-                # Финансовая информация
-                "{сумма требований}": formatted_total_debt,
-                "{сумма требований к должнику}": f"{formatted_total_debt} рублей",
-                
-                # Информация о деле
-                "{номер дела}": case_number,
-                "{Номер дела}": case_number,
-                "{дело}": case_number,
-                "{судья}": judge_name,
-                "{Фамилия судьи + ее инициалы}": judge_formatted,
-                
-                # Дата
-                "{dd}.{mm}.{yyyy} г.": f"{current_date.day:02d}.{current_date.month:02d}.{current_date.year} г.",
-                "{dd}.{mm}.{yyyy}г.": f"{current_date.day:02d}.{current_date.month:02d}.{current_date.year}г.",
-                "{dd}": f"{current_date.day:02d}",
-                "{mm}": f"{current_date.month:02d}",
-                "{month name}": month_name,
-                "{yyyy}": str(current_date.year),
-                "{дата}": current_date.strftime("%d.%m.%Y"),
-                "{число месяца}": str(current_date.day),
-                "{месяц}": month_name,
-                "{месяц в родительном падеже}": month_name_genitive,
-                "{месяц В РОДИТЕЛЬНОМ ПАДЕЖЕ, ты сам должен определить}": month_name_genitive,
-                "{год}": str(current_date.year),
-            }
+            with g.timer.stage('replacements'):
+                replacements = build_case_replacements(debtor, current_date)
             
-            # Создаем ZIP-архив с документами после открытия дела
-            zip_buffer = generate_case_documents_archive(replacements, surname, name, current_date)
-            filename = f"case_documents_{surname}_{name}_{current_date.strftime('%Y%m%d')}.zip"
-            
-            return send_file(
-                zip_buffer,
-                as_attachment=True,
-                download_name=filename,
-                mimetype='application/zip'
-            )
+            return case_archive_response(replacements, surname, name, current_date)
             
         except Exception as e:
             flash(f'Ошибка при обработке документа: {str(e)}', 'error')
             return redirect(url_for('case_documents'))
     
-    return render_template('with_case.html')
+    return page_response('with_case.html')
+
+
+def read_case_api_request():
+    """
+    Поля должника из запроса к API /with-case (JSON или поля multipart), все обязательны
+    При ошибках — PayloadError со всеми ошибками
+    """
+    payload = request.get_json(silent=True) if request.is_json else request.form
+    if not isinstance(payload, dict):
+        raise PayloadError([{'field': '', 'error': 'Ожидается JSON-объект с полями должника'}])
+    errors = Errors()
+    debtor = read_debtor(payload, CASE_FIELDS, CASE_FIELDS, errors)
+    errors.raise_if_any()
+    return debtor
+
+
+def case_documents_api():
+    """
+    API /with-case: JSON {поля формы /with-case...}
+    Ошибки возвращаются JSON: 400 со списком всех ошибок в данных
+    """
+    try:
+        with g.timer.stage('parse'):
+            debtor = read_case_api_request()
+    except PayloadError as e:
+        return jsonify(e.to_dict()), 400
+    
+    try:
+        current_date = datetime.now()
+        with g.timer.stage('replacements'):
+            replacements = build_case_replacements(debtor, current_date)
+        return case_archive_response(replacements, debtor['surname'], debtor['name'], current_date)
+    except Exception as e:
+        return jsonify(error=f'Ошибка при обработке документа: {str(e)}'), 500
 
 
 if __name__ == '__main__':
+    warm_start(DOCUMENT_TEMPLATES)
+    template_watcher.start()
     app.run(debug=True, host='0.0.0.0', port=8080) 
\ No newline at end of file
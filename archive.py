@@ -0,0 +1,133 @@
+import os
+import tempfile
+import unicodedata
+import zipfile
+from urllib.parse import quote
+
+from flask import Response, stream_with_context
+
+from metrics import stage
+
+
+def parse_compression(value):
+    """
+    Разбирает настройку сжатия: "stored" или "deflate[:уровень 0-9]"
+    Возвращает (compress_type, compresslevel)
+    """
+    value = (value or "").strip().lower()
+    if value in ("", "stored", "store", "none"):
+        return zipfile.ZIP_STORED, None
+    method, _, level = value.partition(":")
+    if method == "deflate":
+        if not level:
+            return zipfile.ZIP_DEFLATED, None
+        if level.isdigit() and 0 <= int(level) <= 9:
+            return zipfile.ZIP_DEFLATED, int(level)
+    raise ValueError(f"Неизвестный способ сжатия архива: {value!r}")
+
+
+# .docx уже является ZIP-архивом со сжатыми частями: повторное сжатие почти ничего
+# не дает и тратит CPU, поэтому по умолчанию документы кладутся в архив как есть
+DOCX_COMPRESSION = parse_compression(os.environ.get('ARCHIVE_DOCX_COMPRESSION', 'stored'))
+
+# Остальные файлы архива (отчеты, текст) хорошо сжимаются
+OTHER_COMPRESSION = parse_compression(os.environ.get('ARCHIVE_OTHER_COMPRESSION', 'deflate:6'))
+
+# Архив (и результат задачи) больше этого размера хранится во временном файле, а не в памяти
+ARCHIVE_SPOOL_BYTES = int(float(os.environ.get('ARCHIVE_SPOOL_MB', '8')) * 1024 * 1024)
+
+
+def member_compression(filename):
+    """Параметры сжатия для файла архива"""
+    if filename.lower().endswith('.docx'):
+        return DOCX_COMPRESSION
+    return OTHER_COMPRESSION
+
+
+def write_member(zip_file, filename, data):
+    """Добавляет файл в архив согласно политике сжатия"""
+    compress_type, compresslevel = member_compression(filename)
+    zip_file.writestr(filename, data, compress_type=compress_type, compresslevel=compresslevel)
+
+
+def build_archive(documents, timings=None):
+    """
+    Собирает ZIP-архив из пар (имя файла, байты)
+    timings — словарь стадий: время записи в архив добавляется к стадии zip
+
+    Возвращает файл, перемотанный на начало: до ARCHIVE_SPOOL_BYTES архив в памяти,
+    больше — во временном файле на диске (удаляется при закрытии)
+    """
+    archive_file = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_BYTES)
+    try:
+        with zipfile.ZipFile(archive_file, 'w') as zip_file:
+            for filename, data in documents:
+                with stage(timings, 'zip'):
+                    write_member(zip_file, filename, data)
+    except BaseException:
+        archive_file.close()
+        raise
+
+    archive_file.seek(0)
+    return archive_file
+
+
+class _StreamSink:
+    """
+    Приемник для ZipFile без перемотки: копит записанные куски до отправки клиенту
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        # memoryview может указывать на буфер документа — он живет до отправки куска
+        self._chunks.append(data)
+        return len(data) if isinstance(data, bytes) else memoryview(data).nbytes
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """
+        Возвращает накопленные данные одним куском bytes (WSGI принимает только bytes)
+        join копирует буферы документов один раз и склеивает мелкие записи заголовков
+        """
+        chunks, self._chunks = self._chunks, []
+        return [b"".join(chunks)] if chunks else []
+
+
+def stream_archive(documents, timings=None):
+    """
+    Генератор ZIP-архива: каждый документ уходит клиенту сразу после генерации,
+    весь архив в памяти не собирается
+    """
+    sink = _StreamSink()
+    with zipfile.ZipFile(sink, 'w') as zip_file:
+        for filename, data in documents:
+            with stage(timings, 'zip'):
+                write_member(zip_file, filename, data)
+            yield from sink.drain()
+    # Центральный каталог записывается при закрытии архива
+    yield from sink.drain()
+
+
+def attachment_headers(download_name):
+    """Заголовок Content-Disposition для скачивания (как в flask.send_file)"""
+    try:
+        download_name.encode("ascii")
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize("NFKD", download_name)
+        simple = simple.encode("ascii", "ignore").decode("ascii")
+        quoted = quote(download_name, safe="!#$&+-.^_`|~")
+        return {"Content-Disposition": f"attachment; filename=\"{simple}\"; filename*=UTF-8''{quoted}"}
+    return {"Content-Disposition": f"attachment; filename=\"{download_name}\""}
+
+
+def archive_response(documents, download_name, timings=None):
+    """Потоковый ответ с ZIP-архивом"""
+    return Response(
+        stream_with_context(stream_archive(documents, timings)),
+        mimetype='application/zip',
+        headers=attachment_headers(download_name),
+    )
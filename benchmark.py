@@ -0,0 +1,1338 @@
+"""
+Бенчмарки генерации документов
+
+Запуск:
+    python benchmark.py                               # все бенчмарки
+    python benchmark.py parse variants                # только выбранные
+    python benchmark.py variants pipeline --json a.json   # результаты в JSON
+    python benchmark.py --compare a.json b.json       # сравнение двух запусков
+
+JSON содержит коммит, окружение и список замеров
+{"benchmark", "case", "metric", "value", "unit"} — его удобно сохранять
+для каждого коммита и сравнивать через --compare.
+"""
+import argparse
+import contextlib
+import copy
+import http.client
+import io
+import json
+import logging
+import logging.handlers
+import os
+import pickle
+import platform
+import queue
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.error
+import urllib.parse
+import urllib.request
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from docx import Document
+
+# Журнал генерации в бенчмарках не нужен (до импорта app, который его настраивает)
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import app
+import logs
+import template_snapshot
+import main as standalone
+import result_cache
+from app import DOCUMENT_TEMPLATES
+from archive import build_archive, stream_archive
+from placeholders import compile_replacements, part_roots, replace_in_runs_preserve_formatting
+from template_cache import CompiledTemplate, TemplateCache, clone_document
+
+# Бенчмарки повторяют генерацию с одинаковыми данными: кэш результатов включает только bench_cache
+app.result_cache = None
+
+# Замеры текущего запуска (для --json)
+RESULTS = []
+_current_benchmark = None
+
+# Единицы, для которых меньше — лучше (для остальных, например req/s и x, — больше)
+LOWER_IS_BETTER = ('ms', 'bytes', 'MB')
+
+
+def record(case, metric, value, unit='ms'):
+    """Запоминает замер для машиночитаемого вывода"""
+    RESULTS.append({
+        'benchmark': _current_benchmark,
+        'case': str(case),
+        'metric': metric,
+        'value': round(float(value), 4),
+        'unit': unit,
+    })
+
+
+def measure(func, repeat=20, setup=None):
+    """
+    Возвращает медианное время выполнения func в миллисекундах
+    setup — подготовка перед каждым замером (в замер не входит), ее результат передается в func
+    """
+    timings = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        start = time.perf_counter()
+        func(argument) if setup is not None else func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def sample_replacements(template):
+    """Значения для всех плейсхолдеров шаблона"""
+    placeholders = {placeholder for slot in template.index.slots for placeholder in slot.placeholders}
+    return {placeholder: "Значение" for placeholder in placeholders}
+
+
+def sample_creditors(count):
+    """Список кредиторов в том же виде, что собирает initial_documents"""
+    creditors = []
+    for i in range(1, count + 1):
+        creditors.append({
+            'name': f'ООО МФК «Кредитор {i}»',
+            'address': f'г. Москва, ул. Примерная, д. {i}',
+            'Содержание обязательства': 'Договор займа',
+            'Кредитор': f'ООО МФК «Кредитор {i}»',
+            'Место нахождения': f'г. Москва, ул. Примерная, д. {i}',
+            'Основание': f'Договор займа № {i} от 01.02.2023',
+            'Сумма обязательства': '30000',
+            'Задолженность': '25000',
+            'Штрафы': '1500',
+        })
+    return creditors
+
+
+def legacy_replace_in_runs(paragraph, replacements):
+    """
+    Прежняя реализация replace_in_runs_preserve_formatting (словарь на каждый символ),
+    оставлена только для сравнения
+    """
+    if not paragraph.runs:
+        return
+
+    char_data = []
+    for run in paragraph.runs:
+        for char in run.text:
+            char_data.append({
+                'char': char,
+                'run': run,
+                'font_name': run.font.name,
+                'font_size': run.font.size,
+                'bold': run.font.bold,
+                'italic': run.font.italic,
+                'underline': run.font.underline,
+                'color': run.font.color.rgb if run.font.color.rgb else None
+            })
+    if not char_data:
+        return
+
+    original_text = "".join(cd['char'] for cd in char_data)
+    new_text = original_text
+    for placeholder, replacement in replacements.items():
+        new_text = new_text.replace(placeholder, replacement)
+    if new_text == original_text:
+        return
+
+    for run in paragraph.runs[:]:
+        paragraph._element.remove(run._element)
+    if not new_text:
+        return
+
+    base_formatting = char_data[0]
+    new_run = paragraph.add_run(new_text)
+    if base_formatting['font_name']:
+        new_run.font.name = base_formatting['font_name']
+    if base_formatting['font_size']:
+        new_run.font.size = base_formatting['font_size']
+    if base_formatting['bold'] is not None:
+        new_run.font.bold = base_formatting['bold']
+    if base_formatting['italic'] is not None:
+        new_run.font.italic = base_formatting['italic']
+    if base_formatting['underline'] is not None:
+        new_run.font.underline = base_formatting['underline']
+    if base_formatting['color']:
+        new_run.font.color.rgb = base_formatting['color']
+
+
+def iter_all_paragraphs(doc):
+    """Все параграфы, которые обходит replace_placeholders_advanced"""
+    yield from doc.paragraphs
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                yield from cell.paragraphs
+
+
+def bench_parse():
+    """Разбор шаблона на каждый запрос: Document(path) против копии из кэша"""
+    cache = TemplateCache()
+    cache.preload(DOCUMENT_TEMPLATES)
+
+    print(f"{'Шаблон':<26}{'Document()':>12}{'кэш':>10}{'ускорение':>12}")
+    for template_path in DOCUMENT_TEMPLATES:
+        before = measure(lambda: Document(template_path))
+        after = measure(lambda: cache.open(template_path))
+        print(f"{template_path:<26}{before:>10.2f}мс{after:>8.2f}мс{before / after:>11.1f}x")
+        record(template_path, 'Document()', before)
+        record(template_path, 'cache', after)
+
+
+def bench_runs():
+    """Замена в параграфах: посимвольные словари против run-span модели"""
+    cache = TemplateCache()
+    cache.preload(DOCUMENT_TEMPLATES)
+
+    print(f"{'Шаблон':<26}{'посимвольно':>13}{'run-span':>12}{'ускорение':>12}")
+    for template_path in DOCUMENT_TEMPLATES:
+        template = cache.get(template_path)
+        replacements = sample_replacements(template)
+        replacer = compile_replacements(replacements)
+
+        def run_legacy():
+            for paragraph in list(iter_all_paragraphs(template.open())):
+                legacy_replace_in_runs(paragraph, replacements)
+
+        def run_spans():
+            for paragraph in list(iter_all_paragraphs(template.open())):
+                replace_in_runs_preserve_formatting(paragraph, replacer)
+
+        # Время копирования шаблона одинаково для обоих вариантов и не вычитается
+        before = measure(run_legacy, repeat=5)
+        after = measure(run_spans, repeat=5)
+        print(f"{template_path:<26}{before:>11.1f}мс{after:>10.1f}мс{before / after:>11.1f}x")
+        record(template_path, 'per-char', before)
+        record(template_path, 'run-span', after)
+
+
+def bench_archive():
+    """Генерация архива первоначальных документов: 1 процесс против пула"""
+    cache_templates = {path: app.template_cache.get(path) for path in DOCUMENT_TEMPLATES}
+    replacements = {}
+    for template in cache_templates.values():
+        replacements.update(sample_replacements(template))
+
+    workers = max(2, min(len(app.INITIAL_DOCUMENTS), os.cpu_count() or 1))
+    current_date = datetime.now()
+    print(f"{'Кредиторов':<12}{'1 процесс':>12}{f'{workers} процесса':>14}")
+    for count in (1, 20, 100):
+        creditors = sample_creditors(count)
+        timings = []
+        for pool_size in (1, workers):
+            app.RENDER_WORKERS = pool_size
+            app._reset_render_pool()
+
+            def generate():
+                app.generate_initial_documents_archive(replacements, creditors, "Иванов", "Иван", current_date)
+
+            # Прогрев пула и отключение отладочного вывода генерации
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate()
+                timings.append(measure(generate, repeat=5))
+        app._reset_render_pool()
+        print(f"{count:<12}{timings[0]:>10.0f}мс{timings[1]:>12.0f}мс")
+        record(count, '1 process', timings[0])
+        record(count, f'{workers} processes', timings[1])
+
+
+def bench_stream():
+    """Отдача архива: сборка в BytesIO (DEFLATE) против потоковой отдачи"""
+    replacements = {}
+    for template_path in DOCUMENT_TEMPLATES:
+        replacements.update(sample_replacements(app.template_cache.get(template_path)))
+    current_date = datetime.now()
+    app.RENDER_WORKERS = 1
+
+    def documents(creditors):
+        return app.iter_rendered_documents(
+            app.INITIAL_DOCUMENTS, replacements, creditors, "Иванов", "Иван", current_date)
+
+    def buffered(creditors):
+        # Как раньше: архив целиком в памяти, getvalue() каждого документа, DEFLATE
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for filename, data in documents(creditors):
+                zip_file.writestr(filename, bytes(data))
+        # send_file начинает отдачу только после сборки всего архива
+        yield zip_buffer.getvalue()
+
+    def streamed(creditors):
+        yield from stream_archive(documents(creditors))
+
+    print(f"{'Кредиторов':<12}{'Способ':<10}{'первый байт':>13}{'всего':>10}{'пик памяти':>13}")
+    for count in (5, 50, 200):
+        creditors = sample_creditors(count)
+        for title, response in (("BytesIO", buffered), ("поток", streamed)):
+            with contextlib.redirect_stdout(io.StringIO()):
+                tracemalloc.start()
+                start = time.perf_counter()
+                first_byte = None
+                for _chunk in response(creditors):
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - start
+                total = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            print(f"{count:<12}{title:<10}{first_byte * 1000:>11.0f}мс{total * 1000:>8.0f}мс"
+                  f"{peak / 1024 / 1024:>10.1f} МБ")
+            record(count, f'{title}: first byte', first_byte * 1000)
+            record(count, f'{title}: total', total * 1000)
+            record(count, f'{title}: peak', peak / 1024 / 1024, 'MB')
+
+
+def bench_package():
+    """Сборка .docx: python-docx Document.save() против патча на уровне пакета"""
+    replacements = {}
+    for template_path in DOCUMENT_TEMPLATES:
+        replacements.update(sample_replacements(app.template_cache.get(template_path)))
+    creditors = sample_creditors(5)
+
+    def render(backend, template_path):
+        app.RENDER_BACKEND = backend
+        return app.process_document_in_memory(template_path, replacements, creditors).getvalue()
+
+    print(f"{'Шаблон':<26}{'python-docx':>13}{'пакет':>10}{'ускорение':>12}  паритет")
+    for template_path in DOCUMENT_TEMPLATES:
+        with contextlib.redirect_stdout(io.StringIO()):
+            before = measure(lambda: render('docx', template_path), repeat=10)
+            after = measure(lambda: render('package', template_path), repeat=10)
+            reference = zipfile.ZipFile(io.BytesIO(render('docx', template_path)))
+            patched = zipfile.ZipFile(io.BytesIO(render('package', template_path)))
+
+        # Переписанные части должны совпадать с результатом python-docx,
+        # остальные — с шаблоном байт в байт
+        template = app.template_cache.get(template_path)
+        source = zipfile.ZipFile(io.BytesIO(template.blob))
+        rewritten = {partname.lstrip('/') for partname in template.package.patchable}
+        problems = []
+        if patched.testzip() is not None:
+            problems.append("CRC")
+        for name in source.namelist():
+            expected = reference.read(name) if name in rewritten else source.read(name)
+            if patched.read(name) != expected:
+                problems.append(name)
+        print(f"{template_path:<26}{before:>11.1f}мс{after:>8.1f}мс{before / after:>11.1f}x  "
+              f"{'OK' if not problems else ', '.join(problems)}")
+        record(template_path, 'python-docx', before)
+        record(template_path, 'package', after)
+    app.RENDER_BACKEND = 'docx'
+
+
+def sample_form(creditors_count):
+    """Поля формы /initial, как их отправляет браузер"""
+    form = {
+        'surname': 'Иванов', 'name': 'Иван', 'patronymic': 'Иванович',
+        'surname_genitive': 'Иванова', 'name_genitive': 'Ивана', 'patronymic_genitive': 'Ивановича',
+        'surname_dative': 'Иванову', 'name_dative': 'Ивану', 'patronymic_dative': 'Ивановичу',
+        'birth_date': '1990-01-02', 'birth_place': 'г. Москва',
+        'passport_series': '4500', 'passport_number': '123456',
+        'passport_issued_by': 'ОВД Тверской', 'passport_issue_date': '2010-03-04',
+        'inn': '123456789012', 'snils': '123-456-789 00',
+        'region': 'Московская область', 'city': 'Одинцово', 'street': 'ул. Ленина', 'house_number': '5',
+        'registered_address': 'Московская область, г. Одинцово, ул. Ленина, д. 5',
+        'debt_amount_digits': '500000', 'debt_amount_words': 'пятьсот тысяч',
+        'has_marriage': 'yes', 'has_children': 'no',
+    }
+    for creditor in range(1, creditors_count + 1):
+        form.update({
+            f'creditor_name_{creditor}': f'ПАО Банк {creditor}',
+            f'creditor_address_{creditor}': f'г. Москва, ул. Примерная, д. {creditor}',
+            f'obligation_content_{creditor}': 'Кредит',
+            f'obligation_basis_{creditor}': f'Договор № {creditor}',
+            f'obligation_amount_{creditor}': '100000',
+            f'debt_amount_{creditor}': '90000',
+            f'penalties_{creditor}': '500',
+        })
+    return form
+
+
+def wait_for_server(url, process, timeout=30):
+    """Ждет, пока сервер начнет отвечать"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Сервер завершился с кодом {process.returncode}")
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError(f"Сервер не ответил за {timeout} с")
+
+
+def run_load(url, body, clients, duration):
+    """Нагрузка: clients параллельных клиентов в течение duration секунд"""
+    latencies = []
+    failures = 0
+    deadline = time.time() + duration
+
+    def client():
+        nonlocal failures
+        while time.time() < deadline:
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(urllib.request.Request(url, data=body), timeout=120) as response:
+                    response.read()
+                latencies.append((time.perf_counter() - start) * 1000)
+            except (urllib.error.URLError, http.client.HTTPException, ConnectionError):
+                failures += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        for _ in range(clients):
+            executor.submit(client)
+    elapsed = time.perf_counter() - started
+    return latencies, failures, elapsed
+
+
+def bench_serve():
+    """Пропускная способность POST /initial: python app.py против gunicorn (gunicorn.conf.py)"""
+    servers = (
+        ("python app.py", [sys.executable, "app.py"], 8080),
+        ("gunicorn", [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"], 8081),
+    )
+    body = urllib.parse.urlencode(sample_form(5)).encode()
+    clients = int(os.environ.get('BENCH_CLIENTS', '8'))
+    duration = float(os.environ.get('BENCH_DURATION', '15'))
+
+    print(f"{'Сервер':<16}{'запросов/с':>12}{'p50':>10}{'p95':>10}{'ошибок':>8}   ({clients} клиентов, {duration:.0f} с)")
+    for title, command, port in servers:
+        env = dict(os.environ, PORT=str(port))
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_server(f"http://127.0.0.1:{port}/", process)
+            url = f"http://127.0.0.1:{port}/initial"
+            run_load(url, body, clients, 2)  # прогрев
+            latencies, failures, elapsed = run_load(url, body, clients, duration)
+        finally:
+            process.terminate()
+            process.wait()
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+        print(f"{title:<16}{len(latencies) / elapsed:>12.1f}{statistics.median(latencies or [0]):>8.0f}мс"
+              f"{p95:>8.0f}мс{failures:>8}")
+        record(title, 'throughput', len(latencies) / elapsed, 'req/s')
+        record(title, 'p50', statistics.median(latencies or [0]))
+        record(title, 'p95', p95)
+
+
+def run_arrivals(url, body, rate, duration):
+    """
+    Открытая нагрузка: rate запросов в секунду в течение duration секунд, независимо
+    от того, успевает ли сервер (как наплыв заявок), а не фиксированное число клиентов
+    Возвращает (задержки успешных, мс; число 503; прочие ошибки; время до последнего ответа, с)
+    """
+    latencies = []
+    rejected = 0
+    failures = 0
+
+    def send():
+        nonlocal rejected, failures
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, data=body), timeout=120) as response:
+                response.read()
+            latencies.append((time.perf_counter() - start) * 1000)
+        except urllib.error.HTTPError as e:
+            if e.code == 503:
+                rejected += 1
+            else:
+                failures += 1
+        except (urllib.error.URLError, http.client.HTTPException, ConnectionError):
+            failures += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=256) as executor:
+        for index in range(int(rate * duration)):
+            delay = started + index / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send)
+    return latencies, rejected, failures, time.perf_counter() - started
+
+
+def bench_admission():
+    """Наплыв запросов /initial сверх пропускной способности процесса: без лимита и с admission.py"""
+    modes = (
+        ("без лимита", {'ADMISSION_CONCURRENCY': '0'}),
+        ("лимит 1", {'ADMISSION_CONCURRENCY': '1'}),
+        ("лимит 2", {'ADMISSION_CONCURRENCY': '2'}),
+    )
+    body = urllib.parse.urlencode(sample_form(50)).encode()
+    rate = float(os.environ.get('BENCH_RATE', '15'))
+    duration = float(os.environ.get('BENCH_DURATION', '15'))
+    port = 8082
+
+    print(f"{'Режим':<14}{'успешно/с':>11}{'p50':>10}{'p95':>10}{'max':>10}{'503':>7}{'ошибок':>8}"
+          f"   ({rate:.0f} запросов/с, {duration:.0f} с)")
+    for title, settings in modes:
+        # Один процесс, кэш результатов выключен: каждый запрос — настоящая генерация
+        env = dict(os.environ, PORT=str(port), WEB_WORKERS='1', WEB_THREADS='64',
+                   RESULT_CACHE='0', LOG_LEVEL='ERROR', **settings)
+        process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+                                   env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_server(f"http://127.0.0.1:{port}/", process)
+            url = f"http://127.0.0.1:{port}/initial"
+            run_load(url, body, 1, 2)  # прогрев
+            latencies, rejected, failures, elapsed = run_arrivals(url, body, rate, duration)
+        finally:
+            process.terminate()
+            process.wait()
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+        print(f"{title:<14}{len(latencies) / elapsed:>11.1f}{statistics.median(latencies or [0]):>8.0f}мс"
+              f"{p95:>8.0f}мс{max(latencies or [0]):>8.0f}мс{rejected:>7}{failures:>8}")
+        record(title, 'goodput', len(latencies) / elapsed, 'req/s')
+        record(title, 'p50', statistics.median(latencies or [0]))
+        record(title, 'p95', p95)
+        record(title, 'rejected', rejected, 'count')
+
+
+def bench_cache():
+    """Повторная генерация архива: без кэша результатов против попадания в кэш"""
+    replacements = {}
+    for template_path in DOCUMENT_TEMPLATES:
+        replacements.update(sample_replacements(app.template_cache.get(template_path)))
+    current_date = datetime.now()
+    app.RENDER_WORKERS = 1
+
+    print(f"{'Кредиторов':<12}{'без кэша':>12}{'из кэша':>12}{'ускорение':>12}")
+    for count in (1, 20, 100):
+        creditors = sample_creditors(count)
+
+        def generate():
+            app.generate_initial_documents_archive(replacements, creditors, "Иванов", "Иван", current_date)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            app.result_cache = None
+            before = measure(generate, repeat=5)
+            app.result_cache = result_cache.build_result_cache({})
+            generate()
+            after = measure(generate, repeat=5)
+        print(f"{count:<12}{before:>10.0f}мс{after:>10.1f}мс{before / after:>11.0f}x")
+        record(count, 'no cache', before)
+        record(count, 'cache hit', after)
+    app.result_cache = None
+
+
+def bench_incremental():
+    """Повторная генерация после правки одного поля: какие документы генерируются заново"""
+    form = sample_form(20)
+    debtor = app.read_initial_form(form)
+    creditors = app.read_form_creditors(form)
+    current_date = datetime.now()
+    app.RENDER_WORKERS = 1
+
+    def generate(debtor, creditors):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            replacements = app.build_initial_replacements(debtor, creditors, current_date)
+            start = time.perf_counter()
+            app.generate_initial_documents_archive(replacements, creditors, "Иванов", "Иван", current_date)
+            elapsed = (time.perf_counter() - start) * 1000
+        rendered = output.getvalue().count("✅ Создан документ")
+        return elapsed, rendered
+
+    corrections = (
+        ("дата выдачи паспорта", lambda d, c: (dict(d, passport_issue_date='2011-05-06'), c)),
+        ("адрес кредитора 3", lambda d, c: (d, [dict(x, address='г. Тверь', **{'Место нахождения': 'г. Тверь'})
+                                                if i == 2 else x for i, x in enumerate(c)])),
+        ("место рождения", lambda d, c: (dict(d, birth_place='г. Тверь'), c)),
+    )
+
+    app.result_cache = None
+    generate(debtor, creditors)  # прогрев
+
+    print(f"{'Правка':<24}{'без кэша':>12}{'с кэшем':>12}{'документов заново':>20}")
+    for title, correct in corrections:
+        changed_debtor, changed_creditors = correct(debtor, creditors)
+        full_timings, incremental_timings = [], []
+        for _ in range(3):
+            app.result_cache = None
+            full_timings.append(generate(changed_debtor, changed_creditors)[0])
+            app.result_cache = result_cache.build_result_cache({})
+            generate(debtor, creditors)  # предыдущая отправка формы
+            elapsed, rendered = generate(changed_debtor, changed_creditors)
+            incremental_timings.append(elapsed)
+        full, incremental = statistics.median(full_timings), statistics.median(incremental_timings)
+        print(f"{title:<24}{full:>10.0f}мс{incremental:>10.0f}мс{rendered:>14} из {len(app.INITIAL_DOCUMENTS)}")
+        record(title, 'no cache', full)
+        record(title, 'cache', incremental)
+    app.result_cache = None
+
+
+def bench_prune():
+    """Словарь замен /initial (20 кредиторов): полный против отобранного по манифесту шаблона"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        replacements = app.build_initial_replacements(
+            app.read_initial_form(sample_form(20)), app.read_form_creditors(sample_form(20)), datetime.now())
+
+    print(f"{'Шаблон':<26}{'ключей':>14}{'поиск: полный':>16}{'манифест':>11}{'в пул, байт':>20}")
+    for template_path, _, _, _ in app.INITIAL_DOCUMENTS:
+        template = app.template_cache.get(template_path)
+        pruned = template.index.prune(replacements)
+        full_replacer = compile_replacements(replacements)
+        pruned_replacer = compile_replacements(pruned)
+
+        def scan(replacer):
+            # Поиск совпадений во всех параграфах шаблона — основная работа прохода замены
+            for slot in template.index.slots:
+                replacer.sub(slot.text)
+
+        before = measure(lambda: scan(full_replacer), repeat=50)
+        after = measure(lambda: scan(pruned_replacer), repeat=50)
+        print(f"{template_path:<26}{len(replacements):>6} -> {len(pruned):<5}{before:>12.2f}мс{after:>9.2f}мс"
+              f"{len(pickle.dumps(replacements)):>10} -> {len(pickle.dumps(pruned))}")
+        record(template_path, 'scan: full', before)
+        record(template_path, 'scan: manifest', after)
+        record(template_path, 'pickled replacements', len(pickle.dumps(pruned)), 'bytes')
+
+
+def legacy_add_creditors_rows(doc, creditors):
+    """Прежняя версия add_creditors_rows_improved (rows/cells на каждую строку, deepcopy раздела 2)"""
+    for table_idx, table in enumerate(doc.tables):
+        # Ищем таблицу с кредиторами (проверяем заголовки)
+        if len(table.rows) > 0:
+            header_row = table.rows[0]
+            header_text = " ".join(cell.text.strip().lower() for cell in header_row.cells)
+            
+            # Если это таблица кредиторов (ищем по нескольким критериям)
+            is_creditors_table = (
+                ("кредитор" in header_text and ("обязательство" in header_text or "денежным обязательствам" in header_text)) or
+                ("кредитор" in header_text and "задолженность" in header_text) or
+                ("кредитор" in header_text and "основание" in header_text)
+            )
+            
+            if is_creditors_table:
+                print(f"Найдена таблица кредиторов с {len(table.rows)} строками")
+                
+                # Находим существующие строки с данными кредиторов (строки 1.1, 1.2 и т.д.)
+                creditor_rows = {}  # {номер_строки: индекс_кредитора}
+                
+                for i, row in enumerate(table.rows):
+                    row_text = " ".join(cell.text.strip() for cell in row.cells)
+                    
+                    # Ищем строки с номерацией 1.1, 1.2 и т.д. (денежные обязательства)
+                    if row_text.startswith("1."):
+                        try:
+                            # Извлекаем номер кредитора (1.1 -> 1, 1.2 -> 2)
+                            creditor_num = int(row_text.split()[0].split('.')[1])
+                            creditor_rows[i] = creditor_num
+                            print(f"Найдена строка кредитора {creditor_num} в позиции {i}")
+                        except (ValueError, IndexError):
+                            pass
+                
+                print(f"Найдено существующих строк кредиторов: {len(creditor_rows)}")
+                
+                # Список строк для удаления (если кредиторов меньше, чем строк в шаблоне)
+                rows_to_delete = []
+                
+                # Заменяем существующие строки кредиторов
+                for row_idx, creditor_num in creditor_rows.items():
+                    if creditor_num <= len(creditors):  # Есть данные для замены
+                        creditor = creditors[creditor_num - 1]  # creditor_num начинается с 1
+                        cells = table.rows[row_idx].cells
+                        
+                        # Поддерживаем таблицы с разным количеством колонок
+                        if len(cells) >= 8:
+                            # Полная таблица (как в list-of-creditors.docx)
+                            cells[0].text = f"1.{creditor_num}"
+                            cells[1].text = creditor.get("Содержание обязательства", "")
+                            cells[2].text = creditor.get("Кредитор", "")
+                            cells[3].text = creditor.get("Место нахождения", "")
+                            cells[4].text = creditor.get("Основание", "")
+                            cells[5].text = app.format_amount(creditor.get("Сумма обязательства", ""))
+                            cells[6].text = app.format_amount(creditor.get("Задолженность", ""))
+                            cells[7].text = app.format_amount(creditor.get("Штрафы", ""))
+                        elif len(cells) >= 4:
+                            # Упрощенная таблица (возможно в zayav.docx)
+                            cells[0].text = f"1.{creditor_num}"
+                            cells[1].text = creditor.get("Содержание обязательства", "")
+                            cells[2].text = creditor.get("Кредитор", "")
+                            cells[3].text = creditor.get("Основание", "")
+                        else:
+                            print(f"⚠️ Таблица имеет недостаточно колонок: {len(cells)}")
+                        print(f"Заменен кредитор {creditor_num}: {creditor.get('Кредитор', 'Неизвестно')}")
+                    else:
+                        # Кредитора нет - нужно удалить эту строку
+                        rows_to_delete.append(row_idx)
+                        print(f"Строка кредитора {creditor_num} в позиции {row_idx} будет удалена (нет данных)")
+                
+                # Если кредиторов больше, чем существующих строк - добавляем новые
+                max_existing_creditor = max(creditor_rows.values()) if creditor_rows else 0
+                
+                if len(creditors) > max_existing_creditor:
+                    print(f"Нужно добавить еще {len(creditors) - max_existing_creditor} кредиторов")
+                    
+                    # Находим и временно сохраняем строки раздела "2. Обязательные платежи"
+                    section_2_rows = []
+                    section_2_start = None
+                    
+                    for i, row in enumerate(table.rows):
+                        row_text = " ".join(cell.text.strip() for cell in row.cells)
+                        
+                        # Если нашли начало раздела 2
+                        if section_2_start is None and (row_text.strip() == "2" or (row_text.strip().startswith("2") and "обязательные платежи" in row_text.lower())):
+                            section_2_start = i
+                            print(f"Найден раздел 2 в позиции {i}")
+                        
+                        # Если мы в разделе 2, сохраняем полную структуру строк
+                        if section_2_start is not None and i >= section_2_start:
+                            # Сохраняем полный XML элемент строки
+                            section_2_rows.append(copy.deepcopy(row._element))
+                    
+                    # Удаляем строки раздела 2 (в обратном порядке)
+                    if section_2_rows:
+                        print(f"Временно удаляем {len(section_2_rows)} строк раздела 2")
+                        for i in range(len(section_2_rows)):
+                            # Удаляем с конца, начиная с section_2_start
+                            row_to_remove = len(table.rows) - 1
+                            if row_to_remove >= section_2_start:
+                                table._element.remove(table.rows[row_to_remove]._element)
+                    
+                    # Теперь добавляем недостающих кредиторов
+                    for i in range(max_existing_creditor, len(creditors)):
+                        creditor = creditors[i]
+                        
+                        # Добавляем строку в конец таблицы (теперь без раздела 2)
+                        new_row = table.add_row()
+                        cells = new_row.cells
+                        
+                        # Поддерживаем таблицы с разным количеством колонок
+                        if len(cells) >= 8:
+                            # Полная таблица (как в list-of-creditors.docx)
+                            cells[0].text = f"1.{i + 1}"
+                            cells[1].text = creditor.get("Содержание обязательства", "")
+                            cells[2].text = creditor.get("Кредитор", "")
+                            cells[3].text = creditor.get("Место нахождения", "")
+                            cells[4].text = creditor.get("Основание", "")
+                            cells[5].text = app.format_amount(creditor.get("Сумма обязательства", ""))
+                            cells[6].text = app.format_amount(creditor.get("Задолженность", ""))
+                            cells[7].text = app.format_amount(creditor.get("Штрафы", ""))
+                        elif len(cells) >= 4:
+                            # Упрощенная таблица (возможно в zayav.docx)
+                            cells[0].text = f"1.{i + 1}"
+                            cells[1].text = creditor.get("Содержание обязательства", "")
+                            cells[2].text = creditor.get("Кредитор", "")
+                            cells[3].text = creditor.get("Основание", "")
+                        else:
+                            print(f"⚠️ Таблица имеет недостаточно ячеек для кредитора {i + 1}: {len(cells)}")
+                        print(f"Добавлен кредитор {i + 1}: {creditor.get('Кредитор', 'Неизвестно')}")
+                    
+                    # Восстанавливаем строки раздела 2 с сохранением оригинальной структуры
+                    if section_2_rows:
+                        print(f"Восстанавливаем {len(section_2_rows)} строк раздела 2")
+                        table_element = table._element
+                        for row_element in section_2_rows:
+                            # Добавляем сохраненный элемент строки обратно в таблицу
+                            table_element.append(row_element)
+                
+                # Удаляем лишние строки кредиторов (если кредиторов меньше, чем было в шаблоне)
+                # Удаляем в обратном порядке, чтобы индексы не сбивались
+                for row_idx in sorted(rows_to_delete, reverse=True):
+                    print(f"Удаляем лишнюю строку кредитора в позиции {row_idx}")
+                    table._element.remove(table.rows[row_idx]._element)
+                
+                break  # Обработали первую таблицу кредиторов
+
+
+def bench_rows():
+    """Таблица кредиторов list-of-creditors.docx: прежнее добавление строк против клонирования прототипа"""
+    template = app.template_cache.get('list-of-creditors.docx')
+
+    def texts(doc):
+        return [cell.text for table in doc.tables for row in table.rows for cell in row.cells]
+
+    print(f"{'Кредиторов':<12}{'прежнее':>12}{'прототип':>12}{'ускорение':>12}")
+    for count in (10, 100, 1000):
+        creditors = sample_creditors(count)
+        repeat = 1 if count >= 1000 else 10
+
+        def run(fill):
+            doc = template.open()
+            with contextlib.redirect_stdout(io.StringIO()):
+                fill(doc, creditors)
+            return doc
+
+        if texts(run(legacy_add_creditors_rows)) != texts(run(app.add_creditors_rows_improved)):
+            print(f"❌ {count} кредиторов: текст таблиц отличается от прежней версии")
+        # Клонирование шаблона одинаково для обеих версий и входит в оба замера
+        before = measure(lambda: run(legacy_add_creditors_rows), repeat=repeat)
+        after = measure(lambda: run(app.add_creditors_rows_improved), repeat=repeat)
+        print(f"{count:<12}{before:>10.1f}мс{after:>10.1f}мс{before / after:>11.1f}x")
+        record(count, 'legacy', before)
+        record(count, 'prototype', after)
+
+
+def legacy_add_additional_creditors(doc, creditors):
+    """Прежняя версия add_additional_creditors_to_text (поиск ячейки по всему документу, add_paragraph)"""
+    if len(creditors) <= 1:
+        return  # Нет дополнительных кредиторов
+    
+    # Ищем ячейку с информацией о первом кредиторе в таблице (шапка документа)
+    # После замены плейсхолдеров там может быть "Кредитор 1" или название первого кредитора
+    creditor_cell = None
+    first_creditor_name = creditors[0]['name']
+    
+    for table_idx, table in enumerate(doc.tables):
+        for row_idx, row in enumerate(table.rows):
+            for cell_idx, cell in enumerate(row.cells):
+                cell_text = cell.text.strip()
+                # Ищем ячейку с "Кредитор 1" или с названием первого кредитора
+                if ("Кредитор 1" in cell_text or first_creditor_name in cell_text) and len(cell_text) < 300:
+                    creditor_cell = cell
+                    print(f"Найдена ячейка с кредитором в таблице {table_idx}, строка {row_idx}, ячейка {cell_idx}")
+                    break
+            if creditor_cell is not None:
+                break
+        if creditor_cell is not None:
+            break
+    
+    if creditor_cell is None:
+        print(f"⚠️ Не найдена ячейка с информацией о кредиторе (искали '{first_creditor_name[:30]}...')")
+        return
+    
+    # Добавляем параграфы для дополнительных кредиторов в ячейку
+    for creditor_idx in range(1, len(creditors)):  # Начинаем со второго
+        creditor = creditors[creditor_idx]
+        creditor_num = creditor_idx + 1
+        
+        try:
+            # 0. Пустая строка для отступа (перед каждым кредитором)
+            creditor_cell.add_paragraph()
+            
+            # 1. Заголовок "Кредитор N" - жирным
+            p_header = creditor_cell.add_paragraph()
+            run_header = p_header.add_run(f"Кредитор {creditor_num}")
+            run_header.bold = True
+            
+            # 2. Название кредитора - жирным
+            p_name = creditor_cell.add_paragraph()
+            run_name = p_name.add_run(creditor['name'])
+            run_name.bold = True
+            
+            # 3. Адрес кредитора - жирным
+            p_address = creditor_cell.add_paragraph()
+            run_address = p_address.add_run(creditor['address'])
+            run_address.bold = True
+            
+            print(f"✅ Добавлен текст о кредиторе {creditor_num}: {creditor['name']}")
+        except Exception as e:
+            print(f"❌ Ошибка при добавлении кредитора {creditor_num}: {e}")
+
+
+def bench_header():
+    """Дополнительные кредиторы в шапке zayav.docx: поиск ячейки и add_paragraph против блока-образца"""
+    template = app.template_cache.get('zayav.docx')
+    creditors_all = sample_creditors(1000)
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Прежняя версия ищет ячейку по тексту после замены плейсхолдеров
+        filled = template.open()
+        app.replace_placeholders_advanced(filled, {"{Кредитор n}": "Кредитор 1"})
+
+    def texts(doc):
+        return [cell.text for table in doc.tables for row in table.rows for cell in row.cells]
+
+    print(f"{'Кредиторов':<12}{'прежнее':>12}{'образец':>12}{'на кредитора':>16}")
+    for count in (10, 100, 1000):
+        creditors = creditors_all[:count]
+
+        def legacy():
+            doc = clone_document(filled)
+            with contextlib.redirect_stdout(io.StringIO()):
+                legacy_add_additional_creditors(doc, creditors)
+            return doc
+
+        def block():
+            doc = clone_document(filled)
+            with contextlib.redirect_stdout(io.StringIO()):
+                app.add_additional_creditors_to_text(doc, creditors, template.creditor_block)
+            return doc
+
+        if texts(legacy()) != texts(block()):
+            print(f"❌ {count} кредиторов: текст шапки отличается от прежней версии")
+        # Клонирование документа одинаково для обеих версий и входит в оба замера
+        before = measure(legacy, repeat=10)
+        after = measure(block, repeat=10)
+        clone = measure(lambda: clone_document(filled), repeat=10)
+        per_creditor = (after - clone) / (count - 1) * 1000
+        print(f"{count:<12}{before:>10.1f}мс{after:>10.1f}мс{per_creditor:>13.1f}мкс")
+        record(count, 'legacy', before)
+        record(count, 'block', after)
+
+
+# Шапка таблицы кредиторов синтетического шаблона (как в list-of-creditors.docx)
+STRESS_TABLE_HEADER = "Сведения о кредиторах по денежным обязательствам"
+STRESS_TABLE_COLUMNS = 8
+
+
+def stress_template(paragraphs, split_every=3):
+    """
+    Синтетический шаблон для нагрузочных замеров: paragraphs параграфов с плейсхолдерами
+    (каждый split_every-й разорван между тремя runs, как после правки в Word),
+    шапка с ячейкой "{Кредитор n}" и таблица кредиторов со строкой 1.1 и разделом 2.
+    Возвращает CompiledTemplate
+    """
+    doc = Document()
+
+    header = doc.add_table(rows=1, cols=2)
+    header.cell(0, 0).text = "Кредиторы"
+    cell = header.cell(0, 1)
+    cell.text = "{Кредитор n}"
+    cell.add_paragraph("{Наименование кредитора}")
+    cell.add_paragraph("{Почтовый индекс и адрес}")
+
+    for i in range(paragraphs):
+        paragraph = doc.add_paragraph(f"Абзац {i}: ")
+        key = f"Поле {i % 50}"
+        if split_every and i % split_every == 0:
+            paragraph.add_run("{")
+            paragraph.add_run(key).bold = True
+            paragraph.add_run("}")
+        else:
+            paragraph.add_run(f"{{{key}}}")
+        paragraph.add_run(" — текст без плейсхолдеров, {ИНН} и {Фамилия} {Имя}.")
+
+    table = doc.add_table(rows=4, cols=STRESS_TABLE_COLUMNS)
+    rows = (
+        [STRESS_TABLE_HEADER] * STRESS_TABLE_COLUMNS,
+        ["1", "Денежные обязательства"] + [""] * (STRESS_TABLE_COLUMNS - 2),
+        ["1.1", "{содержание1}", "{кредитор1}", "{адрес1}", "{основание1}", "{сумма1}", "{долг1}", "{штраф1}"],
+        ["2", "Обязательные платежи"] + [""] * (STRESS_TABLE_COLUMNS - 2),
+    )
+    for row, values in zip(table.rows, rows):
+        for cell, value in zip(row.cells, values):
+            cell.text = value
+
+    output = io.BytesIO()
+    doc.save(output)
+    return CompiledTemplate(f"stress-{paragraphs}.docx", output.getvalue())
+
+
+def paragraph_texts(doc):
+    return [paragraph.text for paragraph in iter_all_paragraphs(doc)]
+
+
+def bench_variants():
+    """Четыре реализации замены в runs и индексный проход на реальных и синтетических шаблонах"""
+    variants = (
+        ("replace_in_runs", standalone.replace_in_runs),
+        ("replace_in_runs_advanced", standalone.replace_in_runs_advanced),
+        ("replace_in_runs_smart", standalone.replace_in_runs_smart),
+        ("preserve_formatting", replace_in_runs_preserve_formatting),
+    )
+    templates = [app.template_cache.get(path) for path in DOCUMENT_TEMPLATES]
+    templates += [stress_template(200), stress_template(2000)]
+
+    print(f"{'Шаблон':<26}{'Вариант':<28}{'время':>10}  результат")
+    for template in templates:
+        replacements = sample_replacements(template)
+        repeat = 3 if len(template.index.slots) > 1000 else 10
+
+        def replace_all(doc, variant):
+            for paragraph in list(iter_all_paragraphs(doc)):
+                variant(paragraph, replacements)
+            return doc
+
+        # Эталон — текущая реализация; варианты, зависящие от порядка ключей, могут отличаться
+        reference = paragraph_texts(replace_all(template.open(), replace_in_runs_preserve_formatting))
+        for title, variant in variants:
+            try:
+                result = paragraph_texts(replace_all(template.open(), variant))
+                elapsed = measure(lambda doc: replace_all(doc, variant), repeat=repeat, setup=template.open)
+            except Exception as e:
+                print(f"{template.path:<26}{title:<28}{'—':>10}  ошибка: {e}")
+                continue
+            same = "=" if result == reference else "≠ эталона"
+            print(f"{template.path:<26}{title:<28}{elapsed:>8.1f}мс  {same}")
+            record(template.path, title, elapsed)
+
+        # Индексный проход приложения: только параграфы с плейсхолдерами, один Replacer
+        def indexed(doc):
+            app.replace_placeholders_indexed(part_roots(doc), template.index, replacements)
+
+        elapsed = measure(indexed, repeat=repeat, setup=template.open)
+        print(f"{template.path:<26}{'indexed (app)':<28}{elapsed:>8.1f}мс")
+        record(template.path, 'indexed', elapsed)
+
+
+def bench_pipeline():
+    """Стадии генерации по отдельности: загрузка, замена, кредиторы, шапка, сохранение, архив"""
+    counts = (1, 10, 100, 1000)
+    templates = [app.template_cache.get(path) for path, _, _, _ in app.INITIAL_DOCUMENTS]
+    templates.append(stress_template(2000))
+    debtor = app.read_initial_form(sample_form(0))
+    current_date = datetime.now()
+
+    stages = ("load", "open", "replacements", "substitute", "creditor rows", "header",
+              "save", "package write")
+    print(f"{'Шаблон':<24}{'Стадия':<16}" + "".join(f"{count:>11}" for count in counts))
+    for template in templates:
+        timings = {stage: [] for stage in stages}
+        for count in counts:
+            creditors = sample_creditors(count)
+            repeat = 3 if count >= 1000 else 5
+            with contextlib.redirect_stdout(io.StringIO()):
+                replacements = app.build_initial_replacements(debtor, creditors, current_date)
+            if template.path.startswith("stress-"):
+                replacements.update(sample_replacements(template))
+            replacements = template.index.prune(replacements)
+
+            def substituted():
+                doc = template.open()
+                app.replace_placeholders_indexed(part_roots(doc), template.index, replacements)
+                return doc
+
+            def filled():
+                doc = substituted()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    app.add_additional_creditors_to_text(doc, creditors, template.creditor_block)
+                    app.add_creditors_rows_improved(doc, creditors)
+                return doc
+
+            def package_roots():
+                # Те же стадии, что и в filled(), но над копиями частей пакета
+                roots = template.package.copy_roots()
+                doc = template.package.document(roots)
+                app.replace_placeholders_indexed(roots, template.index, replacements)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    app.add_additional_creditors_to_text(doc, creditors, template.creditor_block)
+                    app.add_creditors_rows_improved(doc, creditors)
+                return roots
+
+            def rows(doc):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    app.add_creditors_rows_improved(doc, creditors)
+
+            def header(doc):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    app.add_additional_creditors_to_text(doc, creditors, template.creditor_block)
+
+            def build_replacements():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    app.build_initial_replacements(debtor, creditors, current_date)
+
+            timings["load"].append(measure(lambda: CompiledTemplate(template.path, template.blob), repeat=repeat))
+            timings["open"].append(measure(template.open, repeat=repeat))
+            timings["replacements"].append(measure(build_replacements, repeat=repeat))
+            timings["substitute"].append(measure(
+                lambda doc: app.replace_placeholders_indexed(part_roots(doc), template.index, replacements),
+                repeat=repeat, setup=template.open))
+            timings["creditor rows"].append(measure(rows, repeat=repeat, setup=substituted))
+            timings["header"].append(measure(header, repeat=repeat, setup=substituted))
+            timings["save"].append(measure(lambda doc: doc.save(io.BytesIO()), repeat=repeat, setup=filled))
+            timings["package write"].append(measure(template.package.write, repeat=repeat, setup=package_roots))
+
+        for stage in stages:
+            print(f"{template.path:<24}{stage:<16}" + "".join(f"{value:>9.1f}мс" for value in timings[stage]))
+            for count, value in zip(counts, timings[stage]):
+                record(f"{template.path}/{count}", stage, value)
+
+    # Архив из готовых документов: сборка в памяти и потоковая отдача
+    print(f"\n{'Архив':<40}" + "".join(f"{count:>11}" for count in counts))
+    archive_timings = {"build_archive": [], "stream_archive": []}
+    for count in counts:
+        creditors = sample_creditors(count)
+        with contextlib.redirect_stdout(io.StringIO()):
+            replacements = app.build_initial_replacements(debtor, creditors, current_date)
+            documents = [
+                (f"{path}", bytes(app.process_document_in_memory(path, replacements, creditors).getvalue()))
+                for path, _, _, _ in app.INITIAL_DOCUMENTS
+            ]
+        archive_timings["build_archive"].append(measure(lambda: build_archive(documents), repeat=5))
+        archive_timings["stream_archive"].append(
+            measure(lambda: list(stream_archive(iter(documents))), repeat=5))
+    for title, values in archive_timings.items():
+        print(f"{title:<40}" + "".join(f"{value:>9.1f}мс" for value in values))
+        for count, value in zip(counts, values):
+            record(f"archive/{count}", title, value)
+
+
+class SlowStream(io.TextIOBase):
+    """stdout с медленным драйвером логов: каждая запись ждет delay секунд"""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def write(self, text):
+        time.sleep(self.delay)
+        return len(text)
+
+
+def bench_logging():
+    """Запись в журнал при медленном stdout: print против очереди logs.py (p50/p99 вызова)"""
+    message = "Создан документ «%s»: %s"
+    args = ("заявление о банкротстве", "bankruptcy_application_Иванов_Иван_20250101.docx")
+
+    def latencies(func, repeat=300):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings), statistics.quantiles(timings, n=100)[98]
+
+    print(f"{'Вывод':<12}{'Способ':<10}{'p50':>10}{'p99':>10}{'отброшено':>11}")
+    for delay_ms in (0, 1, 5):
+        stream = SlowStream(delay_ms / 1000)
+
+        with contextlib.redirect_stdout(stream):
+            p50, p99 = latencies(lambda: print(message % args))
+        print(f"{f'{delay_ms} мс':<12}{'print':<10}{p50:>8.3f}мс{p99:>8.3f}мс{'-':>11}")
+        record(f"{delay_ms}ms", 'print: p50', p50)
+        record(f"{delay_ms}ms", 'print: p99', p99)
+
+        # Как в logs.configure_logging, но со своей очередью и медленным выводом
+        handler = logs.DroppingQueueHandler(queue.Queue(logs.LOG_QUEUE_SIZE))
+        handler.addFilter(logs.RequestIdFilter())
+        output = logging.StreamHandler(stream)
+        output.setFormatter(logging.Formatter(logs.TEXT_FORMAT))
+        listener = logging.handlers.QueueListener(handler.queue, output)
+        logger = logging.getLogger('benchmark.logging')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        dropped = logs.LOG_DROPPED.snapshot().get('[]', 0)
+        listener.start()
+        p50, p99 = latencies(lambda: logger.info(message, *args))
+        # Остаток очереди дописывается вне замера
+        listener.stop()
+        logger.removeHandler(handler)
+        dropped = logs.LOG_DROPPED.snapshot().get('[]', 0) - dropped
+        print(f"{f'{delay_ms} мс':<12}{'очередь':<10}{p50:>8.3f}мс{p99:>8.3f}мс{dropped:>11}")
+        record(f"{delay_ms}ms", 'queue: p50', p50)
+        record(f"{delay_ms}ms", 'queue: p99', p99)
+
+
+def bench_pages():
+    """Страницы форм: render_template на каждый запрос против готовых вариантов page_cache (gzip/br, 304)"""
+    import flask
+
+    import page_cache
+
+    pages = (('/', 'home.html'), ('/initial', 'initial.html'), ('/with-case', 'with_case.html'))
+    encodings = "gzip, deflate, br" if page_cache.brotli is not None else "gzip, deflate"
+
+    def response_time(path, build, headers):
+        # Сборка ответа в контексте запроса (без маршрутизации и хуков — они одинаковы)
+        def run():
+            with app.app.test_request_context(path, headers=headers):
+                response = build()
+                b"".join(response.response)
+        return measure(run, repeat=300)
+
+    print(f"{'Страница':<12}{'как было':>11}{'из кэша':>10}{'304':>9}"
+          f"{'байт':>9}{'gzip':>8}{'br':>8}   (Accept-Encoding: {encodings})")
+    for path, name in pages:
+        rendered = response_time(path, lambda: app.app.make_response(flask.render_template(name)), {})
+        headers = {'Accept-Encoding': encodings}
+        cached = response_time(path, lambda: app.page_response(name), headers)
+        page = page_cache.page_cache.get(name, app.render_page)
+        _, _, etag = page.select(flask.Request.from_values(headers=headers).accept_encodings)
+        not_modified = response_time(path, lambda: app.page_response(name), {**headers, 'If-None-Match': f'"{etag}"'})
+
+        sizes = {encoding: len(body) for encoding, (body, _) in page.variants.items()}
+        print(f"{path:<12}{rendered:>9.3f}мс{cached:>8.3f}мс{not_modified:>7.3f}мс"
+              f"{sizes[None]:>9}{sizes.get('gzip', 0):>8}{sizes.get('br', 0):>8}")
+        record(path, 'render_template', rendered)
+        record(path, 'page_cache', cached)
+        record(path, 'page_cache 304', not_modified)
+        for encoding, size in sizes.items():
+            record(path, f"size {encoding or 'identity'}", size, 'bytes')
+
+
+def bench_reload():
+    """Проверка шаблонов на диске (template_watcher.py): опрос без изменений и подмена измененного шаблона"""
+    import shutil
+    import tempfile
+
+    from template_watcher import TemplateWatcher
+
+    directory = tempfile.mkdtemp(prefix='bench-reload-')
+    try:
+        paths = []
+        for template_path in DOCUMENT_TEMPLATES:
+            if os.path.exists(template_path):
+                paths.append(shutil.copy(template_path, directory))
+        cache = TemplateCache()
+        cache.preload(paths)
+        watcher = TemplateWatcher(cache)
+
+        idle = measure(watcher.check, repeat=200)
+        print(f"Опрос {len(paths)} шаблонов без изменений: {idle * 1000:.0f} мкс")
+        record('idle', 'check', idle)
+
+        def touch():
+            # Тот же файл с новым временем изменения: хэш совпадает, разбора нет
+            os.utime(paths[0])
+
+        touched = measure(lambda _: watcher.check(), repeat=20, setup=touch)
+        print(f"Файл переписан тем же содержимым: {touched:.2f} мс")
+        record('touch', 'check', touched)
+
+        with open(paths[0], 'rb') as template_file:
+            original = template_file.read()
+        versions = iter(range(1000))
+
+        def modify():
+            # Новое содержимое: другой комментарий ZIP меняет хэш, но не документ
+            buffer = io.BytesIO(original)
+            with zipfile.ZipFile(buffer, 'a') as archive:
+                archive.comment = f"v{next(versions)}".encode()
+            with open(paths[0], 'wb') as template_file:
+                template_file.write(buffer.getvalue())
+
+        changed = measure(lambda _: watcher.check(), repeat=10, setup=modify)
+        print(f"Шаблон {os.path.basename(paths[0])} изменен — разбор и подмена: {changed:.1f} мс (вне запросов)")
+        record('changed', 'check', changed)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_coldstart():
+    """Холодный старт до готовности (import wsgi в новом процессе): разбор шаблонов против снимка"""
+    snapshot_path = os.path.abspath('benchmark.snapshot')
+    template_snapshot.build_snapshot(DOCUMENT_TEMPLATES, snapshot_path)
+    code = (
+        "import json, time\n"
+        "start = time.perf_counter()\n"
+        "import wsgi\n"
+        "print(json.dumps({'ready': time.perf_counter() - start, 'templates': wsgi.startup['seconds']}))\n"
+    )
+
+    def cold_start(snapshot):
+        env = dict(os.environ, TEMPLATE_SNAPSHOT=snapshot, LOG_LEVEL='WARNING')
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True).stdout
+        total = time.perf_counter() - start
+        result = json.loads(output.strip().splitlines()[-1])
+        return total * 1000, result['ready'] * 1000, result['templates'] * 1000
+
+    print(f"{'Старт':<14}{'процесс':>10}{'import wsgi':>13}{'шаблоны и суды':>16}")
+    try:
+        for title, snapshot in (("без снимка", snapshot_path + '.missing'), ("со снимком", snapshot_path)):
+            runs = [cold_start(snapshot) for _ in range(5)]
+            total, ready, templates = (statistics.median(values) for values in zip(*runs))
+            print(f"{title:<14}{total:>8.0f}мс{ready:>11.0f}мс{templates:>14.0f}мс")
+            record(title, 'process', total)
+            record(title, 'import wsgi', ready)
+            record(title, 'templates and courts', templates)
+    finally:
+        os.remove(snapshot_path)
+
+
+def git_commit():
+    """Текущий коммит (None вне git)"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path):
+    """Сохраняет замеры запуска в JSON"""
+    payload = {
+        'commit': git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'render_backend': app.RENDER_BACKEND,
+        'results': RESULTS,
+    }
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(payload, output, ensure_ascii=False, indent=2)
+    print(f"\nЗамеров: {len(RESULTS)}, сохранено в {path}")
+
+
+def compare_results(old_path, new_path, threshold=0.1):
+    """
+    Сравнивает два файла замеров: отношение новое/старое по каждому общему замеру
+    Возвращает число ухудшений больше threshold
+    """
+    runs = []
+    for path in (old_path, new_path):
+        with open(path, encoding='utf-8') as results_file:
+            runs.append(json.load(results_file))
+    old, new = ({(r['benchmark'], r['case'], r['metric']): r for r in run['results']} for run in runs)
+
+    print(f"{runs[0].get('commit')} -> {runs[1].get('commit')}")
+    print(f"{'Бенчмарк':<12}{'Случай':<30}{'Замер':<26}{'было':>12}{'стало':>12}{'изменение':>11}")
+    regressions = 0
+    for key in (key for key in new if key in old):
+        before, after = old[key]['value'], new[key]['value']
+        unit = new[key]['unit']
+        if not before:
+            continue
+        ratio = after / before
+        worse = ratio > 1 + threshold if unit in LOWER_IS_BETTER else ratio < 1 - threshold
+        regressions += worse
+        benchmark, case, metric = key
+        print(f"{benchmark:<12}{case[:29]:<30}{metric[:25]:<26}{before:>10.2f}{unit:<2}{after:>10.2f}{unit:<2}"
+              f"{(ratio - 1) * 100:>+9.0f}%{'  ⚠️' if worse else ''}")
+    only = len(set(old) ^ set(new))
+    if only:
+        print(f"Замеров только в одном из файлов: {only}")
+    print(f"Ухудшений больше {threshold:.0%}: {regressions}")
+    return regressions
+
+
+BENCHMARKS = {
+    'parse': bench_parse,
+    'runs': bench_runs,
+    'archive': bench_archive,
+    'stream': bench_stream,
+    'package': bench_package,
+    'serve': bench_serve,
+    'admission': bench_admission,
+    'cache': bench_cache,
+    'incremental': bench_incremental,
+    'prune': bench_prune,
+    'rows': bench_rows,
+    'header': bench_header,
+    'variants': bench_variants,
+    'pipeline': bench_pipeline,
+    'logging': bench_logging,
+    'pages': bench_pages,
+    'reload': bench_reload,
+    'coldstart': bench_coldstart,
+}
+
+
+def main(argv):
+    global _current_benchmark
+    parser = argparse.ArgumentParser(description="Бенчмарки генерации документов")
+    parser.add_argument('names', nargs='*', help=f"бенчмарки (по умолчанию все): {', '.join(BENCHMARKS)}")
+    parser.add_argument('--json', metavar='PATH', help="сохранить замеры в JSON")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="сравнить два файла замеров")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare_results(*args.compare)
+        return 0
+
+    names = args.names or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Неизвестный бенчмарк: {name}. Доступны: {', '.join(BENCHMARKS)}")
+            return 1
+    for name in names:
+        print(f"\n=== {name}: {BENCHMARKS[name].__doc__}")
+        _current_benchmark = name
+        BENCHMARKS[name]()
+    if args.json:
+        write_results(args.json)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
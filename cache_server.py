@@ -0,0 +1,53 @@
+"""
+Локальный сервер общего кэша результатов (замена общего хранилища для нескольких узлов)
+
+Запуск:
+    RESULT_CACHE_TOKEN=секрет python cache_server.py [порт] [каталог]
+
+Узлы подключаются через RESULT_CACHE_URL=http://хост:порт с тем же RESULT_CACHE_TOKEN:
+без токена сервер не запускается, запросы без него получают 401 (иначе любой,
+кто достучится до сервера, мог бы подменить документы всех узлов).
+По умолчанию сервер слушает только localhost; другой адрес — CACHE_SERVER_HOST.
+"""
+import hmac
+import os
+import re
+import sys
+
+from flask import Flask, Response, request
+
+from result_cache import TOKEN_HEADER, DiskCache
+
+KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def create_cache_server(backend, token):
+    """Flask-приложение: GET/PUT /<ключ> поверх любого CacheBackend, доступ по токену"""
+    server = Flask(__name__)
+
+    @server.route('/<key>', methods=['GET', 'PUT'])
+    def cache_entry(key):
+        if not hmac.compare_digest(request.headers.get(TOKEN_HEADER, '').encode(), token.encode()):
+            return Response(status=401)
+        if not KEY_RE.match(key):
+            return Response(status=400)
+        if request.method == 'PUT':
+            backend.set(key, request.get_data())
+            return Response(status=204)
+        value = backend.get(key)
+        if value is None:
+            return Response(status=404)
+        return Response(value, mimetype='application/octet-stream')
+
+    return server
+
+
+if __name__ == '__main__':
+    token = os.environ.get('RESULT_CACHE_TOKEN')
+    if not token:
+        sys.exit("Задайте RESULT_CACHE_TOKEN: общий токен сервера кэша и узлов")
+    host = os.environ.get('CACHE_SERVER_HOST', '127.0.0.1')
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8090
+    directory = sys.argv[2] if len(sys.argv) > 2 else os.path.join('.cache', 'results')
+    max_bytes = int(os.environ.get('RESULT_CACHE_DISK_MB', '2048')) * 1024 * 1024
+    create_cache_server(DiskCache(directory, max_bytes), token).run(host=host, port=port, threaded=True)
@@ -0,0 +1,547 @@
+import logging
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Словарь всех 89 субъектов РФ с арбитражными судами
+RUSSIAN_REGIONS_COURTS = {
+    # Республики
+    "Республика Адыгея": {
+        "nominative": "Арбитражный суд Республики Адыгея",
+        "genitive": "Арбитражного суда Республики Адыгея",
+        "pattern": r"Республик[аеуы]\s+Адыге[яюйи]|Адыге[яюйи]"
+    },
+    "Республика Алтай": {
+        "nominative": "Арбитражный суд Республики Алтай",
+        "genitive": "Арбитражного суда Республики Алтай",
+        "pattern": r"Республик[аеуы]\s+Алтай\b"
+    },
+    "Республика Башкортостан": {
+        "nominative": "Арбитражный суд Республики Башкортостан",
+        "genitive": "Арбитражного суда Республики Башкортостан",
+        "pattern": r"Республик[аеуы]\s+Башкортостан|Башкортостан|Башкири[яюйи]"
+    },
+    "Республика Бурятия": {
+        "nominative": "Арбитражный суд Республики Бурятия",
+        "genitive": "Арбитражного суда Республики Бурятия",
+        "pattern": r"Республик[аеуы]\s+Буряти[яюйи]|Буряти[яюйи]"
+    },
+    "Республика Дагестан": {
+        "nominative": "Арбитражный суд Республики Дагестан",
+        "genitive": "Арбитражного суда Республики Дагестан",
+        "pattern": r"Республик[аеуы]\s+Дагестан|Дагестан"
+    },
+    "Республика Ингушетия": {
+        "nominative": "Арбитражный суд Республики Ингушетия",
+        "genitive": "Арбитражного суда Республики Ингушетия",
+        "pattern": r"Республик[аеуы]\s+Ингушети[яюйи]|Ингушети[яюйи]"
+    },
+    "Кабардино-Балкарская Республика": {
+        "nominative": "Арбитражный суд Кабардино-Балкарской Республики",
+        "genitive": "Арбитражного суда Кабардино-Балкарской Республики",
+        "pattern": r"Кабардино[-\s]?Балкарск[ауеоий]|КБР"
+    },
+    "Республика Калмыкия": {
+        "nominative": "Арбитражный суд Республики Калмыкия",
+        "genitive": "Арбитражного суда Республики Калмыкия",
+        "pattern": r"Республик[аеуы]\s+Калмыки[яюйи]|Калмыки[яюйи]"
+    },
+    "Карачаево-Черкесская Республика": {
+        "nominative": "Арбитражный суд Карачаево-Черкесской Республики",
+        "genitive": "Арбитражного суда Карачаево-Черкесской Республики",
+        "pattern": r"Карачаево[-\s]?Черкесск[ауеоий]|КЧР"
+    },
+    "Республика Карелия": {
+        "nominative": "Арбитражный суд Республики Карелия",
+        "genitive": "Арбитражного суда Республики Карелия",
+        "pattern": r"Республик[аеуы]\s+Карели[яюйи]|Карели[яюйи]"
+    },
+    "Республика Коми": {
+        "nominative": "Арбитражный суд Республики Коми",
+        "genitive": "Арбитражного суда Республики Коми",
+        "pattern": r"Республик[аеуы]\s+Коми\b"
+    },
+    "Республика Крым": {
+        "nominative": "Арбитражный суд Республики Крым",
+        "genitive": "Арбитражного суда Республики Крым",
+        "pattern": r"Республик[аеуы]\s+Крым\b"
+    },
+    "Республика Марий Эл": {
+        "nominative": "Арбитражный суд Республики Марий Эл",
+        "genitive": "Арбитражного суда Республики Марий Эл",
+        "pattern": r"Республик[аеуы]\s+Марий\s+Эл|Марий\s+Эл"
+    },
+    "Республика Мордовия": {
+        "nominative": "Арбитражный суд Республики Мордовия",
+        "genitive": "Арбитражного суда Республики Мордовия",
+        "pattern": r"Республик[аеуы]\s+Мордови[яюйи]|Мордови[яюйи]"
+    },
+    "Республика Саха (Якутия)": {
+        "nominative": "Арбитражный суд Республики Саха (Якутия)",
+        "genitive": "Арбитражного суда Республики Саха (Якутия)",
+        "pattern": r"Республик[аеуы]\s+Саха|Якути[яюйи]|Саха"
+    },
+    "Республика Северная Осетия - Алания": {
+        "nominative": "Арбитражный суд Республики Северная Осетия - Алания",
+        "genitive": "Арбитражного суда Республики Северная Осетия - Алания",
+        "pattern": r"Северн[ауеоий]\s+Осети[яюйи]|Алани[яюйи]|РСО[-\s]?Алани[яюйи]"
+    },
+    "Республика Татарстан": {
+        "nominative": "Арбитражный суд Республики Татарстан",
+        "genitive": "Арбитражного суда Республики Татарстан",
+        "pattern": r"Республик[аеуы]\s+Татарстан|Татарстан"
+    },
+    "Республика Тыва": {
+        "nominative": "Арбитражный суд Республики Тыва",
+        "genitive": "Арбитражного суда Республики Тыва",
+        "pattern": r"Республик[аеуы]\s+Тыв[ауы]|Тыв[ауы]|Тув[ауы]"
+    },
+    "Удмуртская Республика": {
+        "nominative": "Арбитражный суд Удмуртской Республики",
+        "genitive": "Арбитражного суда Удмуртской Республики",
+        "pattern": r"Удмуртск[ауеоий]\s+Республик|Удмурти[яюйи]"
+    },
+    "Республика Хакасия": {
+        "nominative": "Арбитражный суд Республики Хакасия",
+        "genitive": "Арбитражного суда Республики Хакасия",
+        "pattern": r"Республик[аеуы]\s+Хакаси[яюйи]|Хакаси[яюйи]"
+    },
+    "Чеченская Республика": {
+        "nominative": "Арбитражный суд Чеченской Республики",
+        "genitive": "Арбитражного суда Чеченской Республики",
+        "pattern": r"Чеченск[ауеоий]\s+Республик|Чечн[яюйи]|Чечен"
+    },
+    "Чувашская Республика": {
+        "nominative": "Арбитражный суд Чувашской Республики",
+        "genitive": "Арбитражного суда Чувашской Республики",
+        "pattern": r"Чувашск[ауеоий]\s+Республик|Чуваш[иі][яюйи]"
+    },
+    # Края
+    "Алтайский край": {
+        "nominative": "Арбитражный суд Алтайского края",
+        "genitive": "Арбитражного суда Алтайского края",
+        "pattern": r"(?:^|,\s*)Алтайск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
+    },
+    "Забайкальский край": {
+        "nominative": "Арбитражный суд Забайкальского края",
+        "genitive": "Арбитражного суда Забайкальского края",
+        "pattern": r"(?:^|,\s*)Забайкальск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
+    },
+    "Камчатский край": {
+        "nominative": "Арбитражный суд Камчатского края",
+        "genitive": "Арбитражного суда Камчатского края",
+        "pattern": r"(?:^|,\s*)Камчатск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
+    },
+    "Краснодарский край": {
+        "nominative": "Арбитражный суд Краснодарского края",
+        "genitive": "Арбитражного суда Краснодарского края",
+        "pattern": r"(?:^|,\s*)Краснодарск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
+    },
+    "Красноярский край": {
+        "nominative": "Арбитражный суд Красноярского края",
+        "genitive": "Арбитражного суда Красноярского края",
+        "pattern": r"(?:^|,\s*)Красноярск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
+    },
+    "Пермский край": {
+        "nominative": "Арбитражный суд Пермского края",
+        "genitive": "Арбитражного суда Пермского края",
+        "pattern": r"(?:^|,\s*)Пермск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
+    },
+    "Приморский край": {
+        "nominative": "Арбитражный суд Приморского края",
+        "genitive": "Арбитражного суда Приморского края",
+        "pattern": r"(?:^|,\s*)Приморск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
+    },
+    "Ставропольский край": {
+        "nominative": "Арбитражный суд Ставропольского края",
+        "genitive": "Арбитражного суда Ставропольского края",
+        "pattern": r"(?:^|,\s*)Ставропольск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
+    },
+    "Хабаровский край": {
+        "nominative": "Арбитражный суд Хабаровского края",
+        "genitive": "Арбитражного суда Хабаровского края",
+        "pattern": r"(?:^|,\s*)Хабаровск(?:ий|ого)(?:[,\s]+кра[йяюе])?"
+    },
+    # Области
+    "Амурская область": {
+        "nominative": "Арбитражный суд Амурской области",
+        "genitive": "Арбитражного суда Амурской области",
+        "pattern": r"(?:^|,\s*)Амурск[ауеоий](?:[,\s]+область)?"
+    },
+    "Архангельская область": {
+        "nominative": "Арбитражный суд Архангельской области",
+        "genitive": "Арбитражного суда Архангельской области",
+        "pattern": r"(?:^|,\s*)Архангельск[ауеоий](?:[,\s]+область)?"
+    },
+    "Астраханская область": {
+        "nominative": "Арбитражный суд Астраханской области",
+        "genitive": "Арбитражного суда Астраханской области",
+        "pattern": r"(?:^|,\s*)Астраханск[ауеоий](?:[,\s]+область)?"
+    },
+    "Белгородская область": {
+        "nominative": "Арбитражный суд Белгородской области",
+        "genitive": "Арбитражного суда Белгородской области",
+        "pattern": r"(?:^|,\s*)Белгородск[ауеоий](?:[,\s]+область)?"
+    },
+    "Брянская область": {
+        "nominative": "Арбитражный суд Брянской области",
+        "genitive": "Арбитражного суда Брянской области",
+        "pattern": r"(?:^|,\s*)Брянск[ауеоий](?:[,\s]+область)?"
+    },
+    "Владимирская область": {
+        "nominative": "Арбитражный суд Владимирской области",
+        "genitive": "Арбитражного суда Владимирской области",
+        "pattern": r"(?:^|,\s*)Владимирск[ауеоий](?:[,\s]+область)?"
+    },
+    "Волгоградская область": {
+        "nominative": "Арбитражный суд Волгоградской области",
+        "genitive": "Арбитражного суда Волгоградской области",
+        "pattern": r"(?:^|,\s*)Волгоградск[ауеоий](?:[,\s]+область)?"
+    },
+    "Вологодская область": {
+        "nominative": "Арбитражный суд Вологодской области",
+        "genitive": "Арбитражного суда Вологодской области",
+        "pattern": r"(?:^|,\s*)Вологодск[ауеоий](?:[,\s]+область)?"
+    },
+    "Воронежская область": {
+        "nominative": "Арбитражный суд Воронежской области",
+        "genitive": "Арбитражного суда Воронежской области",
+        "pattern": r"(?:^|,\s*)Воронежск[ауеоий](?:[,\s]+область)?"
+    },
+    "Ивановская область": {
+        "nominative": "Арбитражный суд Ивановской области",
+        "genitive": "Арбитражного суда Ивановской области",
+        "pattern": r"(?:^|,\s*)Ивановск[ауеоий](?:[,\s]+область)?"
+    },
+    "Иркутская область": {
+        "nominative": "Арбитражный суд Иркутской области",
+        "genitive": "Арбитражного суда Иркутской области",
+        "pattern": r"(?:^|,\s*)Иркутск[ауеоий](?:[,\s]+область)?"
+    },
+    "Калининградская область": {
+        "nominative": "Арбитражный суд Калининградской области",
+        "genitive": "Арбитражного суда Калининградской области",
+        "pattern": r"(?:^|,\s*)Калининградск[ауеоий](?:[,\s]+область)?"
+    },
+    "Калужская область": {
+        "nominative": "Арбитражный суд Калужской области",
+        "genitive": "Арбитражного суда Калужской области",
+        "pattern": r"(?:^|,\s*)Калужск[ауеоий](?:[,\s]+область)?"
+    },
+    "Кемеровская область": {
+        "nominative": "Арбитражный суд Кемеровской области",
+        "genitive": "Арбитражного суда Кемеровской области",
+        "pattern": r"(?:^|,\s*)(?:Кемеровск[ауеоий](?:[,\s]+область)?|Кузбасс)"
+    },
+    "Кировская область": {
+        "nominative": "Арбитражный суд Кировской области",
+        "genitive": "Арбитражного суда Кировской области",
+        "pattern": r"(?:^|,\s*)Кировск[ауеоий](?:[,\s]+область)?"
+    },
+    "Костромская область": {
+        "nominative": "Арбитражный суд Костромской области",
+        "genitive": "Арбитражного суда Костромской области",
+        "pattern": r"(?:^|,\s*)Костромск[ауеоий](?:[,\s]+область)?"
+    },
+    "Курганская область": {
+        "nominative": "Арбитражный суд Курганской области",
+        "genitive": "Арбитражного суда Курганской области",
+        "pattern": r"(?:^|,\s*)Курганск[ауеоий](?:[,\s]+область)?"
+    },
+    "Курская область": {
+        "nominative": "Арбитражный суд Курской области",
+        "genitive": "Арбитражного суда Курской области",
+        "pattern": r"(?:^|,\s*)Курск[ауеоий](?:[,\s]+область)?"
+    },
+    "Ленинградская область": {
+        "nominative": "Арбитражный суд Ленинградской области",
+        "genitive": "Арбитражного суда Ленинградской области",
+        "pattern": r"(?:^|,\s*)Ленинградск[ауеоий](?:[,\s]+область)?"
+    },
+    "Липецкая область": {
+        "nominative": "Арбитражный суд Липецкой области",
+        "genitive": "Арбитражного суда Липецкой области",
+        "pattern": r"(?:^|,\s*)Липецк[ауеоий](?:[,\s]+область)?"
+    },
+    "Магаданская область": {
+        "nominative": "Арбитражный суд Магаданской области",
+        "genitive": "Арбитражного суда Магаданской области",
+        "pattern": r"(?:^|,\s*)Магаданск[ауеоий](?:[,\s]+область)?"
+    },
+    "Московская область": {
+        "nominative": "Арбитражный суд Московской области",
+        "genitive": "Арбитражного суда Московской области",
+        "pattern": r"(?:^|,\s*)(?:Московск[ауеоий](?:[,\s]+область)?|Подмосковье)"
+    },
+    "Мурманская область": {
+        "nominative": "Арбитражный суд Мурманской области",
+        "genitive": "Арбитражного суда Мурманской области",
+        "pattern": r"(?:^|,\s*)Мурманск[ауеоий](?:[,\s]+область)?"
+    },
+    "Нижегородская область": {
+        "nominative": "Арбитражный суд Нижегородской области",
+        "genitive": "Арбитражного суда Нижегородской области",
+        "pattern": r"(?:^|,\s*)Нижегородск[ауеоий](?:[,\s]+область)?"
+    },
+    "Новгородская область": {
+        "nominative": "Арбитражный суд Новгородской области",
+        "genitive": "Арбитражного суда Новгородской области",
+        "pattern": r"(?:^|,\s*)Новгородск[ауеоий](?:[,\s]+область)?"
+    },
+    "Новосибирская область": {
+        "nominative": "Арбитражный суд Новосибирской области",
+        "genitive": "Арбитражного суда Новосибирской области",
+        "pattern": r"(?:^|,\s*)Новосибирск[ауеоий](?:[,\s]+область)?"
+    },
+    "Омская область": {
+        "nominative": "Арбитражный суд Омской области",
+        "genitive": "Арбитражного суда Омской области",
+        "pattern": r"(?:^|,\s*)Омск[ауеоий](?:[,\s]+область)?"
+    },
+    "Оренбургская область": {
+        "nominative": "Арбитражный суд Оренбургской области",
+        "genitive": "Арбитражного суда Оренбургской области",
+        "pattern": r"(?:^|,\s*)Оренбургск[ауеоий](?:[,\s]+область)?"
+    },
+    "Орловская область": {
+        "nominative": "Арбитражный суд Орловской области",
+        "genitive": "Арбитражного суда Орловской области",
+        "pattern": r"(?:^|,\s*)Орловск[ауеоий](?:[,\s]+область)?"
+    },
+    "Пензенская область": {
+        "nominative": "Арбитражный суд Пензенской области",
+        "genitive": "Арбитражного суда Пензенской области",
+        "pattern": r"(?:^|,\s*)Пензенск[ауеоий](?:[,\s]+область)?"
+    },
+    "Псковская область": {
+        "nominative": "Арбитражный суд Псковской области",
+        "genitive": "Арбитражного суда Псковской области",
+        "pattern": r"(?:^|,\s*)Псковск[ауеоий](?:[,\s]+область)?"
+    },
+    "Ростовская область": {
+        "nominative": "Арбитражный суд Ростовской области",
+        "genitive": "Арбитражного суда Ростовской области",
+        "pattern": r"(?:^|,\s*)Ростовск[ауеоий](?:[,\s]+область)?"
+    },
+    "Рязанская область": {
+        "nominative": "Арбитражный суд Рязанской области",
+        "genitive": "Арбитражного суда Рязанской области",
+        "pattern": r"(?:^|,\s*)Рязанск[ауеоий](?:[,\s]+область)?"
+    },
+    "Самарская область": {
+        "nominative": "Арбитражный суд Самарской области",
+        "genitive": "Арбитражного суда Самарской области",
+        "pattern": r"(?:^|,\s*)Самарск[ауеоий](?:[,\s]+область)?"
+    },
+    "Саратовская область": {
+        "nominative": "Арбитражный суд Саратовской области",
+        "genitive": "Арбитражного суда Саратовской области",
+        "pattern": r"(?:^|,\s*)Саратовск[ауеоий](?:[,\s]+область)?"
+    },
+    "Сахалинская область": {
+        "nominative": "Арбитражный суд Сахалинской области",
+        "genitive": "Арбитражного суда Сахалинской области",
+        "pattern": r"(?:^|,\s*)Сахалинск[ауеоий](?:[,\s]+область)?"
+    },
+    "Свердловская область": {
+        "nominative": "Арбитражный суд Свердловской области",
+        "genitive": "Арбитражного суда Свердловской области",
+        "pattern": r"(?:^|,\s*)Свердловск[ауеоий](?:[,\s]+область)?"
+    },
+    "Смоленская область": {
+        "nominative": "Арбитражный суд Смоленской области",
+        "genitive": "Арбитражного суда Смоленской области",
+        "pattern": r"(?:^|,\s*)Смоленск[ауеоий](?:[,\s]+область)?"
+    },
+    "Тамбовская область": {
+        "nominative": "Арбитражный суд Тамбовской области",
+        "genitive": "Арбитражного суда Тамбовской области",
+        "pattern": r"(?:^|,\s*)Тамбовск[ауеоий](?:[,\s]+область)?"
+    },
+    "Тверская область": {
+        "nominative": "Арбитражный суд Тверской области",
+        "genitive": "Арбитражного суда Тверской области",
+        "pattern": r"(?:^|,\s*)Тверск[ауеоий](?:[,\s]+область)?"
+    },
+    "Томская область": {
+        "nominative": "Арбитражный суд Томской области",
+        "genitive": "Арбитражного суда Томской области",
+        "pattern": r"(?:^|,\s*)Томск[ауеоий](?:[,\s]+область)?"
+    },
+    "Тульская область": {
+        "nominative": "Арбитражный суд Тульской области",
+        "genitive": "Арбитражного суда Тульской области",
+        "pattern": r"(?:^|,\s*)Тульск[ауеоий](?:[,\s]+область)?"
+    },
+    "Тюменская область": {
+        "nominative": "Арбитражный суд Тюменской области",
+        "genitive": "Арбитражного суда Тюменской области",
+        "pattern": r"(?:^|,\s*)Тюменск[ауеоий](?:[,\s]+область)?"
+    },
+    "Ульяновская область": {
+        "nominative": "Арбитражный суд Ульяновской области",
+        "genitive": "Арбитражного суда Ульяновской области",
+        "pattern": r"(?:^|,\s*)Ульяновск[ауеоий](?:[,\s]+область)?"
+    },
+    "Челябинская область": {
+        "nominative": "Арбитражный суд Челябинской области",
+        "genitive": "Арбитражного суда Челябинской области",
+        "pattern": r"(?:^|,\s*)Челябинск[ауеоий](?:[,\s]+область)?"
+    },
+    "Ярославская область": {
+        "nominative": "Арбитражный суд Ярославской области",
+        "genitive": "Арбитражного суда Ярославской области",
+        "pattern": r"(?:^|,\s*)Ярославск[ауеоий](?:[,\s]+область)?"
+    },
+    # Города федерального значения
+    "Москва": {
+        "nominative": "Арбитражный суд города Москвы",
+        "genitive": "Арбитражного суда города Москвы",
+        "pattern": r"(?:^|,\s*)(?:г\.?\s*)?Москв[ауеы](?!\s*ск[ауеоий])"
+    },
+    "Санкт-Петербург": {
+        "nominative": "Арбитражный суд города Санкт-Петербурга",
+        "genitive": "Арбитражного суда города Санкт-Петербурга",
+        "pattern": r"(?:^|,\s*)(?:г\.?\s*)?(?:Санкт[-\s]?Петербург|СПб|С\.Петербург)"
+    },
+    "Севастополь": {
+        "nominative": "Арбитражный суд города Севастополя",
+        "genitive": "Арбитражного суда города Севастополя",
+        "pattern": r"(?:^|,\s*)(?:г\.?\s*)?Севастопол[ьяюе]"
+    },
+    # Автономная область
+    "Еврейская автономная область": {
+        "nominative": "Арбитражный суд Еврейской автономной области",
+        "genitive": "Арбитражного суда Еврейской автономной области",
+        "pattern": r"Еврейск[ауеоий](?:[,\s]+(?:автономн[ауеоий][,\s]+)?область)?|ЕАО"
+    },
+    # Автономные округа
+    "Ненецкий автономный округ": {
+        "nominative": "Арбитражный суд Ненецкого автономного округа",
+        "genitive": "Арбитражного суда Ненецкого автономного округа",
+        "pattern": r"Ненецк(?:ий|ого)(?:[,\s]+(?:автономн[ыого]+[,\s]+)?округ)?|НАО"
+    },
+    "Ханты-Мансийский автономный округ": {
+        "nominative": "Арбитражный суд Ханты-Мансийского автономного округа - Югры",
+        "genitive": "Арбитражного суда Ханты-Мансийского автономного округа - Югры",
+        "pattern": r"Ханты[-\s]?Мансийск(?:ий|ого)(?:[,\s]+(?:автономн[ыого]+[,\s]+)?округ)?|ХМАО|Югр[ауеы]"
+    },
+    "Чукотский автономный округ": {
+        "nominative": "Арбитражный суд Чукотского автономного округа",
+        "genitive": "Арбитражного суда Чукотского автономного округа",
+        "pattern": r"Чукотск(?:ий|ого)(?:[,\s]+(?:автономн[ыого]+[,\s]+)?округ)?|ЧАО"
+    },
+    "Ямало-Ненецкий автономный округ": {
+        "nominative": "Арбитражный суд Ямало-Ненецкого автономного округа",
+        "genitive": "Арбитражного суда Ямало-Ненецкого автономного округа",
+        "pattern": r"Ямало[-\s]?Ненецк(?:ий|ого)(?:[,\s]+(?:автономн[ыого]+[,\s]+)?округ)?|ЯНАО"
+    },
+}
+
+
+# Результат определения суда: регион и суд в двух падежах
+CourtMatch = namedtuple('CourtMatch', ['region', 'nominative', 'genitive'])
+
+NO_COURT = CourtMatch("", "", "")
+
+# Города федерального значения проверяются после областей
+FEDERAL_CITIES = ["Москва", "Санкт-Петербург", "Севастополь"]
+
+
+def _region_priority(region_name):
+    """
+    Приоритет региона: более специфичные названия проверяются первыми
+    (например, "Московская область" перед "Москва", "Алтайский край" перед "Республика Алтай")
+    """
+    if "область" in region_name.lower():
+        priority = 1  # Области - высокий приоритет
+    elif "край" in region_name.lower():
+        priority = 2  # Края
+    elif "автономн" in region_name.lower():
+        priority = 3  # Автономные округа и области
+    elif region_name in FEDERAL_CITIES:
+        priority = 5  # Города - низкий приоритет (проверяются после областей)
+    else:
+        priority = 4  # Республики
+    # Внутри приоритета — по длине названия (от большего к меньшему)
+    return (priority, -len(region_name))
+
+
+def _build_matcher():
+    """
+    Собирает одно регулярное выражение для всех регионов (текст и порядок регионов)
+
+    Каждая альтернатива имеет вид ".*?(шаблон региона)" и привязана к началу строки,
+    поэтому альтернативы проверяются строго по порядку приоритета: побеждает первый
+    регион, шаблон которого встречается в адресе где угодно — как и при поочередном
+    re.search по отсортированному списку.
+    """
+    regions = sorted(RUSSIAN_REGIONS_COURTS, key=_region_priority)
+    alternatives = [
+        f"(?P<r{i}>.*?(?:{RUSSIAN_REGIONS_COURTS[region_name]['pattern']}))"
+        for i, region_name in enumerate(regions)
+    ]
+    return "|".join(alternatives), regions
+
+
+_COURT_SOURCE, _COURT_REGIONS = _build_matcher()
+_COURT_FLAGS = re.IGNORECASE | re.DOTALL
+
+# Компилируется при первом обращении; warm_start (template_snapshot.py) компилирует
+# его до fork процессов gunicorn — процессы получают уже готовое выражение
+_court_pattern = None
+
+
+def court_pattern():
+    """Скомпилированное выражение судов (компиляция — десятки миллисекунд)"""
+    global _court_pattern
+    if _court_pattern is None:
+        _court_pattern = re.compile(_COURT_SOURCE, _COURT_FLAGS)
+    return _court_pattern
+
+
+@lru_cache(maxsize=4096)
+def _resolve_normalized(normalized_address):
+    match = court_pattern().match(normalized_address)
+    if match is None:
+        logger.warning("Не удалось определить регион по адресу: %s", normalized_address)
+        return NO_COURT
+
+    region_name = _COURT_REGIONS[int(match.lastgroup[1:])]
+    court_data = RUSSIAN_REGIONS_COURTS[region_name]
+    logger.debug("Определен регион: %s (%s)", region_name, court_data['nominative'])
+    return CourtMatch(region_name, court_data["nominative"], court_data["genitive"])
+
+
+def resolve_court(address):
+    """
+    Определяет арбитражный суд по адресу регистрации
+    Возвращает CourtMatch(регион, суд в именительном падеже, суд в родительном падеже)
+    """
+    if not address:
+        return NO_COURT
+    # Нормализуем адрес для поиска
+    return _resolve_normalized(address.strip())
+
+
+def resolve_many(addresses):
+    """
+    Пакетное определение судов для списка адресов (для массовой генерации)
+    Возвращает CourtMatch в порядке адресов; повторяющиеся адреса разбираются один раз
+    """
+    courts = {}
+    for address in addresses:
+        if address not in courts:
+            courts[address] = resolve_court(address)
+    return [courts[address] for address in addresses]
+
+
+def determine_court_by_address(address):
+    """
+    Определяет арбитражный суд по адресу регистрации
+    Возвращает кортеж (суд в именительном падеже, суд в родительном падеже)
+    """
+    court = resolve_court(address)
+    return (court.nominative, court.genitive)
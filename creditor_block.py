@@ -0,0 +1,108 @@
+import copy
+
+from docx.oxml.ns import qn
+from docx.oxml.parser import OxmlElement, parse_xml
+from lxml import etree
+
+from placeholders import element_path
+
+# Признаки ячейки с первым кредитором в шаблоне заявления (до замены плейсхолдеров)
+ANCHOR_MARKERS = ("{Кредитор n}", "{Кредитор 1}", "Кредитор 1")
+
+# Ячейки длиннее — это текст заявления, а не шапка
+_MAX_ANCHOR_TEXT = 300
+
+
+def _paragraph_text(p):
+    return "".join(t.text or "" for t in p.iter(qn('w:t')))
+
+
+class CreditorBlock:
+    """
+    Дополнительные кредиторы в шапке заявления (zayav.docx)
+
+    Ячейка шапки с первым кредитором ищется один раз при загрузке шаблона и
+    запоминается путем от корня документа. Из ее оформления заранее собирается
+    блок одного кредитора: пустой параграф-отступ, "Кредитор N", название, адрес
+    (в формате первого run ячейки — в шаблоне это жирный шрифт). Для каждого следующего кредитора блок копируется, в нем меняется
+    только текст, и все блоки дописываются в ячейку одной операцией.
+    """
+
+    def __init__(self, path, prototype):
+        self.path = path
+        self.prototype = prototype
+
+    @classmethod
+    def find(cls, document):
+        """CreditorBlock для шаблона или None, если ячейки с кредитором в нем нет"""
+        for table in document.tables:
+            for tr in table._tbl.tr_lst:
+                for tc in tr.tc_lst:
+                    paragraphs = tc.p_lst
+                    text = "\n".join(_paragraph_text(p) for p in paragraphs).strip()
+                    if len(text) >= _MAX_ANCHOR_TEXT:
+                        continue
+                    for p in paragraphs:
+                        if any(marker in _paragraph_text(p) for marker in ANCHOR_MARKERS):
+                            return cls(element_path(document.element, tc), _build_prototype(p))
+        return None
+
+    @classmethod
+    def from_state(cls, state):
+        """CreditorBlock из state() (None — ячейки в шаблоне нет)"""
+        if state is None:
+            return None
+        path, prototype = state
+        return cls(path, [parse_xml(xml) for xml in prototype])
+
+    def state(self):
+        """Путь к ячейке и XML параграфов блока — для сериализации"""
+        return self.path, tuple(etree.tostring(p) for p in self.prototype)
+
+    def insert(self, root, creditors):
+        """
+        Дописывает кредиторов начиная со второго в ячейку копии документа
+        root — корневой элемент основной части копии (document.element)
+        """
+        tc = root
+        for child_index in self.path:
+            tc = tc[child_index]
+
+        paragraphs = []
+        for creditor_num, creditor in enumerate(creditors[1:], start=2):
+            block = [copy.deepcopy(p) for p in self.prototype]
+            values = (f"Кредитор {creditor_num}", creditor['name'], creditor['address'])
+            for p, value in zip(block[1:], values):
+                t = next(p.iter(qn('w:t')))
+                if "\n" in value or "\t" in value:
+                    # Переносы и табуляции превращаются в w:br и w:tab сеттером run
+                    t.getparent().text = value
+                else:
+                    t.text = value
+            paragraphs.extend(block)
+        tc.extend(paragraphs)
+        return len(creditors) - 1
+
+
+def _build_prototype(source):
+    """
+    Блок одного кредитора с оформлением параграфа source:
+    свойства параграфа и первого run копируются как есть
+    """
+    pPr = source.pPr
+    runs = source.r_lst
+    run_properties = runs[0].rPr if runs and runs[0].rPr is not None else None
+
+    def paragraph(with_text):
+        p = OxmlElement('w:p')
+        if pPr is not None:
+            p.append(copy.deepcopy(pPr))
+        if with_text:
+            r = p.add_r()
+            if run_properties is not None:
+                r.append(copy.deepcopy(run_properties))
+            t = r._add_t()
+            t.set(qn('xml:space'), 'preserve')
+        return p
+
+    return [paragraph(False), paragraph(True), paragraph(True), paragraph(True)]
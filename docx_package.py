@@ -0,0 +1,181 @@
+import copy
+import io
+import posixpath
+import struct
+import zipfile
+import zlib
+
+from docx.document import Document as DocxDocument
+from docx.opc.oxml import serialize_part_xml
+from docx.oxml.parser import parse_xml
+
+# Части, в которых могут быть плейсхолдеры: основной текст и колонтитулы
+PATCHABLE_CONTENT_TYPES = (
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.header+xml",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.footer+xml",
+)
+
+MAIN_DOCUMENT_CONTENT_TYPE = PATCHABLE_CONTENT_TYPES[0]
+
+# Форматы записей ZIP (см. APPNOTE.TXT)
+_CENTRAL_DIR_STRUCT = struct.Struct("<4s4B4HL2L5H2L")
+_END_ARCHIVE_STRUCT = struct.Struct("<4s4H2LH")
+_LOCAL_HEADER_STRUCT = struct.Struct("<4s2B4HL2L2H")
+_DATA_DESCRIPTOR_FLAG = 0x08
+
+_CONTENT_TYPES_NS = "{http://schemas.openxmlformats.org/package/2006/content-types}"
+
+
+class PackageTemplate:
+    """
+    Шаблон для генерации на уровне ZIP-пакета
+
+    Разбираются и переписываются только основной текст и колонтитулы.
+    Остальные части (стили, нумерация, темы, шрифты, customXml, картинки)
+    копируются из шаблона как есть — сжатыми байтами, без распаковки.
+    """
+
+    def __init__(self, blob, document=None):
+        """
+        document — уже разобранный документ python-docx: эталонные элементы частей
+        берутся из него. Без document нужные части разбираются прямо из ZIP
+        (шаблон из снимка, template_snapshot.py), весь пакет не загружается
+        """
+        self.blob = blob
+        archive = zipfile.ZipFile(io.BytesIO(blob))
+        self.members = archive.infolist()
+
+        self.patchable = {}
+        self.main_partname = None
+        if document is not None:
+            for part in document.part.package.iter_parts():
+                if part.content_type in PATCHABLE_CONTENT_TYPES:
+                    self._add_part(str(part.partname), part.content_type, part.element)
+        else:
+            # Тем же парсером, что и python-docx: элементы получают классы oxml (таблицы и т.п.)
+            for partname, content_type in _content_types(archive).items():
+                if content_type in PATCHABLE_CONTENT_TYPES:
+                    self._add_part(partname, content_type, parse_xml(archive.read(partname[1:])))
+
+    def _add_part(self, partname, content_type, element):
+        self.patchable[partname] = element
+        if content_type == MAIN_DOCUMENT_CONTENT_TYPE:
+            self.main_partname = partname
+
+    def copy_roots(self):
+        """Собственные копии изменяемых частей: {имя части: корневой элемент}"""
+        return {partname: copy.deepcopy(element) for partname, element in self.patchable.items()}
+
+    def document(self, roots):
+        """
+        Обертка python-docx над копией основного текста — для работы с таблицами.
+        Часть пакета не передается: стили и связи через нее не меняются
+        """
+        return DocxDocument(roots[self.main_partname], None)
+
+    def write(self, roots, compresslevel=6):
+        """
+        Собирает .docx: переписанные части сжимаются заново, остальные копируются
+        сжатыми байтами из шаблона. Возвращает BytesIO
+        """
+        replaced = {
+            partname.lstrip("/"): serialize_part_xml(element)
+            for partname, element in roots.items()
+        }
+
+        output = io.BytesIO()
+        entries = []
+        for source in self.members:
+            entry = copy.copy(source)
+            entry.flag_bits &= ~_DATA_DESCRIPTOR_FLAG
+            entry.header_offset = output.tell()
+
+            data = replaced.get(source.filename)
+            if data is None:
+                raw = self._raw_member(source)
+            else:
+                compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15)
+                raw = compressor.compress(data) + compressor.flush()
+                entry.compress_type = zipfile.ZIP_DEFLATED
+                entry.CRC = zlib.crc32(data)
+                entry.file_size = len(data)
+                entry.compress_size = len(raw)
+
+            output.write(entry.FileHeader())
+            output.write(raw)
+            entries.append(entry)
+
+        _write_central_directory(output, entries)
+        output.seek(0)
+        return output
+
+    def _raw_member(self, info):
+        """Сжатые байты файла из шаблона без распаковки"""
+        header = _LOCAL_HEADER_STRUCT.unpack_from(self.blob, info.header_offset)
+        filename_length, extra_length = header[10], header[11]
+        start = info.header_offset + _LOCAL_HEADER_STRUCT.size + filename_length + extra_length
+        return self.blob[start:start + info.compress_size]
+
+
+def _content_types(archive):
+    """Типы частей пакета по [Content_Types].xml: {имя части: тип}"""
+    types = parse_xml(archive.read("[Content_Types].xml"))
+    defaults = {
+        element.get("Extension").lower(): element.get("ContentType")
+        for element in types.iter(f"{_CONTENT_TYPES_NS}Default")
+    }
+    overrides = {
+        element.get("PartName"): element.get("ContentType")
+        for element in types.iter(f"{_CONTENT_TYPES_NS}Override")
+    }
+    content_types = {}
+    for name in archive.namelist():
+        partname = "/" + name
+        extension = posixpath.splitext(name)[1][1:].lower()
+        content_type = overrides.get(partname) or defaults.get(extension)
+        if content_type is not None:
+            content_types[partname] = content_type
+    return content_types
+
+
+def _encode_filename(entry):
+    try:
+        return entry.filename.encode("ascii"), entry.flag_bits
+    except UnicodeEncodeError:
+        return entry.filename.encode("utf-8"), entry.flag_bits | 0x800
+
+
+def _write_central_directory(output, entries):
+    """
+    Центральный каталог и запись конца архива
+    Формат ZIP64 не поддерживается: если размеры или смещения в него не помещаются,
+    zipfile.LargeZipFile (для .docx такого не бывает, но битый архив хуже ошибки)
+    """
+    start = output.tell()
+    if len(entries) >= zipfile.ZIP_FILECOUNT_LIMIT or start > zipfile.ZIP64_LIMIT or any(
+        max(entry.file_size, entry.compress_size, entry.header_offset) > zipfile.ZIP64_LIMIT
+        for entry in entries
+    ):
+        raise zipfile.LargeZipFile("Документ слишком велик: нужен формат ZIP64")
+    for entry in entries:
+        filename, flag_bits = _encode_filename(entry)
+        year, month, day, hour, minute, second = entry.date_time
+        dosdate = (year - 1980) << 9 | month << 5 | day
+        dostime = hour << 11 | minute << 5 | (second // 2)
+        output.write(_CENTRAL_DIR_STRUCT.pack(
+            b"PK\001\002",
+            entry.create_version, entry.create_system,
+            entry.extract_version, entry.reserved,
+            flag_bits, entry.compress_type, dostime, dosdate,
+            entry.CRC, entry.compress_size, entry.file_size,
+            len(filename), len(entry.extra), len(entry.comment),
+            0, entry.internal_attr, entry.external_attr, entry.header_offset,
+        ))
+        output.write(filename)
+        output.write(entry.extra)
+        output.write(entry.comment)
+    size = output.tell() - start
+    output.write(_END_ARCHIVE_STRUCT.pack(
+        b"PK\005\006", 0, 0, len(entries), len(entries), size, start, 0,
+    ))
@@ -0,0 +1,41 @@
+# Настройки gunicorn для production (запуск: gunicorn -c gunicorn.conf.py)
+import os
+
+wsgi_app = "wsgi:application"
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+
+# Приложение и шаблоны загружаются в главном процессе до fork
+preload_app = True
+
+# Рабочих процессов и потоков в каждом. Потоков больше, чем генераций и очередь
+# ожидания лимитера (admission.py): свободный поток сразу отвечает 503
+workers = int(os.environ.get('WEB_WORKERS', str(os.cpu_count() or 1)))
+threads = int(os.environ.get('WEB_THREADS', '8'))
+
+# Перезапуск процесса после N запросов (разброс, чтобы процессы не уходили разом)
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', '100'))
+
+# Генерация архивов с большим числом кредиторов может занимать десятки секунд
+timeout = int(os.environ.get('WEB_TIMEOUT', '120'))
+graceful_timeout = 30
+
+errorlog = "-"
+# Формат по умолчанию и номер запроса (X-Request-ID) — как в журнале приложения
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s" [%({x-request-id}o)s]'
+
+# Журнал доступа (запись на каждый запрос) — через очередь журнала приложения (logs.py):
+# поток запроса не ждет вывода в stdout. Сообщения самого gunicorn — как обычно, в stderr
+logconfig_dict = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'root': {'level': os.environ.get('LOG_LEVEL', 'INFO').upper(), 'handlers': ['queue']},
+    'loggers': {
+        'gunicorn.error': {'level': 'INFO', 'handlers': ['error_console'], 'propagate': False},
+        'gunicorn.access': {'level': 'INFO', 'handlers': ['queue'], 'propagate': False},
+    },
+    'handlers': {
+        'queue': {'()': 'logs.queue_handler'},
+        'error_console': {'class': 'logging.StreamHandler', 'formatter': 'generic', 'stream': 'ext://sys.stderr'},
+    },
+}
@@ -0,0 +1,320 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from archive import ARCHIVE_SPOOL_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Состояния задачи
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job:
+    """
+    Задача генерации архива: состояние, результат или текст ошибки
+    Результат — байты ZIP (result) или файл на диске (result_path) для больших архивов
+    """
+
+    def __init__(self, job_id, filename):
+        self.id = job_id
+        self.filename = filename
+        self.status = QUEUED
+        self.result = None
+        self.result_path = None
+        self.size = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        # Время стадий генерации, секунды (заполняет функция задачи)
+        self.timings = {}
+
+    def to_dict(self):
+        """Описание задачи для ответа API (без самого результата)"""
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'filename': self.filename,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'size': self.size,
+            'timings': dict(self.timings),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        job = cls(data['job_id'], data['filename'])
+        job.status = data['status']
+        job.error = data['error']
+        job.created_at = data['created_at']
+        job.finished_at = data['finished_at']
+        job.size = data['size']
+        job.timings = data.get('timings') or {}
+        return job
+
+
+class JobQueue:
+    """
+    Очередь задач генерации внутри процесса
+
+    Задачи выполняются в пуле потоков (сама генерация может уходить в пул процессов
+    рендеринга, см. RENDER_WORKERS). Готовые результаты удаляются через result_ttl
+    секунд после завершения — только фоновым потоком: опрос задачи не обходит каталог.
+    Задача, которая не завершилась за max_runtime секунд после постановки (процесс
+    перезапущен или упал посреди генерации), считается неудавшейся: клиент получает
+    failed, а не queued/running навсегда. Внешние сервисы не нужны.
+
+    Если задан directory, состояние и результаты задач пишутся в этот каталог:
+    при нескольких процессах gunicorn опрос и скачивание могут прийти в любой из них.
+    Без directory состояние хранится в памяти процесса, результаты до memory_limit
+    байт — тоже, больше — во временном каталоге процесса.
+    """
+
+    def __init__(self, workers=2, result_ttl=600, directory=None, memory_limit=ARCHIVE_SPOOL_BYTES,
+                 max_runtime=1800):
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.max_runtime = max_runtime
+        self.directory = directory
+        self.memory_limit = memory_limit
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._janitor = None
+        self._spool_directory = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _get_executor(self):
+        # Пул создается лениво: после fork (gunicorn, пул рендеринга) потоки не наследуются
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+        return self._executor
+
+    def _start_janitor(self):
+        # Вызывается под блокировкой; после fork поток запускается заново
+        if self._janitor is None or self._janitor[0] != os.getpid():
+            thread = threading.Thread(target=self._purge_periodically, name='job-janitor', daemon=True)
+            self._janitor = (os.getpid(), thread)
+            thread.start()
+
+    def _purge_periodically(self):
+        """Удаляет просроченные результаты и отмечает зависшие задачи, даже если запросов нет"""
+        while True:
+            time.sleep(max(1, min(self.result_ttl, self.max_runtime, 60)))
+            try:
+                self._purge_expired()
+            except Exception:
+                logger.exception("Ошибка очистки задач")
+
+    def submit(self, filename, func, *args, timings=None):
+        """
+        Ставит в очередь func(*args), которая возвращает файл с архивом (BytesIO,
+        SpooledTemporaryFile), перемотанный на начало; файл закрывается после сохранения.
+        Возвращает Job сразу, не дожидаясь генерации
+
+        timings — словарь стадий, который заполняет func: сохраняется вместе с задачей
+        """
+        job = Job(uuid.uuid4().hex, filename)
+        if timings is not None:
+            job.timings = timings
+        with self._lock:
+            self._start_janitor()
+            self._jobs[job.id] = job
+            self._save(job)
+            # Задача выполняется в копии контекста: в журнале — номер запроса, который ее создал
+            context = contextvars.copy_context()
+            self._get_executor().submit(context.run, self._run, job, func, args)
+        return job
+
+    def get(self, job_id):
+        """Возвращает Job или None, если задачи нет или ее результат уже удален"""
+        with self._lock:
+            self._start_janitor()
+            job = self._jobs.get(job_id)
+        if job is None and self.directory:
+            job = self._load(job_id)
+        if job is None or self._expired(job, time.time()):
+            return None
+        return job
+
+    def result_source(self, job):
+        """
+        Готовый архив задачи: байты или путь к файлу (для send_file с Range и sendfile)
+        None, если результата уже нет
+        """
+        if job.result is not None:
+            return job.result
+        if job.result_path is not None:
+            path = job.result_path
+        elif self.directory:
+            path = self._path(job.id, '.zip')
+        else:
+            return None
+        return path if os.path.exists(path) else None
+
+    def _run(self, job, func, args):
+        job.status = RUNNING
+        self._save(job)
+        try:
+            with func(*args) as archive_file:
+                if self.directory:
+                    job.size = self._write_file(self._path(job.id, '.zip'), archive_file)
+                else:
+                    job.size = archive_file.seek(0, os.SEEK_END)
+                    archive_file.seek(0)
+                    if job.size <= self.memory_limit:
+                        job.result = archive_file.read()
+                    else:
+                        path = os.path.join(self._get_spool_directory(), job.id + '.zip')
+                        self._write_file(path, archive_file)
+                        job.result_path = path
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+            logger.exception("Ошибка в задаче %s: %s", job.id, e)
+        job.finished_at = time.time()
+        self._save(job)
+        if self.directory:
+            # Результат на диске — в памяти процесса задачу не держим
+            with self._lock:
+                self._jobs.pop(job.id, None)
+
+    def _path(self, job_id, suffix):
+        return os.path.join(self.directory, job_id + suffix)
+
+    def _write(self, path, data):
+        """Атомарная запись: читатель в другом процессе не увидит недописанный файл"""
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary_path, 'wb') as output:
+            output.write(data)
+        os.replace(temporary_path, path)
+
+    def _write_file(self, path, source):
+        """Атомарная запись из файла кусками (архив не читается в память целиком); возвращает размер"""
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary_path, 'wb') as output:
+                shutil.copyfileobj(source, output, 1024 * 1024)
+                size = output.tell()
+            os.replace(temporary_path, path)
+        except BaseException:
+            try:
+                os.remove(temporary_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return size
+
+    def _get_spool_directory(self):
+        """Временный каталог процесса для больших результатов (без directory); удаляется при выходе"""
+        with self._lock:
+            if self._spool_directory is None:
+                self._spool_directory = tempfile.mkdtemp(prefix='bankruptcy-jobs-')
+                atexit.register(shutil.rmtree, self._spool_directory, True)
+            return self._spool_directory
+
+    def _save(self, job):
+        if self.directory:
+            self._write(self._path(job.id, '.json'), json.dumps(job.to_dict()).encode('utf-8'))
+
+    def _load(self, job_id):
+        # Номер задачи приходит из URL: допускаем только hex, чтобы не выйти из каталога
+        if not job_id.isalnum():
+            return None
+        job = self._load_file(self._path(job_id, '.json'))
+        if job is not None and self._stale(job, time.time()):
+            # Процесс, выполнявший задачу, перезапущен: задача уже не завершится
+            self._fail_stale(job)
+        return job
+
+    def _load_file(self, path):
+        try:
+            with open(path, 'rb') as meta_file:
+                return Job.from_dict(json.load(meta_file))
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def _expired(self, job, now):
+        """Результат завершенной задачи старше result_ttl"""
+        return job.finished_at is not None and job.finished_at < now - self.result_ttl
+
+    def _stale(self, job, now):
+        """Задача в очереди или выполняется дольше max_runtime с момента постановки"""
+        return job.status in (QUEUED, RUNNING) and job.created_at < now - self.max_runtime
+
+    def _fail_stale(self, job):
+        job.status = FAILED
+        job.error = f'Задача не завершилась за {self.max_runtime} с'
+        job.finished_at = time.time()
+        logger.warning("Задача %s не завершилась за %d с, отмечена как неудавшаяся", job.id, self.max_runtime)
+        self._save(job)
+
+    def _purge_expired(self):
+        """
+        Удаляет завершенные задачи старше result_ttl и отмечает зависшие (фоновый поток)
+        Каталог задач обходится без блокировки: опрос задач не ждет очистки
+        """
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if self._expired(job, now)]
+            removed = [self._jobs.pop(job_id) for job_id in expired]
+        for job in removed:
+            if job.result_path is not None:
+                try:
+                    os.remove(job.result_path)
+                except FileNotFoundError:
+                    pass
+
+        if not self.directory:
+            return
+        # Время изменения .json — время последней смены состояния: более свежие файлы не читаются
+        oldest = now - min(self.result_ttl, self.max_runtime)
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                if entry.stat().st_mtime >= oldest:
+                    continue
+            except FileNotFoundError:
+                continue
+            job = self._load_file(entry.path)
+            if job is None:
+                continue
+            if self._stale(job, now):
+                self._fail_stale(job)
+            elif self._expired(job, now):
+                for suffix in ('.zip', '.json'):
+                    try:
+                        os.remove(self._path(job.id, suffix))
+                    except FileNotFoundError:
+                        pass
+
+    def shutdown(self):
+        """Останавливает пул потоков, дожидаясь текущих задач"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        # Без блокировки: завершающаяся задача сама берет ее (_run)
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+job_queue = JobQueue(
+    workers=int(os.environ.get('JOB_WORKERS', '2')),
+    result_ttl=int(os.environ.get('JOB_RESULT_TTL', '600')),
+    directory=os.environ.get('JOB_DIR') or None,
+    max_runtime=int(os.environ.get('JOB_MAX_RUNTIME', '1800')),
+)
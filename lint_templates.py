@@ -0,0 +1,111 @@
+"""
+Проверка шаблонов документов по манифесту плейсхолдеров
+
+Запуск:
+    python lint_templates.py                  # все шаблоны
+    python lint_templates.py zayav.docx       # выбранные
+    python lint_templates.py --creditors 5    # словарь замен для 5 кредиторов (по умолчанию 2)
+    python lint_templates.py --strict         # предупреждения тоже считаются ошибками
+
+Сообщает:
+    missing — плейсхолдеры шаблона, которые остаются незамененными
+    split   — плейсхолдеры, разорванные между несколькими runs (значение получит
+              форматирование первого run)
+    unused  — ключи словаря замен, которые не встречаются ни в одном шаблоне набора
+
+Код возврата 1, если есть missing (с --strict — любые замечания).
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from placeholders import PLACEHOLDER_RE, compile_replacements
+
+import app
+
+
+def sample_creditors(count):
+    """Кредиторы с заполненными полями: для проверки важны только ключи замен"""
+    return [
+        {key: f"{key} {i}" for key in ('name', 'address', 'Содержание обязательства', 'Кредитор',
+                                       'Место нахождения', 'Основание', 'Сумма обязательства',
+                                       'Задолженность', 'Штрафы')}
+        for i in range(1, count + 1)
+    ]
+
+
+def document_sets(creditors_count):
+    """Наборы документов и словари замен, с которыми они генерируются"""
+    current_date = datetime.now()
+    creditors = sample_creditors(creditors_count)
+    initial = app.build_initial_replacements(
+        {field: field for field in app.INITIAL_FIELDS}, creditors, current_date)
+    case = app.build_case_replacements({field: field for field in app.CASE_FIELDS}, current_date)
+    return (
+        ("/initial", app.INITIAL_DOCUMENTS, initial),
+        ("/with-case", app.CASE_DOCUMENTS, case),
+    )
+
+
+def lint_template(template, replacements):
+    """Возвращает (missing, split, used) для шаблона и словаря замен"""
+    pruned = template.index.prune(replacements)
+    replacer = compile_replacements(pruned)
+
+    missing = set()
+    for slot in template.index.slots:
+        missing.update(match.group() for match in PLACEHOLDER_RE.finditer(replacer.sub(slot.text)))
+
+    used = set(template.index.dependencies(replacer))
+    return sorted(missing), list(template.index.split), used
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Проверка плейсхолдеров в шаблонах документов")
+    parser.add_argument('templates', nargs='*', help="шаблоны для проверки (по умолчанию все)")
+    parser.add_argument('--creditors', type=int, default=2, help="число кредиторов в словаре замен")
+    parser.add_argument('--strict', action='store_true', help="предупреждения тоже считаются ошибками")
+    args = parser.parse_args(argv)
+
+    errors = warnings = 0
+    for route, documents, replacements in document_sets(args.creditors):
+        used_in_set = set()
+        checked = False
+        for template_path, _, title, _ in documents:
+            if args.templates and template_path not in args.templates:
+                continue
+            template = app.template_cache.get(template_path)
+            if template is None:
+                print(f"❌ {template_path}: шаблон не найден")
+                errors += 1
+                continue
+            checked = True
+
+            missing, split, used = lint_template(template, replacements)
+            used_in_set |= used
+            print(f"\n{template_path} ({title}, {route}): плейсхолдеров {len(template.index.placeholders)}, "
+                  f"ключей замен {len(used)} из {len(replacements)}")
+            for placeholder in missing:
+                print(f"  ❌ missing: {placeholder}")
+            for placeholder in split:
+                print(f"  ⚠️ split: {placeholder}")
+            errors += len(missing)
+            warnings += len(split)
+
+        # Неиспользуемые ключи имеют смысл только для полного набора документов
+        if checked and not args.templates:
+            unused = sorted(key for key in replacements if key not in used_in_set)
+            if unused:
+                print(f"\n{route}: ключи замен, которых нет ни в одном шаблоне ({len(unused)}):")
+                for key in unused:
+                    print(f"  ⚠️ unused: {key!r}")
+            warnings += len(unused)
+
+    print(f"\nОшибок: {errors}, предупреждений: {warnings}")
+    if errors or (args.strict and warnings):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
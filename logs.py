@@ -0,0 +1,143 @@
+"""
+Журнал сервиса: уровни, номер запроса и запись в фоновом потоке
+
+Потоки запросов только кладут запись в очередь (QueueHandler), в stdout пишет
+QueueListener в отдельном потоке. Журнал доступа gunicorn идет через ту же очередь
+(logconfig_dict в gunicorn.conf.py, queue_handler). Если вывод не успевает (медленный драйвер
+логов Docker) и очередь заполнена, запись отбрасывается, а не задерживает запрос;
+число отброшенных записей — метрика bankruptcy_log_dropped_total.
+
+Настройки окружения:
+  LOG_LEVEL       — уровень, по умолчанию INFO. DEBUG включает подробный вывод
+                    генерации: строки таблиц кредиторов, плейсхолдеры, определение суда
+  LOG_FORMAT      — text (по умолчанию) или json: одна JSON-запись на строку
+  LOG_QUEUE_SIZE  — сколько записей может ждать вывода
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import uuid
+from datetime import datetime
+
+from metrics import Counter, registry
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s'
+
+# Номер текущего запроса; задачи (jobs.py) выполняются в копии контекста запроса
+request_id = contextvars.ContextVar('request_id', default='-')
+
+LOG_DROPPED = registry.register(Counter(
+    'bankruptcy_log_dropped_total', 'Записи журнала, отброшенные из-за переполненной очереди'))
+
+# Стандартные поля LogRecord: все остальные — переданные через extra, попадают в JSON
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+
+def new_request_id(header_value=None):
+    """
+    Номер запроса: из заголовка X-Request-ID (если он похож на идентификатор:
+    латиница, цифры и дефисы) или новый случайный
+    """
+    if (header_value and len(header_value) <= 64 and header_value.isascii()
+            and header_value.replace('-', '').isalnum()):
+        return header_value
+    return uuid.uuid4().hex[:16]
+
+
+class RequestIdFilter(logging.Filter):
+    """Добавляет к записи номер запроса (в потоке, который пишет запись)"""
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON; поля из extra добавляются как есть"""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                data[key] = value
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который не ждет места в очереди: лишние записи отбрасываются"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc()
+
+
+_handler = None
+_output = None
+_listener = None
+
+
+def _start_listener():
+    global _listener
+    _listener = logging.handlers.QueueListener(_handler.queue, _output, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # Поток вывода не переживает fork (процессы gunicorn, пул рендеринга):
+    # в дочернем процессе — своя очередь и свой поток
+    if _handler is not None:
+        _handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+        _start_listener()
+
+
+def _stop_listener():
+    # Дописывает записи, оставшиеся в очереди
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def configure_logging():
+    """Настраивает корневой логгер (повторный вызов ничего не меняет)"""
+    global _handler, _output
+    if _handler is not None:
+        return
+
+    _output = logging.StreamHandler(sys.stdout)
+    _output.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    _handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
+
+    _start_listener()
+    os.register_at_fork(after_in_child=_restart_after_fork)
+    atexit.register(_stop_listener)
+
+
+def queue_handler():
+    """
+    Обработчик-очередь журнала для logging.config (logconfig_dict в gunicorn.conf.py):
+    журнал доступа gunicorn пишет тот же фоновый поток, что и журнал приложения
+    """
+    configure_logging()
+    return _handler
@@ -1,6 +1,9 @@
 from docx import Document
 from datetime import datetime
 
+from placeholders import replace_in_runs_preserve_formatting
+
+
 def replace_in_runs(paragraph, replacements):
     """
     Заменяет плейсхолдеры в параграфе, сохраняя форматирование каждого run
@@ -179,80 +182,6 @@ def replace_in_runs_smart(paragraph, replacements):
                 paragraph.runs[0].text = new_text
 
 
-def replace_in_runs_preserve_formatting(paragraph, replacements):
-    """
-    Заменяет плейсхолдеры с максимальным сохранением форматирования
-    """
-    if not paragraph.runs:
-        return
-    
-    # Собираем информацию о каждом символе и его форматировании
-    char_data = []
-    
-    for run in paragraph.runs:
-        for char in run.text:
-            char_data.append({
-                'char': char,
-                'run': run,
-                'font_name': run.font.name,
-                'font_size': run.font.size,
-                'bold': run.font.bold,
-                'italic': run.font.italic,
-                'underline': run.font.underline,
-                'color': run.font.color.rgb if run.font.color.rgb else None
-            })
-    
-    if not char_data:
-        return
-    
-    # Получаем исходный текст
-    original_text = "".join(cd['char'] for cd in char_data)
-    
-    # Выполняем замены
-    new_text = original_text
-    for placeholder, replacement in replacements.items():
-        new_text = new_text.replace(placeholder, replacement)
-    
-    if new_text == original_text:
-        return  # Нет изменений
-    
-    # Удаляем все существующие runs
-    for run in paragraph.runs[:]:
-        paragraph._element.remove(run._element)
-    
-    # Создаем новые runs с сохранением форматирования
-    if new_text:
-        # Находим первое место замены для определения базового форматирования
-        base_formatting = None
-        for placeholder in replacements.keys():
-            if placeholder in original_text:
-                pos = original_text.find(placeholder)
-                if pos < len(char_data):
-                    base_formatting = char_data[pos]
-                    break
-        
-        if not base_formatting and char_data:
-            base_formatting = char_data[0]
-        
-        # Создаем новый run с новым текстом
-        new_run = paragraph.add_run(new_text)
-        
-        # Применяем форматирование
-        if base_formatting:
-            if base_formatting['font_name']:
-                new_run.font.name = base_formatting['font_name']
-            if base_formatting['font_size']:
-                new_run.font.size = base_formatting['font_size']
-            if base_formatting['bold'] is not None:
-                new_run.font.bold = base_formatting['bold']
-            if base_formatting['italic'] is not None:
-                new_run.font.italic = base_formatting['italic']
-            if base_formatting['underline'] is not None:
-                new_run.font.underline = base_formatting['underline']
-            if base_formatting['color']:
-                new_run.font.color.rgb = base_formatting['color']
-
-
 def replace_placeholders(doc_path, output_path, replacements):
     doc = Document(doc_path)
 
@@ -0,0 +1,407 @@
+"""
+Метрики генерации в формате Prometheus и заголовок Server-Timing
+
+Без внешних зависимостей: счетчики, значения и гистограммы хранятся в памяти процесса.
+Если задан METRICS_DIR, каждый процесс (gunicorn запускает несколько) пишет
+снимок своих метрик в этот каталог (раз в METRICS_FLUSH_INTERVAL секунд, если
+они изменились), а /metrics суммирует снимки всех процессов.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Период записи снимка метрик в METRICS_DIR, секунды
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1'))
+
+# Границы гистограмм времени стадий, секунды
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Границы гистограммы числа кредиторов в запросе
+CREDITOR_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Counter:
+    """Счетчик с метками"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {json.dumps(key): value for key, value in self._values.items()}
+
+    @staticmethod
+    def merge(total, state):
+        return (total or 0) + state
+
+    def render(self, states):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(states.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, json.loads(key))} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """
+    Текущее значение с метками (занятые слоты, длина очереди)
+    Значения процессов складываются; снимки завершившихся процессов не учитываются
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def snapshot(self):
+        with self._lock:
+            return {json.dumps(key): value for key, value in self._values.items()}
+
+    @staticmethod
+    def merge(total, state):
+        return (total or 0) + state
+
+    def render(self, states):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted(states.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, json.loads(key))} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Гистограмма с метками (накопительные бакеты, сумма и число наблюдений)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][index] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                json.dumps(key): {'buckets': list(state['buckets']), 'sum': state['sum'], 'count': state['count']}
+                for key, state in self._values.items()
+            }
+
+    @staticmethod
+    def merge(total, state):
+        if total is None:
+            return {'buckets': list(state['buckets']), 'sum': state['sum'], 'count': state['count']}
+        total['buckets'] = [a + b for a, b in zip(total['buckets'], state['buckets'])]
+        total['sum'] += state['sum']
+        total['count'] += state['count']
+        return total
+
+    def render(self, states):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, state in sorted(states.items()):
+            values = json.loads(key)
+            cumulative = 0
+            # В снимке бакеты хранятся по отдельности, в выводе — накопительно
+            for bound, count in zip(self.buckets, state['buckets']):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, [('le', _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values, [('le', '+Inf')])
+            lines.append(f"{self.name}_bucket{labels} {state['count']}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+def _read_snapshot(path):
+    """Снимок метрик из файла или None (файл удален или недописан)"""
+    try:
+        with open(path, encoding='utf-8') as snapshot_file:
+            return json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _process_alive(snapshot_name):
+    """Жив ли процесс, записавший снимок ({pid}-{...}.json)"""
+    try:
+        os.kill(int(snapshot_name.split('-', 1)[0]), 0)
+    except ValueError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class Registry:
+    """
+    Набор метрик процесса
+
+    directory — общий каталог снимков для нескольких процессов (None — только этот процесс).
+    Снимок пишется фоновым потоком не чаще раза в flush_interval секунд, если метрики
+    изменились (changed()): запись файла не попадает в путь запроса. Снимки
+    завершившихся процессов (gunicorn перезапускает их после WEB_MAX_REQUESTS)
+    при чтении /metrics сворачиваются в один файл DEAD_SNAPSHOT: счетчики и
+    гистограммы остаются в сумме (не убывают), значения gauge отбрасываются.
+    """
+
+    DEAD_SNAPSHOT = 'dead.json'
+
+    def __init__(self, directory=None, flush_interval=METRICS_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.metrics = []
+        self._path = None
+        self._dirty = threading.Event()
+        self._flusher = None
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            # Изменения последнего интервала при штатном завершении процесса
+            atexit.register(self._flush_if_dirty)
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def _snapshot_path(self):
+        # Имя файла уникально для процесса: после fork (gunicorn) создается заново
+        if self._path is None or self._path[0] != os.getpid():
+            self._path = (os.getpid(), os.path.join(self.directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"))
+        return self._path[1]
+
+    def changed(self):
+        """Метрики изменились: снимок запишет фоновый поток (не чаще flush_interval)"""
+        if not self.directory:
+            return
+        self._dirty.set()
+        flusher = self._flusher
+        if flusher is None or flusher[0] != os.getpid():
+            # Поток не переживает fork: в каждом процессе — свой
+            with self._lock:
+                if self._flusher is None or self._flusher[0] != os.getpid():
+                    thread = threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True)
+                    self._flusher = (os.getpid(), thread)
+                    thread.start()
+
+    def _flush_periodically(self):
+        while True:
+            self._dirty.wait()
+            time.sleep(self.flush_interval)
+            self._flush_if_dirty()
+
+    def _flush_if_dirty(self):
+        if self._dirty.is_set():
+            self._dirty.clear()
+            self.flush()
+
+    def flush(self):
+        """Записывает снимок метрик процесса в общий каталог (атомарно)"""
+        if not self.directory:
+            return
+        path = self._snapshot_path()
+        data = {metric.name: metric.snapshot() for metric in self.metrics}
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary_path, 'w', encoding='utf-8') as output:
+                json.dump(data, output)
+            os.replace(temporary_path, path)
+        except OSError as e:
+            logger.warning("Не удалось записать снимок метрик: %s", e)
+
+    def _fold_dead_snapshots(self):
+        """
+        Сворачивает снимки завершившихся процессов в DEAD_SNAPSHOT и удаляет их
+        Под блокировкой каталога: /metrics может читать несколько процессов сразу
+        """
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            dead = [
+                entry.path for entry in os.scandir(self.directory)
+                if entry.name.endswith('.json') and entry.name != self.DEAD_SNAPSHOT
+                and not _process_alive(entry.name)
+            ]
+            if not dead:
+                return
+            dead_path = os.path.join(self.directory, self.DEAD_SNAPSHOT)
+            folded = _read_snapshot(dead_path) or {}
+            for path in dead:
+                snapshot = _read_snapshot(path) or {}
+                for metric in self.metrics:
+                    if metric.kind == 'gauge':
+                        continue
+                    states = folded.setdefault(metric.name, {})
+                    for key, state in snapshot.get(metric.name, {}).items():
+                        states[key] = metric.merge(states.get(key), state)
+            temporary_path = f"{dead_path}.{os.getpid()}.tmp"
+            with open(temporary_path, 'w', encoding='utf-8') as output:
+                json.dump(folded, output)
+            os.replace(temporary_path, dead_path)
+            for path in dead:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            logger.debug("Снимки метрик завершившихся процессов свернуты: %d", len(dead))
+
+    def _states(self):
+        """Состояния метрик: свои или сумма снимков всех процессов"""
+        if not self.directory:
+            return {metric.name: metric.snapshot() for metric in self.metrics}
+
+        self.flush()
+        try:
+            self._fold_dead_snapshots()
+        except OSError as e:
+            logger.warning("Не удалось свернуть снимки метрик завершившихся процессов: %s", e)
+        snapshots = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                snapshot = _read_snapshot(entry.path)
+                if snapshot is not None:
+                    snapshots.append((entry.name != self.DEAD_SNAPSHOT, snapshot))
+
+        states = {}
+        for metric in self.metrics:
+            merged = {}
+            for alive, snapshot in snapshots:
+                if metric.kind == 'gauge' and not alive:
+                    # Текущее значение есть только у работающего процесса
+                    continue
+                for key, state in snapshot.get(metric.name, {}).items():
+                    merged[key] = metric.merge(merged.get(key), state)
+            states[metric.name] = merged
+        return states
+
+    def render(self):
+        """Текст для /metrics (формат Prometheus 0.0.4)"""
+        states = self._states()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render(states[metric.name]))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry(os.environ.get('METRICS_DIR') or None)
+
+STAGE_SECONDS = registry.register(Histogram(
+    'bankruptcy_stage_seconds', 'Время стадии генерации документа',
+    ('route', 'template', 'stage')))
+DOCUMENTS = registry.register(Counter(
+    'bankruptcy_documents_total', 'Отданные документы (source: rendered — сгенерирован, cache — из кэша)',
+    ('route', 'template', 'source')))
+FAILURES = registry.register(Counter(
+    'bankruptcy_document_failures_total', 'Ошибки генерации документа',
+    ('route', 'template')))
+CREDITORS = registry.register(Histogram(
+    'bankruptcy_request_creditors', 'Число кредиторов в запросе на генерацию',
+    ('route',), buckets=CREDITOR_BUCKETS))
+
+
+@contextmanager
+def stage(timings, name):
+    """Добавляет время блока к timings[name] (timings=None — не измерять)"""
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+class StageTimer:
+    """
+    Время стадий одного запроса или задачи: {стадия: секунды}
+
+    Стадии документов складываются по всем документам архива;
+    server_timing() — значение заголовка Server-Timing.
+    """
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def stage(self, name):
+        return stage(self.stages, name)
+
+    def add_document(self, template, timings):
+        """Стадии одного документа: в гистограммы (с меткой шаблона) и в сумму запроса"""
+        for name, seconds in timings.items():
+            STAGE_SECONDS.observe(seconds, route=self.route, template=template, stage=name)
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def server_timing(self):
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def server_timing_header(stages):
+    """Server-Timing по сохраненным стадиям (например, задачи): {стадия: секунды}"""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages.items())
@@ -0,0 +1,87 @@
+"""
+Готовые HTML-страницы форм
+
+Страницы форм (главная, /initial, /with-case) одинаковы для всех пользователей,
+пока нет flash-сообщений. Каждая отрисовывается один раз на версию шаблона Jinja и
+хранится сразу в нескольких вариантах: без сжатия, gzip и brotli. Ответ выбирается
+по Accept-Encoding, у каждого варианта свой сильный ETag — повторная загрузка
+страницы получает 304 без тела.
+
+Пакет Brotli необязателен и в requirements.txt не входит (pip install Brotli):
+без него страницы отдаются в gzip и без сжатия.
+"""
+import gzip
+import hashlib
+import threading
+
+try:
+    import brotli
+except ImportError:  # Brotli необязателен: без него отдаются gzip и несжатый вариант
+    brotli = None
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+
+class RenderedPage:
+    """Отрисованная страница: {кодировка: (тело, ETag)} и шаблон, из которого она получена"""
+
+    def __init__(self, body, template=None):
+        self.template = template
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {None: (body, digest)}
+
+        # Сжатие один раз при отрисовке: mtime=0 — одинаковые байты в каждом процессе
+        compressed = {'gzip': gzip.compress(body, GZIP_LEVEL, mtime=0)}
+        if brotli is not None:
+            compressed['br'] = brotli.compress(body, quality=BROTLI_QUALITY)
+        for encoding, data in compressed.items():
+            if len(data) < len(body):
+                self.variants[encoding] = (data, f"{digest}-{encoding}")
+
+    def is_current(self):
+        """Шаблон не изменился на диске (Jinja проверяет время изменения файла)"""
+        return self.template is None or self.template.is_up_to_date
+
+    def select(self, accept_encodings):
+        """
+        Вариант для заголовка Accept-Encoding (werkzeug Accept): (кодировка или None, тело, ETag)
+        Из принятых клиентом кодировок выбирается с большим q, при равенстве — br
+        """
+        best, best_quality = None, 0
+        for encoding in ('br', 'gzip'):
+            quality = accept_encodings[encoding]
+            if encoding in self.variants and quality > best_quality:
+                best, best_quality = encoding, quality
+        return (best,) + self.variants[best]
+
+
+class PageCache:
+    """Отрисованные страницы по имени шаблона; устаревшая страница отрисовывается заново"""
+
+    def __init__(self):
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, render):
+        """
+        RenderedPage для шаблона name
+        render(name) -> (html, template) — отрисовка без flash-сообщений
+        """
+        page = self._pages.get(name)
+        if page is not None and page.is_current():
+            return page
+        with self._lock:
+            page = self._pages.get(name)
+            if page is None or not page.is_current():
+                html, template = render(name)
+                page = RenderedPage(html.encode('utf-8'), template)
+                self._pages[name] = page
+        return page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+
+page_cache = PageCache()
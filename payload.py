@@ -0,0 +1,223 @@
+"""
+Данные должника и кредиторов из JSON и CSV
+
+Через эту схему проходят все JSON-входы API: /initial, /with-case и записи
+пакета /api/batch/initial — одинаковые данные дают одинаковые документы.
+Значения приводятся к тому же виду, что собирают HTML-формы (строки), поэтому
+дальше используется тот же путь генерации. Проверка проходит по всем полям
+за один проход и собирает все ошибки, а не только первую.
+"""
+import csv
+import io
+import itertools
+from datetime import datetime
+
+# Типы полей; поля, которых здесь нет, — строки
+TEXT = 'text'
+AMOUNT = 'amount'    # число или строка с числом: "150000", "150 000,50"
+DATE = 'date'        # "YYYY-MM-DD" (как в форме) или "DD.MM.YYYY"
+FLAG = 'flag'        # true/false, "yes"/"no", "да"/"нет"
+INN = 'inn'          # строка из 12 цифр
+
+FIELD_TYPES = {
+    'birth_date': DATE,
+    'passport_issue_date': DATE,
+    'debt_amount_digits': AMOUNT,
+    'state_duty': AMOUNT,
+    'total_debt': AMOUNT,
+    'has_marriage': FLAG,
+    'has_children': FLAG,
+    'inn': INN,
+    'Сумма обязательства': AMOUNT,
+    'Задолженность': AMOUNT,
+    'Штрафы': AMOUNT,
+}
+
+# Ошибок в ответе не больше этого числа (остальные только подсчитываются)
+MAX_REPORTED_ERRORS = 100
+
+_FLAG_VALUES = {
+    'yes': 'yes', 'true': 'yes', '1': 'yes', 'да': 'yes',
+    'no': 'no', 'false': 'no', '0': 'no', 'нет': 'no',
+}
+
+
+class PayloadError(ValueError):
+    """Данные не прошли проверку; errors — [{"field": ..., "error": ...}, ...]"""
+
+    def __init__(self, errors, total=None):
+        super().__init__(f"Ошибок в данных: {total or len(errors)}")
+        self.errors = errors
+        self.total = total or len(errors)
+
+    def to_dict(self):
+        return {'error': 'Ошибка в данных', 'errors': self.errors, 'total': self.total}
+
+
+class Errors:
+    """Накопитель ошибок проверки"""
+
+    def __init__(self):
+        self.items = []
+        self.total = 0
+
+    def add(self, field, error):
+        self.total += 1
+        if len(self.items) < MAX_REPORTED_ERRORS:
+            self.items.append({'field': field, 'error': error})
+
+    def raise_if_any(self):
+        if self.total:
+            raise PayloadError(self.items, self.total)
+
+
+def _normalize(value, kind):
+    """
+    Приводит значение к строке формы
+    Возвращает (значение, текст ошибки или None)
+    """
+    if value is None:
+        return '', None
+    if isinstance(value, bool):
+        if kind == FLAG:
+            return ('yes' if value else 'no'), None
+        return '', 'ожидается строка'
+    if isinstance(value, (int, float)):
+        if kind == INN:
+            # Ведущий ноль в числе теряется
+            return '', 'ИНН передается строкой'
+        value = str(value)
+    if not isinstance(value, str):
+        return '', 'ожидается строка'
+
+    value = value.strip()
+    if not value:
+        return '', None
+
+    if kind == AMOUNT:
+        try:
+            float(value.replace(' ', '').replace('\xa0', '').replace(',', '.'))
+        except ValueError:
+            return value, 'ожидается сумма'
+    elif kind == DATE:
+        for date_format in ('%Y-%m-%d', '%d.%m.%Y'):
+            try:
+                return datetime.strptime(value, date_format).strftime('%Y-%m-%d'), None
+            except ValueError:
+                pass
+        return value, 'ожидается дата в формате ГГГГ-ММ-ДД или ДД.ММ.ГГГГ'
+    elif kind == FLAG:
+        flag = _FLAG_VALUES.get(value.lower())
+        if flag is None:
+            return value, 'ожидается да/нет'
+        return flag, None
+    elif kind == INN:
+        if len(value) != 12 or not value.isdigit():
+            return value, 'ИНН должен содержать ровно 12 цифр'
+    return value, None
+
+
+def read_debtor(data, fields, required, errors):
+    """
+    Поля должника из JSON-объекта (или полей multipart-формы)
+    fields — все поля, required — обязательные; ошибки добавляются в errors
+    """
+    debtor = {}
+    for field in fields:
+        value, error = _normalize(data.get(field), FIELD_TYPES.get(field, TEXT))
+        if error:
+            errors.add(field, error)
+        elif field in required and not value:
+            errors.add(field, 'обязательное поле')
+        debtor[field] = value
+    return debtor
+
+
+def read_creditor(item, creditor_fields, location, errors):
+    """
+    Кредитор в виде, который собирает форма /initial
+    creditor_fields — пары (поле формы, ключ): значение берется по ключу или по имени поля формы
+    """
+    creditor = {}
+    for prefix, key in creditor_fields:
+        raw = item.get(key)
+        if raw is None:
+            raw = item.get(prefix)
+        value, error = _normalize(raw, FIELD_TYPES.get(key, TEXT))
+        if error:
+            errors.add(f"{location}.{prefix}", error)
+        elif not value:
+            errors.add(f"{location}.{prefix}", 'обязательное поле')
+        creditor[key] = value
+    # Как в форме: «Кредитор» и «Место нахождения» по умолчанию из name/address
+    creditor['Кредитор'] = _normalize(item.get('Кредитор'), TEXT)[0] or creditor['name']
+    creditor['Место нахождения'] = _normalize(item.get('Место нахождения'), TEXT)[0] or creditor['address']
+    return creditor
+
+
+def json_creditors(value, errors, location='creditors'):
+    """Кредиторы из JSON-массива: пары (место в данных, объект)"""
+    if not isinstance(value, list):
+        errors.add(location, 'ожидается массив кредиторов')
+        return
+    for number, item in enumerate(value):
+        yield f"{location}[{number}]", item
+
+
+def read_creditors(items, creditor_fields, max_creditors, errors, location='creditors'):
+    """
+    Кредиторы из пар (место в данных, объект) — JSON-массива или строк CSV
+    Последовательность читается один раз: CSV не загружается в память целиком
+    """
+    creditors = []
+    reported = errors.total
+    for item_location, item in items:
+        if len(creditors) >= max_creditors:
+            errors.add(location, f'не более {max_creditors} кредиторов')
+            break
+        if not isinstance(item, dict):
+            errors.add(item_location, 'ожидается объект')
+            continue
+        creditors.append(read_creditor(item, creditor_fields, item_location, errors))
+
+    # Если источник уже сообщил об ошибке (нет колонок, не массив), второе сообщение не нужно
+    if not creditors and errors.total == reported:
+        errors.add(location, 'необходимо указать хотя бы одного кредитора')
+    return creditors
+
+
+def iter_csv_rows(stream, creditor_fields, errors, location='creditors_csv'):
+    """
+    Строки CSV с кредиторами по одной: пары ("файл:строка", {колонка: значение})
+
+    stream — двоичный поток загруженного файла (UTF-8, можно с BOM).
+    Разделитель — ",", ";" или табуляция (по заголовку). Колонки называются
+    как поля формы (creditor_name, obligation_amount, ...) или как ключи
+    кредитора (name, «Сумма обязательства», ...).
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        header_line = text.readline()
+        delimiter = max((',', ';', '\t'), key=header_line.count)
+        reader = csv.reader(itertools.chain([header_line], text), delimiter=delimiter)
+        header = [column.strip() for column in next(reader, [])]
+
+        missing = [
+            prefix for prefix, key in creditor_fields
+            if prefix not in header and key not in header
+        ]
+        if missing:
+            errors.add(location, f"нет колонок: {', '.join(missing)}")
+            return
+
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            yield f"{location}:{reader.line_num}", dict(zip(header, row))
+    except UnicodeDecodeError:
+        errors.add(location, 'файл должен быть в кодировке UTF-8')
+    except csv.Error as e:
+        errors.add(location, f'ошибка разбора CSV: {e}')
+    finally:
+        # Поток принадлежит загруженному файлу: обертку отсоединяем, не закрывая его
+        text.detach()
@@ -0,0 +1,320 @@
+import re
+from bisect import bisect_right
+from functools import lru_cache
+
+from docx.text.paragraph import Paragraph
+
+
+@lru_cache(maxsize=64)
+def _compile_pattern(keys):
+    """
+    Компилирует общее регулярное выражение для набора плейсхолдеров.
+    Ключи отсортированы по убыванию длины, поэтому в каждой позиции
+    побеждает самое длинное совпадение ("{Фамилия} " раньше "{Фамилия}")
+    """
+    ordered = sorted(keys, key=len, reverse=True)
+    return re.compile("|".join(re.escape(key) for key in ordered))
+
+
+class Replacer:
+    """
+    Однопроходная замена набора плейсхолдеров
+
+    Компилируется один раз на набор замен и переписывает текст за один проход,
+    поэтому результат не зависит от порядка ключей в словаре.
+    """
+
+    def __init__(self, replacements):
+        self.replacements = {key: value for key, value in replacements.items() if key}
+        keys = tuple(sorted(self.replacements))
+        self.pattern = _compile_pattern(keys) if keys else None
+        # Если все ключи содержат "{", текст без "{" можно пропускать сразу
+        self.requires_brace = all("{" in key for key in keys)
+
+    def might_match(self, text):
+        """Быстрая проверка: может ли в тексте быть хотя бы один плейсхолдер"""
+        if self.pattern is None or not text:
+            return False
+        if self.requires_brace:
+            return "{" in text
+        return True
+
+    def sub(self, text):
+        """Возвращает текст с выполненными заменами"""
+        if not self.might_match(text):
+            return text
+        replacements = self.replacements
+        return self.pattern.sub(lambda match: replacements[match.group()], text)
+
+
+def compile_replacements(replacements):
+    """Возвращает Replacer для словаря замен (готовый Replacer возвращается как есть)"""
+    if isinstance(replacements, Replacer):
+        return replacements
+    return Replacer(replacements)
+
+
+def replace_in_runs_preserve_formatting(paragraph, replacements):
+    """
+    Заменяет плейсхолдеры, переписывая только те runs, которые они затрагивают
+
+    Совпадения ищутся в общем тексте параграфа и переводятся в пары (run, смещение).
+    Значение плейсхолдера попадает в run, где плейсхолдер начинается, и получает
+    его форматирование; остальные runs и их форматирование не меняются.
+    """
+    runs = paragraph._p.r_lst
+    if not runs:
+        return
+
+    replacer = compile_replacements(replacements)
+
+    texts = [run.text for run in runs]
+    full_text = "".join(texts)
+    if not replacer.might_match(full_text):
+        return
+
+    matches = list(replacer.pattern.finditer(full_text))
+    if not matches:
+        return
+
+    # Смещение начала каждого run в общем тексте
+    starts = []
+    position = 0
+    for text in texts:
+        starts.append(position)
+        position += len(text)
+
+    # Идем с конца, чтобы смещения левее текущей замены оставались верными
+    touched = set()
+    for match in reversed(matches):
+        start, end = match.span()
+        first = bisect_right(starts, start) - 1
+        last = bisect_right(starts, end - 1) - 1
+        value = replacer.replacements[match.group()]
+
+        head = texts[first][:start - starts[first]]
+        if first == last:
+            texts[first] = head + value + texts[first][end - starts[first]:]
+        else:
+            texts[first] = head + value
+            for middle in range(first + 1, last):
+                texts[middle] = ""
+            texts[last] = texts[last][end - starts[last]:]
+        touched.update(range(first, last + 1))
+
+    for index in touched:
+        # Сеттер python-docx превращает "\n" и "\t" в w:br и w:tab
+        runs[index].text = texts[index]
+
+
+# Плейсхолдер в фигурных скобках: "{Фамилия}", "{номер дома}" и т.п.
+PLACEHOLDER_RE = re.compile(r"\{[^{}]*\}")
+
+
+class ParagraphSlot:
+    """Параграф шаблона: часть пакета, путь к элементу и его текст"""
+
+    __slots__ = ('partname', 'path', 'text', 'placeholders', 'split')
+
+    def __init__(self, partname, path, text, placeholders, split):
+        self.partname = partname
+        self.path = path
+        self.text = text
+        self.placeholders = placeholders
+        self.split = split
+
+
+def element_path(root, element):
+    """Путь от корня части до элемента в виде индексов дочерних элементов"""
+    path = []
+    while element is not root:
+        parent = element.getparent()
+        path.append(parent.index(element))
+        element = parent
+    return tuple(reversed(path))
+
+
+def _iter_template_paragraphs(document):
+    """
+    Обходит те же параграфы, что и replace_placeholders_advanced:
+    тело документа, ячейки таблиц, колонтитулы
+    """
+    for paragraph in document.paragraphs:
+        yield document.part, paragraph
+
+    for table in document.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                for paragraph in cell.paragraphs:
+                    yield document.part, paragraph
+
+    for section in document.sections:
+        # Связанные с предыдущим разделом колонтитулы не трогаем,
+        # иначе python-docx создаст для них новую часть в эталонном документе
+        for header_footer in (section.header, section.footer):
+            if not header_footer.is_linked_to_previous:
+                for paragraph in header_footer.paragraphs:
+                    yield header_footer.part, paragraph
+
+
+class PlaceholderIndex:
+    """
+    Индекс параграфов шаблона, в которых есть текст для замены
+
+    Строится один раз при загрузке шаблона. Для каждого параграфа хранится путь
+    к элементу внутри части пакета, поэтому в копии документа нужные параграфы
+    находятся напрямую, без обхода всего документа.
+    """
+
+    def __init__(self, document):
+        slots = []
+        seen = set()
+        for part, paragraph in _iter_template_paragraphs(document):
+            p = paragraph._p
+            # Объединенные ячейки python-docx возвращает несколько раз.
+            # Храним сами элементы, а не id(): прокси lxml живут, пока на них есть ссылка
+            if p in seen:
+                continue
+            seen.add(p)
+
+            run_texts = [run.text for run in paragraph.runs]
+            text = "".join(run_texts)
+            if not text:
+                continue
+
+            placeholders = tuple(match.group() for match in PLACEHOLDER_RE.finditer(text))
+            split = _split_placeholders(run_texts, text)
+            slots.append(ParagraphSlot(
+                str(part.partname),
+                element_path(part.element, p),
+                text,
+                placeholders,
+                split,
+            ))
+        self._set_slots(slots)
+
+    @classmethod
+    def from_state(cls, state):
+        """Индекс из state() — без обхода документа (снимок шаблонов, template_snapshot.py)"""
+        index = cls.__new__(cls)
+        index._set_slots([ParagraphSlot(*slot) for slot in state])
+        return index
+
+    def state(self):
+        """Параграфы индекса простыми кортежами — для сериализации"""
+        return tuple(
+            (slot.partname, slot.path, slot.text, slot.placeholders, slot.split)
+            for slot in self.slots
+        )
+
+    def _set_slots(self, slots):
+        self.slots = slots
+        self._matches = {}
+        self._dependencies = {}
+
+        # Манифест шаблона: все плейсхолдеры в фигурных скобках и разорванные между runs
+        self.placeholders = tuple(sorted({p for slot in self.slots for p in slot.placeholders}))
+        self.split = tuple(sorted({p for slot in self.slots for p in slot.split}))
+
+        # Весь текст шаблона для отбора ключей; "\0" не встречается в ключах замен
+        self._text = "\0".join(slot.text for slot in self.slots)
+        self._pruned = {}
+
+    def prune(self, replacements):
+        """
+        Оставляет в словаре замен только ключи, которые есть в тексте шаблона
+
+        Ключ, которого нет в тексте, не может совпасть ни в одном параграфе,
+        поэтому результат замены не меняется, а регулярное выражение и словарь,
+        передаваемый в пул процессов, становятся меньше.
+        """
+        key_set = frozenset(replacements)
+        keys = self._pruned.get(key_set)
+        if keys is None:
+            keys = tuple(key for key in key_set if key and key in self._text)
+            if len(self._pruned) >= 32:
+                self._pruned.clear()
+            self._pruned[key_set] = keys
+        return {key: replacements[key] for key in keys}
+
+    def slots_for(self, replacer):
+        """Возвращает параграфы, в которых есть совпадения с ключами replacer"""
+        pattern = replacer.pattern
+        if pattern is None:
+            return ()
+        slots = self._matches.get(pattern)
+        if slots is None:
+            slots = tuple(
+                slot for slot in self.slots
+                if replacer.might_match(slot.text) and pattern.search(slot.text)
+            )
+            # Наборов ключей немного (зависят от числа кредиторов), но ограничиваем память
+            if len(self._matches) >= 32:
+                self._matches.clear()
+            self._matches[pattern] = slots
+        return slots
+
+    def dependencies(self, replacer):
+        """
+        Ключи replacer, которые действительно встречаются в шаблоне (отсортированы)
+
+        Результат заполнения шаблона зависит только от значений этих ключей:
+        по ним строится ключ кэша документа, и правка поля, которого в шаблоне нет,
+        не требует его повторной генерации.
+        """
+        pattern = replacer.pattern
+        if pattern is None:
+            return ()
+        keys = self._dependencies.get(pattern)
+        if keys is None:
+            keys = tuple(sorted({
+                match.group()
+                for slot in self.slots_for(replacer)
+                for match in pattern.finditer(slot.text)
+            }))
+            if len(self._dependencies) >= 32:
+                self._dependencies.clear()
+            self._dependencies[pattern] = keys
+        return keys
+
+    def paragraphs(self, part_roots, replacer):
+        """
+        Возвращает параграфы копии документа, которые нужно обработать
+        part_roots — словарь {имя части: корневой элемент XML копии}
+        """
+        slots = self.slots_for(replacer)
+        if not slots:
+            return []
+
+        # Сначала находим все элементы, потом меняем: замены не сдвигают пути
+        paragraphs = []
+        for slot in slots:
+            element = part_roots[slot.partname]
+            for child_index in slot.path:
+                element = element[child_index]
+            paragraphs.append(Paragraph(element, None))
+        return paragraphs
+
+
+def part_roots(document):
+    """Корневые элементы XML-частей документа python-docx: {имя части: элемент}"""
+    return {
+        str(part.partname): part.element
+        for part in document.part.package.iter_parts()
+        if hasattr(part, 'element')
+    }
+
+
+def _split_placeholders(run_texts, text):
+    """Плейсхолдеры, разорванные между несколькими runs"""
+    boundaries = set()
+    position = 0
+    for run_text in run_texts[:-1]:
+        position += len(run_text)
+        boundaries.add(position)
+
+    split = []
+    for match in PLACEHOLDER_RE.finditer(text):
+        if any(match.start() < boundary < match.end() for boundary in boundaries):
+            split.append(match.group())
+    return tuple(split)
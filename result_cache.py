@@ -0,0 +1,287 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Заголовок с общим токеном узлов для сервера кэша (cache_server.py)
+TOKEN_HEADER = 'X-Cache-Token'
+
+
+def document_cache_key(template_digest, render_backend, replacements, creditors):
+    """
+    Ключ сгенерированного документа: хэш содержимого шаблона, способа сборки
+    и нормализованных входных данных
+
+    replacements — замены, которые встречаются в шаблоне (PlaceholderIndex.dependencies).
+    Значения плейсхолдеров дат ({dd}, {дата}, ...) входят в них, если шаблон их
+    использует, поэтому документ с другой датой получает другой ключ.
+    """
+    payload = json.dumps(
+        [render_backend, sorted(replacements.items()), creditors],
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(',', ':'),
+    )
+    digest = hashlib.sha256(template_digest.encode('ascii'))
+    digest.update(payload.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CacheBackend:
+    """
+    Интерфейс уровня кэша результатов: ключ — hex-строка, значение — bytes
+
+    Ошибки хранилища не должны ломать генерацию: get возвращает None,
+    set молча пропускает запись.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """LRU в памяти процесса, ограничен суммарным размером значений"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._items[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+
+class DiskCache(CacheBackend):
+    """
+    Кэш в каталоге на диске, ограничен суммарным размером файлов
+
+    При превышении лимита удаляются файлы, которые дольше всего не читались
+    (время изменения обновляется при каждом попадании). Каталог может быть общим
+    для нескольких процессов: запись атомарная, вытеснение терпит чужие удаления.
+
+    Размер считается по каталогу (записи всех процессов), а не счетчиком процесса.
+    Обход каталога с тысячами файлов занимает десятки миллисекунд, поэтому он идет
+    в фоновом потоке не чаще раза в scan_interval секунд, а между обходами к
+    последнему результату прибавляются свои записи. Превышение лимита ограничено
+    тем, что все процессы успеют записать между обходами; вытеснение освобождает
+    место с запасом (до 90% лимита).
+    """
+
+    def __init__(self, directory, max_bytes, scan_interval=5.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.scan_interval = scan_interval
+        self._lock = threading.Lock()
+        self._scan_thread = None
+        os.makedirs(directory, exist_ok=True)
+        self._usage = sum(size for _, size, _ in self._entries())
+        self._scanned_at = time.monotonic()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _entries(self):
+        """Файлы кэша (без недописанных .tmp): [(время изменения, размер, путь), ...]"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.tmp') or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # Удален другим процессом
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as cached_file:
+                value = cached_file.read()
+            os.utime(path)
+            return value
+        except OSError:
+            return None
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        path = self._path(key)
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            # Перезапись ключа заменяет файл: его прежний размер вычитается
+            previous = os.stat(path).st_size
+        except OSError:
+            previous = 0
+        try:
+            with open(temporary_path, 'wb') as output:
+                output.write(value)
+            os.replace(temporary_path, path)
+        except OSError as e:
+            logger.warning("Не удалось записать результат в кэш на диске: %s", e)
+            return
+        with self._lock:
+            self._usage += len(value) - previous
+            if self._usage <= self.max_bytes and time.monotonic() - self._scanned_at < self.scan_interval:
+                return
+            if self._scan_thread is not None and self._scan_thread.is_alive():
+                return
+            self._scanned_at = time.monotonic()
+            self._scan_thread = threading.Thread(target=self._scan, name='disk-cache-scan', daemon=True)
+            self._scan_thread.start()
+
+    def _scan(self):
+        """Размер каталога и вытеснение, если он больше лимита (фоновый поток)"""
+        try:
+            entries = self._entries()
+            usage = sum(size for _, size, _ in entries)
+            if usage > self.max_bytes:
+                usage = self._evict(entries, usage)
+        except OSError as e:
+            logger.warning("Не удалось проверить размер кэша на диске: %s", e)
+            return
+        with self._lock:
+            self._usage = usage
+
+    def _evict(self, entries, usage):
+        """
+        Удаляет самые давно использованные файлы, пока размер не станет ниже 90% лимита
+        Возвращает оставшийся размер
+        """
+        entries.sort()
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if usage <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            usage -= size
+        return usage
+
+
+class RemoteCache(CacheBackend):
+    """
+    Общий кэш нескольких узлов по HTTP: GET/PUT {url}/{ключ}
+    (см. cache_server.py — локальная замена общего хранилища)
+    token — общий токен узлов и сервера, передается в заголовке TOKEN_HEADER
+    """
+
+    def __init__(self, url, token, timeout=2.0):
+        self.url = url.rstrip('/')
+        self.headers = {TOKEN_HEADER: token}
+        self.timeout = timeout
+
+    def get(self, key):
+        request = urllib.request.Request(f"{self.url}/{key}", headers=self.headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.read()
+        except (urllib.error.URLError, OSError):
+            return None
+
+    def set(self, key, value):
+        request = urllib.request.Request(f"{self.url}/{key}", data=value, headers=self.headers, method='PUT')
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except (urllib.error.URLError, OSError) as e:
+            logger.warning("Не удалось записать результат в общий кэш: %s", e)
+
+
+class TieredCache(CacheBackend):
+    """
+    Многоуровневый кэш: уровни опрашиваются по порядку (память, диск, сеть),
+    найденное значение копируется в более быстрые уровни
+    """
+
+    def __init__(self, tiers):
+        self.tiers = list(tiers)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        for level, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster in self.tiers[:level]:
+                    faster.set(key, value)
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        for tier in self.tiers:
+            tier.set(key, value)
+
+    def invalidate(self):
+        """
+        Сбрасывает уровни в памяти процесса (после обновления шаблона)
+        Общие уровни (диск, сеть) не трогаются: записи старой версии шаблона по
+        ключам с ее хэшем больше не запрашиваются и вытесняются по LRU
+        """
+        for tier in self.tiers:
+            if isinstance(tier, MemoryCache):
+                tier.clear()
+
+
+def build_result_cache(environ=os.environ):
+    """
+    Собирает кэш результатов из переменных окружения (None — кэш выключен):
+      RESULT_CACHE=0                   — выключить
+      RESULT_CACHE_MEMORY_MB (64)      — лимит LRU в памяти процесса
+      RESULT_CACHE_DIR                 — каталог кэша на диске (без него уровня нет)
+      RESULT_CACHE_DISK_MB (512)       — лимит кэша на диске
+      RESULT_CACHE_URL                 — общий кэш узлов (cache_server.py)
+      RESULT_CACHE_TOKEN               — токен общего кэша (без него уровня нет)
+    """
+    if environ.get('RESULT_CACHE', '1') in ('0', 'false', 'no'):
+        return None
+
+    tiers = [MemoryCache(int(environ.get('RESULT_CACHE_MEMORY_MB', '64')) * 1024 * 1024)]
+    if environ.get('RESULT_CACHE_DIR'):
+        tiers.append(DiskCache(
+            environ['RESULT_CACHE_DIR'],
+            int(environ.get('RESULT_CACHE_DISK_MB', '512')) * 1024 * 1024,
+        ))
+    if environ.get('RESULT_CACHE_URL'):
+        if environ.get('RESULT_CACHE_TOKEN'):
+            tiers.append(RemoteCache(environ['RESULT_CACHE_URL'], environ['RESULT_CACHE_TOKEN']))
+        else:
+            logger.warning("RESULT_CACHE_URL задан без RESULT_CACHE_TOKEN: общий кэш не используется")
+    return TieredCache(tiers)
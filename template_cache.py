@@ -0,0 +1,216 @@
+import copy
+import hashlib
+import io
+import os
+import threading
+
+from docx import Document
+from docx.opc.part import Part, XmlPart
+from docx.package import Package
+
+from creditor_block import CreditorBlock
+from docx_package import PackageTemplate
+from placeholders import PlaceholderIndex
+
+
+def clone_document(document):
+    """
+    Создает независимую копию документа python-docx
+
+    copy.deepcopy(document) здесь не подходит: он копирует и закэшированные
+    python-docx обертки (например, Document._body), которые после копирования
+    указывают на отдельные от пакета деревья XML. Поэтому пакет собирается
+    заново: XML-части копируются, бинарные (картинки, customXml) разделяются.
+    """
+    source_package = document.part.package
+    package = Package()
+
+    clones = {}
+    for part in source_package.iter_parts():
+        if isinstance(part, XmlPart):
+            clone = type(part)(part.partname, part.content_type, copy.deepcopy(part.element), package)
+        else:
+            # Бинарные части неизменяемы — байты общие для всех копий
+            clone = Part(part.partname, part.content_type, part.blob, package)
+        clones[part] = clone
+
+    for source, target in [(source_package, package)] + list(clones.items()):
+        for rel in source.rels.values():
+            rel_target = rel.target_ref if rel.is_external else clones[rel.target_part]
+            target.rels.add_relationship(rel.reltype, rel_target, rel.rId, rel.is_external)
+
+    package.after_unmarshal()
+    return package.main_document_part.document
+
+
+def file_signature(path):
+    """Признаки изменения файла без чтения: (время изменения, inode, размер)"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_ino, stat.st_size
+
+
+class CompiledTemplate:
+    """
+    Разобранный шаблон: исходные байты, эталонный документ и индекс плейсхолдеров
+
+    Эталонный документ НИКОГДА не изменяется — для заполнения используйте open()
+    или copy_roots() (генерация на уровне пакета). Новая версия файла — новый
+    CompiledTemplate (TemplateCache.reload), старый остается у тех, кто его взял
+    """
+
+    def __init__(self, path, blob, compiled=None):
+        """
+        compiled — запись снимка шаблона (compiled(), см. template_snapshot.py):
+        индекс и блок кредиторов берутся из нее, если хэш содержимого совпадает
+        """
+        self.path = path
+        self.blob = blob
+        # Хэш содержимого: входит в ключи кэша сгенерированных документов
+        self.digest = hashlib.sha256(blob).hexdigest()
+        self.from_snapshot = compiled is not None and compiled.get('digest') == self.digest
+        # file_signature файла, из которого прочитан шаблон (заполняет TemplateCache)
+        self.signature = None
+        self._document = None
+        if self.from_snapshot:
+            # python-docx разбирает шаблон только при первом обращении к document
+            self.index = PlaceholderIndex.from_state(compiled['index'])
+            self.package = PackageTemplate(blob)
+            self.creditor_block = CreditorBlock.from_state(compiled['creditor_block'])
+        else:
+            self._document = Document(io.BytesIO(blob))
+            self.index = PlaceholderIndex(self._document)
+            self.package = PackageTemplate(blob, self._document)
+            # Ячейка шапки для дополнительных кредиторов (None — в шаблоне ее нет)
+            self.creditor_block = CreditorBlock.find(self._document)
+
+    @property
+    def document(self):
+        """Эталонный документ python-docx"""
+        if self._document is None:
+            self._document = Document(io.BytesIO(self.blob))
+        return self._document
+
+    def compiled(self):
+        """Результат компиляции шаблона для снимка: хэш, индекс, блок кредиторов"""
+        return {
+            'digest': self.digest,
+            'index': self.index.state(),
+            'creditor_block': self.creditor_block.state() if self.creditor_block is not None else None,
+        }
+
+    def open(self):
+        """Возвращает собственную копию документа для заполнения"""
+        return clone_document(self.document)
+
+
+class TemplateCache:
+    """
+    Кэш разобранных шаблонов .docx
+
+    Каждый шаблон читается с диска, разбирается и индексируется один раз.
+    Каждый запрос получает собственную глубокую копию документа.
+    Измененный на диске шаблон подменяется новой версией через reload().
+    """
+
+    def __init__(self):
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def get(self, template_path, compiled=None):
+        """
+        Возвращает CompiledTemplate или None, если шаблона нет
+        compiled — запись снимка для шаблона, который еще не загружен
+        """
+        template = self._templates.get(template_path)
+        if template is not None:
+            return template
+
+        with self._lock:
+            template = self._templates.get(template_path)
+            if template is None:
+                # Отсутствие шаблона не кэшируем: файл может появиться позже
+                try:
+                    # Признаки снимаются до чтения: изменение во время чтения заметит reload()
+                    signature = file_signature(template_path)
+                    with open(template_path, 'rb') as template_file:
+                        blob = template_file.read()
+                except FileNotFoundError:
+                    return None
+                template = CompiledTemplate(template_path, blob, compiled)
+                template.signature = signature
+                self._templates[template_path] = template
+        return template
+
+    def reload(self, template_path):
+        """
+        Перечитывает загруженный шаблон, если файл изменился (время изменения, inode,
+        размер), и подменяет его новой версией, если изменилось содержимое (sha256).
+        Разбор идет вне блокировки: запросы продолжают получать старую версию.
+
+        Возвращает новый CompiledTemplate или None (не изменился, не загружен или файла
+        нет — тогда остается прежняя версия). Ошибка разбора пробрасывается, прежняя
+        версия остается до следующего изменения файла
+        """
+        current = self._templates.get(template_path)
+        if current is None:
+            return None
+        try:
+            signature = file_signature(template_path)
+            if signature == current.signature:
+                return None
+            with open(template_path, 'rb') as template_file:
+                blob = template_file.read()
+        except FileNotFoundError:
+            return None
+
+        if hashlib.sha256(blob).hexdigest() == current.digest:
+            # Файл переписан тем же содержимым (touch, копирование)
+            current.signature = signature
+            return None
+        try:
+            template = CompiledTemplate(template_path, blob)
+        except Exception:
+            current.signature = signature
+            raise
+        template.signature = signature
+
+        with self._lock:
+            if self._templates.get(template_path) is not current:
+                # Шаблон уже подменили параллельно
+                return None
+            self._templates[template_path] = template
+        return template
+
+    def paths(self):
+        """Пути загруженных шаблонов"""
+        return list(self._templates)
+
+    def exists(self, template_path):
+        """Проверяет наличие шаблона (для загруженных шаблонов — без обращения к диску)"""
+        return self.get(template_path) is not None
+
+    def open(self, template_path):
+        """
+        Возвращает собственную копию документа для заполнения
+        """
+        template = self.get(template_path)
+        if template is None:
+            raise FileNotFoundError(f"Шаблон '{template_path}' не найден")
+        return template.open()
+
+    def preload(self, template_paths, snapshot=None):
+        """
+        Загружает шаблоны заранее (например, при старте приложения)
+        snapshot — {путь: запись снимка} (template_snapshot.py)
+        """
+        snapshot = snapshot or {}
+        for template_path in template_paths:
+            self.get(template_path, snapshot.get(template_path))
+
+    def clear(self):
+        """Сбрасывает кэш"""
+        with self._lock:
+            self._templates.clear()
+
+
+template_cache = TemplateCache()
@@ -0,0 +1,126 @@
+"""
+Снимок скомпилированных шаблонов для быстрого старта
+
+При старте каждый шаблон .docx разбирается и индексируется — сотни миллисекунд,
+прежде чем процесс готов к запросам. Снимок хранит результат этой работы в одном файле:
+    - индекс плейсхолдеров каждого шаблона (пути, текст параграфов, манифест);
+    - блок дополнительных кредиторов шапки (путь к ячейке и XML образца).
+
+При старте файл читается одним вызовом. Запись шаблона используется, только если
+хэш содержимого (sha256) совпадает с файлом шаблона на диске, иначе шаблон
+разбирается как обычно. Выражение судов в снимок не входит (его внутреннее
+представление в модуле re меняется между версиями Python): warm_start компилирует
+его через re.compile, в gunicorn — один раз до fork процессов.
+
+Сборка (Dockerfile делает это при сборке образа):
+    python template_snapshot.py                    # в TEMPLATE_SNAPSHOT
+    python template_snapshot.py -o other.snapshot
+
+Снимок — pickle: загружается только собственный артефакт сборки.
+"""
+import argparse
+import logging
+import os
+import pickle
+import sys
+import time
+
+import courts
+from template_cache import CompiledTemplate, template_cache
+
+logger = logging.getLogger(__name__)
+
+# Путь к снимку; если файла нет, шаблоны разбираются при старте
+TEMPLATE_SNAPSHOT = os.environ.get('TEMPLATE_SNAPSHOT', 'templates.snapshot')
+
+# Версия формата (и содержимого заготовок): снимок другой версии не используется
+FORMAT_VERSION = 3
+
+
+def build_snapshot(template_paths, path=TEMPLATE_SNAPSHOT):
+    """Компилирует шаблоны и записывает снимок (атомарно)"""
+    templates = {}
+    for template_path in template_paths:
+        with open(template_path, 'rb') as template_file:
+            templates[template_path] = CompiledTemplate(template_path, template_file.read()).compiled()
+
+    data = pickle.dumps({
+        'format': FORMAT_VERSION,
+        'templates': templates,
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'wb') as output:
+        output.write(data)
+    os.replace(temporary_path, path)
+    return len(data)
+
+
+def load_snapshot(path=TEMPLATE_SNAPSHOT):
+    """Снимок одним чтением файла; None, если его нет или он не подходит"""
+    try:
+        with open(path, 'rb') as snapshot_file:
+            data = snapshot_file.read()
+    except FileNotFoundError:
+        return None
+    try:
+        snapshot = pickle.loads(data)
+    except Exception as e:
+        logger.warning("Снимок шаблонов %s не читается: %s", path, e)
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('format') != FORMAT_VERSION:
+        logger.warning("Снимок шаблонов %s другой версии, шаблоны будут разобраны заново", path)
+        return None
+    return snapshot
+
+
+def warm_start(template_paths, path=TEMPLATE_SNAPSHOT):
+    """
+    Загружает шаблоны в template_cache (из снимка, если он есть и совпадает с
+    шаблонами) и компилирует выражение судов. Возвращает отчет для журнала и бенчмарка:
+    {"seconds": ..., "snapshot": bool, "from_snapshot": [...], "compiled": [...]}
+    """
+    start = time.perf_counter()
+    snapshot = load_snapshot(path) or {}
+    courts.court_pattern()
+    template_cache.preload(template_paths, snapshot.get('templates'))
+
+    report = {
+        'seconds': time.perf_counter() - start,
+        'snapshot': bool(snapshot),
+        'from_snapshot': [],
+        'compiled': [],
+    }
+    for template_path in template_paths:
+        template = template_cache.get(template_path)
+        if template is not None:
+            report['from_snapshot' if template.from_snapshot else 'compiled'].append(template_path)
+
+    if snapshot and report['compiled']:
+        # Шаблон изменился после сборки снимка (например, смонтирован другой файл)
+        logger.warning("Снимок не совпадает с шаблонами, разобраны заново: %s", ", ".join(report['compiled']))
+    logger.info("Шаблоны загружены за %.0f мс: из снимка %d, разобрано %d",
+                report['seconds'] * 1000, len(report['from_snapshot']), len(report['compiled']))
+    return report
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Сборка снимка скомпилированных шаблонов")
+    parser.add_argument('templates', nargs='*', help="шаблоны (по умолчанию все шаблоны приложения)")
+    parser.add_argument('-o', '--output', default=TEMPLATE_SNAPSHOT, help=f"файл снимка (по умолчанию {TEMPLATE_SNAPSHOT})")
+    args = parser.parse_args(argv)
+
+    template_paths = args.templates
+    if not template_paths:
+        from app import DOCUMENT_TEMPLATES
+        template_paths = [path for path in DOCUMENT_TEMPLATES if os.path.exists(path)]
+
+    start = time.perf_counter()
+    size = build_snapshot(template_paths, args.output)
+    print(f"Снимок {args.output}: шаблонов {len(template_paths)}, {size / 1024:.0f} КБ, "
+          f"{(time.perf_counter() - start) * 1000:.0f} мс")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
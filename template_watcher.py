@@ -0,0 +1,95 @@
+"""
+Обновление шаблонов .docx без перезапуска
+
+Фоновый поток раз в TEMPLATE_WATCH_INTERVAL секунд сверяет загруженные шаблоны
+с файлами на диске (TemplateCache.reload): время изменения, inode и размер, а при
+их изменении — хэш содержимого. Измененный шаблон разбирается в этом потоке и
+подменяется в кэше целиком; запросы, которые уже взяли старую версию, доделывают
+документы по ней. Результаты, сгенерированные из старой версии, больше не выдаются:
+хэш шаблона входит в ключ кэша результатов (result_cache.document_cache_key).
+
+Поток есть в каждом процессе (после fork запускается заново), в том числе в главном
+процессе gunicorn: процессы, перезапущенные после WEB_MAX_REQUESTS, получают
+уже новую версию.
+
+Настройки окружения:
+  TEMPLATE_WATCH_INTERVAL — период проверки, секунды (0 — не следить)
+"""
+import logging
+import os
+import threading
+
+from metrics import Counter, registry
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_WATCH_INTERVAL = float(os.environ.get('TEMPLATE_WATCH_INTERVAL', '2'))
+
+TEMPLATE_RELOADS = registry.register(Counter(
+    'bankruptcy_template_reloads_total', 'Обновления шаблонов с диска (result: reloaded, failed)',
+    ('template', 'result')))
+
+
+class TemplateWatcher:
+    """
+    Следит за шаблонами TemplateCache в фоновом потоке
+    on_change(template_path, template) вызывается после подмены шаблона
+    """
+
+    def __init__(self, cache, interval=TEMPLATE_WATCH_INTERVAL, on_change=None):
+        self.cache = cache
+        self.interval = interval
+        self.on_change = on_change
+        self._thread = None
+        self._stop = threading.Event()
+        self._fork_hook = False
+
+    def check(self):
+        """Одна проверка всех загруженных шаблонов; возвращает пути обновленных"""
+        changed = []
+        for template_path in self.cache.paths():
+            try:
+                template = self.cache.reload(template_path)
+            except Exception as e:
+                # Например, файл еще дописывается: повтор после следующего изменения
+                TEMPLATE_RELOADS.inc(template=template_path, result='failed')
+                logger.warning("Шаблон %s изменен, но не разбирается, остается прежняя версия: %s",
+                               template_path, e, extra={'template': template_path})
+                continue
+            if template is None:
+                continue
+            TEMPLATE_RELOADS.inc(template=template_path, result='reloaded')
+            logger.info("Шаблон %s обновлен (sha256 %s)", template_path, template.digest[:12],
+                        extra={'template': template_path})
+            if self.on_change is not None:
+                self.on_change(template_path, template)
+            changed.append(template_path)
+        if changed:
+            registry.changed()
+        return changed
+
+    def start(self):
+        """Запускает поток (повторный вызов ничего не меняет)"""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        if not self._fork_hook:
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+            self._fork_hook = True
+        self._thread = threading.Thread(target=self._run, name='template-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _restart_after_fork(self):
+        # Потоки не переживают fork: в дочернем процессе — свой поток
+        if self._thread is not None and not self._stop.is_set():
+            self._thread = None
+            self.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Ошибка проверки шаблонов")
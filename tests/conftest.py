@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Шаблоны .docx открываются по путям относительно корня проекта; кэш результатов
+# выключен, чтобы каждый запрос действительно генерировал документы
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+os.environ.setdefault('RESULT_CACHE', '0')
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+
+@pytest.fixture
+def debtor_record():
+    """Должник с двумя кредиторами в JSON-виде /initial"""
+    return {
+        'surname': 'Иванов', 'name': 'Иван', 'patronymic': 'Иванович',
+        'surname_genitive': 'Иванова', 'name_genitive': 'Ивана', 'patronymic_genitive': 'Ивановича',
+        'surname_dative': 'Иванову', 'name_dative': 'Ивану', 'patronymic_dative': 'Ивановичу',
+        'birth_date': '02.01.1990', 'birth_place': 'г. Москва',
+        'passport_series': '4500', 'passport_number': '123456',
+        'passport_issued_by': 'ОВД Тверской', 'passport_issue_date': '2010-03-04',
+        'inn': '123456789012', 'snils': '123-456-789 00',
+        'region': 'Московская область', 'district': 'Одинцовский', 'city': 'Одинцово',
+        'street': 'ул. Ленина', 'house_number': '5', 'building_number': '2', 'apartment_number': '17',
+        'registered_address': 'Московская область, г. Одинцово, ул. Ленина, д. 5',
+        'debt_amount_digits': 500000, 'debt_amount_words': 'пятьсот тысяч',
+        'has_marriage': True, 'has_children': 'нет',
+        'creditors': [
+            {
+                'name': f'ПАО Банк {number}', 'address': f'г. Москва, ул. {number}',
+                'Содержание обязательства': 'Кредит', 'Основание': f'Договор {number}',
+                'Сумма обязательства': 100000, 'Задолженность': '90 000', 'Штрафы': '500',
+            }
+            for number in (1, 2)
+        ],
+    }
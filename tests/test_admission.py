@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionLimiter, Overloaded
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def start(limiter, order, name, bounded):
+    def run():
+        with limiter.acquire(1, bounded=bounded):
+            order.append(name)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_waiting_jobs_do_not_fill_the_request_queue():
+    limiter = AdmissionLimiter(capacity=1, queue_size=1, max_wait=5)
+    held = limiter.acquire(1)
+    order = []
+    jobs = [start(limiter, order, f'job{number}', bounded=False) for number in range(3)]
+    wait_until(lambda: len(limiter._job_waiters) == 3)
+
+    # Очередь запросов свободна: запрос не отклоняется и встает впереди задач
+    limiter.check()
+    request = start(limiter, order, 'request', bounded=True)
+    wait_until(lambda: len(limiter._waiters) == 1)
+    with pytest.raises(Overloaded):
+        limiter.acquire(1)
+
+    held.release()
+    for thread in jobs + [request]:
+        thread.join()
+    assert order == ['request', 'job0', 'job1', 'job2']
+
+
+def test_overdue_job_goes_before_requests():
+    limiter = AdmissionLimiter(capacity=1, queue_size=2, max_wait=0.5)
+    held = limiter.acquire(1)
+    order = []
+    job = start(limiter, order, 'job', bounded=False)
+    wait_until(lambda: len(limiter._job_waiters) == 1)
+    time.sleep(0.55)
+
+    request = start(limiter, order, 'request', bounded=True)
+    wait_until(lambda: len(limiter._waiters) == 1)
+    held.release()
+    job.join()
+    request.join()
+    assert order == ['job', 'request']
@@ -0,0 +1,68 @@
+import io
+import zipfile
+import zlib
+
+import pytest
+
+import archive
+from archive import parse_compression, stream_archive
+
+REPORT = ("Отчет о генерации документов\n" * 200).encode('utf-8')
+DOCUMENT = bytes(range(256)) * 64
+
+
+def deflated_size(data, level):
+    """Размер сжатых данных, как их пишет zipfile (deflate без заголовка zlib)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return len(compressor.compress(data) + compressor.flush())
+
+
+@pytest.mark.parametrize("level", [1, 9])
+def test_stream_archive_is_valid_zip_with_compression_policy(monkeypatch, level):
+    monkeypatch.setattr(archive, 'OTHER_COMPRESSION', (zipfile.ZIP_DEFLATED, level))
+    documents = [
+        ("Иванов/заявление.docx", DOCUMENT),
+        ("Иванов/опись.DOCX", memoryview(DOCUMENT)),
+        ("report.json", REPORT),
+    ]
+
+    chunks = list(stream_archive(documents))
+    assert chunks and all(type(chunk) is bytes for chunk in chunks)
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zip_file:
+        assert zip_file.testzip() is None
+        members = {info.filename: info for info in zip_file.infolist()}
+        assert list(members) == [filename for filename, _ in documents]
+        for filename in ("Иванов/заявление.docx", "Иванов/опись.DOCX"):
+            assert members[filename].compress_type == zipfile.ZIP_STORED
+            assert zip_file.read(filename) == DOCUMENT
+        report = members["report.json"]
+        assert report.compress_type == zipfile.ZIP_DEFLATED
+        assert report.compress_size == deflated_size(REPORT, level)
+        assert zip_file.read("report.json") == REPORT
+
+
+def test_stream_archive_matches_build_archive():
+    documents = [("a.docx", DOCUMENT), ("report.json", REPORT)]
+    streamed = zipfile.ZipFile(io.BytesIO(b"".join(stream_archive(documents))))
+    with archive.build_archive(documents) as built_file:
+        built = zipfile.ZipFile(io.BytesIO(built_file.read()))
+    assert [(info.filename, info.compress_type, info.CRC) for info in streamed.infolist()] == \
+        [(info.filename, info.compress_type, info.CRC) for info in built.infolist()]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("", (zipfile.ZIP_STORED, None)),
+    ("stored", (zipfile.ZIP_STORED, None)),
+    (" None ", (zipfile.ZIP_STORED, None)),
+    ("deflate", (zipfile.ZIP_DEFLATED, None)),
+    ("Deflate:9", (zipfile.ZIP_DEFLATED, 9)),
+])
+def test_parse_compression(value, expected):
+    assert parse_compression(value) == expected
+
+
+@pytest.mark.parametrize("value", ["gzip", "bzip2:5", "deflate:fast", "deflate:12", "deflate:-1"])
+def test_parse_compression_rejects_unknown_values(value):
+    with pytest.raises(ValueError):
+        parse_compression(value)
@@ -0,0 +1,41 @@
+import io
+import json
+import zipfile
+
+
+def document_parts(docx_bytes):
+    """Части документа Word (word/*.xml) — без свойств пакета"""
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as package:
+        return {name: package.read(name) for name in package.namelist() if name.startswith('word/')}
+
+
+def archive_documents(response):
+    assert response.status_code == 200, response.data[:500]
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+def test_batch_record_matches_initial_json(client, debtor_record):
+    single = archive_documents(client.post('/initial', json=debtor_record))
+    batch = archive_documents(client.post('/api/batch/initial', json={'debtors': [debtor_record]}))
+
+    report = json.loads(batch.pop('report.json'))
+    assert report['ok'] == 1, report
+    folder = report['records'][0]['folder']
+
+    assert sorted(single) == sorted(name.split('/', 1)[1] for name in batch)
+    for filename, docx_bytes in single.items():
+        assert document_parts(batch[f"{folder}/{filename}"]) == document_parts(docx_bytes), filename
+
+
+def test_batch_reports_schema_errors_per_record(client, debtor_record):
+    invalid = dict(debtor_record, inn=123456789012, birth_date='вчера')
+    batch = archive_documents(client.post('/api/batch/initial', json={'debtors': [invalid, debtor_record]}))
+
+    report = json.loads(batch['report.json'])
+    assert (report['ok'], report['failed']) == (1, 1)
+    failed, ok = report['records']
+    assert failed['status'] == 'error' and not failed['documents']
+    assert {error['field'] for error in failed['errors']} == {'inn', 'birth_date'}
+    assert ok['status'] == 'ok' and ok['documents']
+    assert not any(name.startswith(failed['folder'] + '/') for name in batch)
@@ -0,0 +1,78 @@
+import io
+import json
+import re
+import zipfile
+
+import pytest
+
+import app
+import courts
+from courts import RUSSIAN_REGIONS_COURTS, NO_COURT, resolve_court, resolve_many
+
+
+def resolve_by_priority_loop(address):
+    """Прежний алгоритм: re.search по регионам в порядке приоритета"""
+    for region_name in sorted(RUSSIAN_REGIONS_COURTS, key=courts._region_priority):
+        if re.search(RUSSIAN_REGIONS_COURTS[region_name]["pattern"], address.strip(), re.IGNORECASE):
+            return region_name
+    return ""
+
+
+ADDRESSES = [
+    "г. Москва, ул. Тверская, д. 1",
+    "Московская область, г. Одинцово, ул. Ленина, д. 5",
+    "Москва, Московская область",
+    "Санкт-Петербург, Невский пр., д. 10",
+    "Ленинградская область, г. Гатчина",
+    "г. Санкт-Петербург, Ленинградское ш.",
+    "Республика Алтай, г. Горно-Алтайск",
+    "Алтайский край, г. Барнаул",
+    "г. Севастополь, ул. Ленина",
+    "Республика Крым, г. Симферополь",
+    "ХМАО, г. Сургут",
+    "Тюменская область, Ямало-Ненецкий автономный округ",
+    "Адрес без региона",
+] + list(RUSSIAN_REGIONS_COURTS)
+
+
+@pytest.mark.parametrize("address", ADDRESSES)
+def test_alternation_matches_priority_loop(address):
+    assert resolve_court(address).region == resolve_by_priority_loop(address)
+
+
+def test_region_over_federal_city():
+    assert resolve_court("Москва, Московская область").region == "Московская область"
+    assert resolve_court("г. Москва").region == "Москва"
+
+
+def test_resolve_many_keeps_order_and_parses_repeats_once(monkeypatch):
+    calls = []
+
+    def counting_resolve(address):
+        calls.append(address)
+        return resolve_court(address)
+
+    monkeypatch.setattr(courts, 'resolve_court', counting_resolve)
+    addresses = ["г. Москва", "Алтайский край", "", "г. Москва", "Алтайский край"]
+    result = resolve_many(addresses)
+
+    assert [court.region for court in result] == ["Москва", "Алтайский край", "", "Москва", "Алтайский край"]
+    assert result[2] == NO_COURT
+    assert calls == ["г. Москва", "Алтайский край", ""]
+
+
+def test_batch_resolves_courts_in_one_call(client, monkeypatch, debtor_record):
+    calls = []
+
+    def recording_resolve_many(addresses):
+        calls.append(list(addresses))
+        return resolve_many(addresses)
+
+    monkeypatch.setattr(app, 'resolve_many', recording_resolve_many)
+    monkeypatch.setattr(app, 'resolve_court', None)  # одиночное определение в пакете не используется
+    moscow = dict(debtor_record, registered_address='г. Москва, ул. Тверская, д. 1')
+    response = client.post('/api/batch/initial', json={'debtors': [debtor_record, moscow, {'inn': 'x'}]})
+    report = json.loads(zipfile.ZipFile(io.BytesIO(response.data)).read('report.json'))
+    assert (report['ok'], report['failed']) == (2, 1)
+
+    assert calls == [[debtor_record['registered_address'], moscow['registered_address']]]
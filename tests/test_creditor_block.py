@@ -0,0 +1,81 @@
+import copy
+
+import pytest
+from docx import Document
+from docx.table import _Cell
+
+import app
+from creditor_block import CreditorBlock
+
+TEMPLATE = 'zayav.docx'
+
+
+def creditors(count):
+    return [
+        {'name': f'ПАО Банк {number}', 'address': f'123456, г. Москва, ул. {number}, д. 1'}
+        for number in range(1, count + 1)
+    ]
+
+
+def header_cell(document, block):
+    tc = document.element
+    for child_index in block.path:
+        tc = tc[child_index]
+    return _Cell(tc, None)
+
+
+def add_creditors_as_before(cell, creditors):
+    """Прежний add_additional_creditors_to_text: параграфы через python-docx, текст жирным"""
+    for creditor_num, creditor in enumerate(creditors[1:], start=2):
+        cell.add_paragraph()
+        for text in (f"Кредитор {creditor_num}", creditor['name'], creditor['address']):
+            cell.add_paragraph().add_run(text).bold = True
+
+
+def cell_content(cell):
+    """Текст параграфов ячейки и жирность каждого run"""
+    return [(paragraph.text, [run.bold for run in paragraph.runs]) for paragraph in cell.paragraphs]
+
+
+@pytest.mark.parametrize('count', [1, 2, 5])
+def test_block_matches_previous_output(count):
+    document = Document(TEMPLATE)
+    block = CreditorBlock.find(document)
+    assert block is not None
+    expected_document = copy.deepcopy(document)
+    add_creditors_as_before(header_cell(expected_document, block), creditors(count))
+
+    app.add_additional_creditors_to_text(document, creditors(count), block)
+    content = cell_content(header_cell(document, block))
+    expected = cell_content(header_cell(expected_document, block))
+
+    # Шапка шаблона жирная: run блока получает жирность из скопированного rPr
+    assert content == expected
+
+def test_block_copies_anchor_run_properties_as_is():
+    document = Document(TEMPLATE)
+    cell = header_cell(document, CreditorBlock.find(document))
+    anchor = next(paragraph for paragraph in cell.paragraphs if "Кредитор n" in paragraph.text)
+    for run in anchor.runs:
+        run.bold = None
+        run.italic = True
+
+    block = CreditorBlock.find(document)
+    block.insert(document.element, creditors(2))
+    added = cell.paragraphs[-3:]
+    assert [paragraph.text for paragraph in added] == [
+        "Кредитор 2", "ПАО Банк 2", "123456, г. Москва, ул. 2, д. 1",
+    ]
+    for paragraph in added:
+        assert [(run.bold, run.italic) for run in paragraph.runs] == [(None, True)]
+
+
+def test_block_survives_state_round_trip():
+    document = Document(TEMPLATE)
+    block = CreditorBlock.find(document)
+    restored = CreditorBlock.from_state(block.state())
+
+    expected_document = copy.deepcopy(document)
+    block.insert(expected_document.element, creditors(3))
+    restored.insert(document.element, creditors(3))
+    assert cell_content(header_cell(document, block)) == cell_content(header_cell(expected_document, block))
@@ -0,0 +1,78 @@
+import pytest
+from docx import Document
+from lxml import etree
+
+import app
+
+TEMPLATE = 'list-of-creditors.docx'
+
+
+def creditor(number):
+    return {
+        'Содержание обязательства': f'Кредит {number}', 'Кредитор': f'ПАО Банк {number}',
+        'Место нахождения': f'г. Москва, ул. {number}', 'Основание': f'Договор {number}',
+        'Сумма обязательства': f'{number}000', 'Задолженность': '900', 'Штрафы': '5',
+    }
+
+
+def creditors_table(document):
+    table = document.tables[1]
+    assert table.cell(0, 0).text.startswith('I. Сведения о кредиторах')
+    return table._tbl
+
+
+def row_texts(tbl):
+    return [[app._cell_text(tc) for tc in app._row_grid(tr)] for tr in tbl.tr_lst]
+
+
+def cell_formatting(tc):
+    """Свойства ячейки, первого параграфа и первого run — то, что должен сохранить клон"""
+    paragraph = tc.p_lst[0]
+    run = paragraph.r_lst[0] if paragraph.r_lst else None
+    return tuple(
+        etree.tostring(element) if element is not None else None
+        for element in (tc.tcPr, paragraph.pPr, run.rPr if run is not None else None)
+    )
+
+
+@pytest.mark.parametrize('count', [0, 1, 2, 5, 30])
+def test_rows_are_filled_in_order_before_section_2(count):
+    document = Document(TEMPLATE)
+    tbl = creditors_table(document)
+    template_rows = row_texts(tbl)
+    anchor = next(i for i, row in enumerate(template_rows) if row[0] == '2')
+    first = next(i for i, row in enumerate(template_rows) if row[0] == '1.1')
+
+    creditors = [creditor(number) for number in range(1, count + 1)]
+    app.add_creditors_rows_improved(document, creditors)
+    rows = row_texts(tbl)
+
+    # Шаблонная строка 1.1 заменена (или удалена при 0 кредиторов), остальные строки на месте
+    assert len(rows) == len(template_rows) - 1 + count
+    assert rows[:first] == template_rows[:first]
+    assert rows[first + count:] == template_rows[anchor:]
+    assert rows[first + count][0] == '2' and 'Обязательные платежи' in rows[first + count][1]
+
+    for number, row in enumerate(rows[first:first + count], 1):
+        assert row == [
+            f'1.{number}', f'Кредит {number}', f'ПАО Банк {number}', f'г. Москва, ул. {number}',
+            f'Договор {number}', f'{number} 000,00', '900,00', '5,00',
+        ]
+
+
+def test_new_rows_keep_template_row_formatting():
+    template_tbl = creditors_table(Document(TEMPLATE))
+    template_row = next(tr for tr in template_tbl.tr_lst if app._cell_text(tr.tc_lst[0]) == '1.1')
+    expected = [cell_formatting(tc) for tc in template_row.tc_lst]
+
+    document = Document(TEMPLATE)
+    tbl = creditors_table(document)
+    app.add_creditors_rows_improved(document, [creditor(number) for number in range(1, 4)])
+    rows = [tr for tr in tbl.tr_lst if app._cell_text(tr.tc_lst[0]).startswith('1.')]
+
+    assert len(rows) == 3
+    filled = [cell_formatting(tc) for tc in rows[0].tc_lst]
+    assert filled == expected
+    for tr in rows[1:]:
+        assert etree.tostring(tr.trPr) == etree.tostring(rows[0].trPr)
+        assert [cell_formatting(tc) for tc in tr.tc_lst] == filled
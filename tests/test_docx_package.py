@@ -0,0 +1,67 @@
+import io
+import zipfile
+from datetime import datetime
+
+import pytest
+from docx import Document
+
+import app
+from docx_package import _write_central_directory
+from payload import Errors
+
+
+@pytest.fixture
+def replacements(debtor_record):
+    """Замены для шаблонов обоих наборов документов"""
+    errors = Errors()
+    debtor, creditors = app.read_initial_json(debtor_record, errors)
+    assert not errors.total
+    debtor.update(total_debt='270000', case_number='А41-1/2025', judge_name='Петрова Анна Сергеевна')
+    current_date = datetime(2025, 3, 4)
+    values = app.build_initial_replacements(debtor, creditors, current_date)
+    values.update(app.build_case_replacements(debtor, current_date))
+    return values, creditors
+
+
+def render(monkeypatch, backend, template_path, replacements, creditors):
+    monkeypatch.setattr(app, 'RENDER_BACKEND', backend)
+    return app.process_document_in_memory(template_path, replacements, creditors).getvalue()
+
+
+def paragraph_texts(docx_bytes):
+    document = Document(io.BytesIO(docx_bytes))
+    texts = [paragraph.text for paragraph in document.paragraphs]
+    for table in document.tables:
+        texts += [cell.text for row in table.rows for cell in row.cells]
+    for section in document.sections:
+        texts += [paragraph.text for paragraph in section.header.paragraphs]
+        texts += [paragraph.text for paragraph in section.footer.paragraphs]
+    return texts
+
+
+@pytest.mark.parametrize('template_path', app.DOCUMENT_TEMPLATES)
+def test_package_writer_matches_python_docx(monkeypatch, replacements, template_path):
+    values, creditors = replacements
+    reference = render(monkeypatch, 'docx', template_path, values, creditors)
+    patched = render(monkeypatch, 'package', template_path, values, creditors)
+
+    with zipfile.ZipFile(io.BytesIO(patched)) as patched_zip, \
+            zipfile.ZipFile(io.BytesIO(reference)) as reference_zip:
+        assert patched_zip.testzip() is None
+        template = app.template_cache.get(template_path)
+        rewritten = {partname.lstrip('/') for partname in template.package.patchable}
+        with zipfile.ZipFile(io.BytesIO(template.blob)) as source:
+            assert patched_zip.namelist() == source.namelist()
+            for name in source.namelist():
+                # Переписанные части — как у python-docx, остальные — из шаблона байт в байт
+                expected = reference_zip.read(name) if name in rewritten else source.read(name)
+                assert patched_zip.read(name) == expected, name
+
+    assert paragraph_texts(patched) == paragraph_texts(reference)
+
+
+def test_central_directory_refuses_zip64():
+    entry = zipfile.ZipInfo('word/document.xml')
+    entry.header_offset = zipfile.ZIP64_LIMIT + 1
+    with pytest.raises(zipfile.LargeZipFile):
+        _write_central_directory(io.BytesIO(), [entry])
@@ -0,0 +1,63 @@
+import io
+import json
+import os
+import time
+
+import jobs
+from jobs import DONE, FAILED, RUNNING, Job, JobQueue
+
+
+def save_job(queue, job, age=0):
+    """Файл состояния задачи, измененный age секунд назад"""
+    path = queue._path(job.id, '.json')
+    with open(path, 'w') as meta_file:
+        json.dump(job.to_dict(), meta_file)
+    modified = time.time() - age
+    os.utime(path, (modified, modified))
+    return job
+
+
+def make_job(queue, status, created_at, finished_at=None, age=0):
+    job = Job(f"{len(os.listdir(queue.directory)):032x}", 'documents.zip')
+    job.status, job.created_at, job.finished_at = status, created_at, finished_at
+    return save_job(queue, job, age)
+
+
+def test_poll_does_not_scan_job_directory(tmp_path, monkeypatch):
+    queue = JobQueue(directory=str(tmp_path))
+    job = queue.submit('documents.zip', lambda: io.BytesIO(b'zip'))
+    queue.shutdown()
+
+    def no_scan(path):
+        raise AssertionError('опрос задачи обходит каталог')
+
+    monkeypatch.setattr(jobs.os, 'scandir', no_scan)
+    assert queue.get(job.id).status == DONE
+
+
+def test_job_left_running_by_dead_process_fails(tmp_path):
+    queue = JobQueue(directory=str(tmp_path), max_runtime=60)
+    stale = make_job(queue, RUNNING, created_at=time.time() - 120, age=120)
+    fresh = make_job(queue, RUNNING, created_at=time.time())
+
+    job = queue.get(stale.id)
+    assert job.status == FAILED and job.error
+    assert queue.get(fresh.id).status == RUNNING
+
+
+def test_janitor_expires_stale_and_old_jobs(tmp_path):
+    queue = JobQueue(directory=str(tmp_path), result_ttl=60, max_runtime=60)
+    old = time.time() - 120
+    stale = make_job(queue, RUNNING, created_at=old, age=120)
+    finished = make_job(queue, DONE, created_at=old, finished_at=old, age=120)
+
+    queue._purge_expired()
+    marked = queue._load_file(queue._path(stale.id, '.json'))
+    assert marked.status == FAILED
+    assert not os.path.exists(queue._path(finished.id, '.json'))
+
+    # Отмеченная задача удаляется через result_ttl после отметки
+    marked.finished_at = old
+    save_job(queue, marked, age=120)
+    queue._purge_expired()
+    assert os.listdir(tmp_path) == []
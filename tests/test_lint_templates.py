@@ -0,0 +1,59 @@
+import re
+
+import app
+import lint_templates
+
+
+def run_lint(capsys, *argv):
+    code = lint_templates.main(list(argv))
+    return code, capsys.readouterr().out
+
+
+def summary(output):
+    errors, warnings = re.search(r"Ошибок: (\d+), предупреждений: (\d+)", output).groups()
+    return int(errors), int(warnings)
+
+
+def test_bundled_templates_have_no_missing_placeholders(capsys):
+    code, output = run_lint(capsys)
+    assert code == 0
+
+    for template_path, _, title, _ in app.INITIAL_DOCUMENTS + app.CASE_DOCUMENTS:
+        assert f"\n{template_path} ({title}, " in output
+    assert "❌" not in output
+    assert "  ⚠️ split: {Кредитор n}" in output
+    assert "/initial: ключи замен, которых нет ни в одном шаблоне" in output
+    assert "/with-case: ключи замен, которых нет ни в одном шаблоне" in output
+    assert "  ⚠️ unused: '{судья}'" in output
+
+    # Итог совпадает с числом строк отчета
+    assert summary(output) == (0, output.count("  ⚠️ "))
+
+
+def test_strict_fails_on_warnings(capsys):
+    code, output = run_lint(capsys, "--strict")
+    assert code == 1
+    assert summary(output)[1] > 0
+
+
+def test_selected_template_skips_unused_keys(capsys):
+    code, output = run_lint(capsys, "--strict", "properties.docx")
+    assert "properties.docx (опись имущества, /initial)" in output
+    assert "zayav.docx" not in output and "unused" not in output
+    assert code == 1  # в шаблоне есть разорванные плейсхолдеры
+
+
+def test_missing_placeholder_is_an_error(capsys, monkeypatch):
+    document_sets = lint_templates.document_sets
+
+    def without_court(creditors_count):
+        sets = document_sets(creditors_count)
+        for _, _, replacements in sets:
+            replacements.pop("{Суд}", None)
+        return sets
+
+    monkeypatch.setattr(lint_templates, "document_sets", without_court)
+    code, output = run_lint(capsys, "zayav.docx")
+    assert code == 1
+    assert "  ❌ missing: {Суд}" in output
+    assert summary(output)[0] == output.count("  ❌ missing: ")
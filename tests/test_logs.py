@@ -0,0 +1,68 @@
+import io
+import logging
+import queue
+
+import logs
+from jobs import JobQueue
+from logs import LOG_DROPPED, DroppingQueueHandler, RequestIdFilter, request_id
+
+
+def dropped():
+    return LOG_DROPPED.snapshot().get('[]', 0)
+
+
+def test_request_id_header_is_echoed(client):
+    response = client.get('/', headers={'X-Request-ID': 'proxy-42abc'})
+    assert response.headers['X-Request-ID'] == 'proxy-42abc'
+
+
+def test_unsafe_request_id_is_replaced(client):
+    for value in ('нет', 'a b', 'x' * 65):
+        generated = client.get('/', headers={'X-Request-ID': value}).headers['X-Request-ID']
+        assert generated != value and len(generated) == 16
+    assert len(client.get('/').headers['X-Request-ID']) == 16
+
+
+def test_job_keeps_request_id():
+    jobs_queue = JobQueue(workers=1)
+    seen = []
+
+    def build():
+        seen.append(request_id.get())
+        return io.BytesIO(b'zip')
+
+    token = request_id.set('job-origin-1')
+    try:
+        jobs_queue.submit('documents.zip', build)
+    finally:
+        request_id.reset(token)
+    jobs_queue.shutdown()
+    assert seen == ['job-origin-1']
+
+
+def test_full_queue_drops_records_and_counts_them():
+    handler = DroppingQueueHandler(queue.Queue(1))
+    handler.addFilter(RequestIdFilter())
+    logger = logging.getLogger('tests.logs.dropping')
+    logger.propagate = False
+    logger.addHandler(handler)
+    before = dropped()
+    token = request_id.set('req-1')
+    try:
+        logger.warning("первая")
+        logger.warning("вторая")
+        logger.warning("третья")
+    finally:
+        request_id.reset(token)
+        logger.removeHandler(handler)
+
+    assert dropped() - before == 2
+    record = handler.queue.get_nowait()
+    assert record.getMessage() == "первая"
+    assert record.request_id == 'req-1'
+
+
+def test_queue_handler_is_shared_with_application_logging():
+    handler = logs.queue_handler()
+    assert handler is logs.queue_handler()
+    assert handler in logging.getLogger().handlers
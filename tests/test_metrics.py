@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from metrics import Counter, Gauge, Registry
+
+
+def make_registry(directory):
+    registry = Registry(str(directory), flush_interval=0.05)
+    counter = registry.register(Counter('test_total', 'Счетчик', ('route',)))
+    gauge = registry.register(Gauge('test_in_flight', 'Значение'))
+    return registry, counter, gauge
+
+
+def snapshots(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+
+
+def test_changed_writes_snapshot_in_background(tmp_path):
+    registry, counter, _ = make_registry(tmp_path)
+    counter.inc(route='/initial')
+    registry.changed()
+    # Запись не в вызывающем потоке: файла еще нет
+    assert snapshots(tmp_path) == []
+    for _ in range(100):
+        if snapshots(tmp_path):
+            break
+        time.sleep(0.01)
+    assert snapshots(tmp_path) == [os.path.basename(registry._snapshot_path())]
+
+
+def test_dead_process_snapshots_are_folded(tmp_path):
+    registry, counter, gauge = make_registry(tmp_path)
+    counter.inc(route='/initial')
+    gauge.set(3)
+
+    # Снимок процесса, который уже завершился (перезапущенный процесс gunicorn)
+    dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    dead.wait()
+    dead_snapshot = {'test_total': {json.dumps(['/initial']): 5}, 'test_in_flight': {json.dumps([]): 7}}
+    (tmp_path / f"{dead.pid}-deadbeef.json").write_text(json.dumps(dead_snapshot))
+
+    for _ in range(2):
+        text = registry.render()
+        assert 'test_total{route="/initial"} 6' in text
+        assert 'test_in_flight 3' in text
+    assert f"{dead.pid}-deadbeef.json" not in snapshots(tmp_path)
+    assert Registry.DEAD_SNAPSHOT in snapshots(tmp_path)
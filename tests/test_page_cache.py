@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+import app
+from page_cache import page_cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_pages():
+    page_cache.clear()
+    yield
+    page_cache.clear()
+
+
+def test_page_has_etag_and_vary(client):
+    response = client.get('/', headers={'Accept-Encoding': 'identity'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.vary
+    assert response.headers['Cache-Control'] == 'no-cache'
+    etag, weak = response.get_etag()
+    assert etag and not weak
+
+    repeat = client.get('/', headers={'Accept-Encoding': 'identity', 'If-None-Match': f'"{etag}"'})
+    assert repeat.status_code == 304
+    assert repeat.data == b''
+    assert 'Accept-Encoding' in repeat.vary
+
+
+def test_compressed_variant_has_own_etag(client):
+    plain = client.get('/initial', headers={'Accept-Encoding': 'identity'})
+    gzipped = client.get('/initial', headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzipped.get_etag()[0] != plain.get_etag()[0]
+
+    # ETag несжатого варианта не подходит к сжатому: тело отдается заново
+    headers = {'Accept-Encoding': 'gzip', 'If-None-Match': f'"{plain.get_etag()[0]}"'}
+    repeat = client.get('/initial', headers=headers)
+    assert repeat.status_code == 200
+
+
+def test_page_with_flash_messages_is_not_cached(client):
+    with client.session_transaction() as session:
+        session['_flashes'] = [('error', 'Проверьте данные формы')]
+    response = client.get('/initial')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-store'
+    assert response.get_etag() == (None, None)
+    assert 'Проверьте данные формы' in response.get_data(as_text=True)
+    assert not page_cache._pages
+
+
+def test_changed_template_is_rendered_again(client):
+    first = client.get('/with-case', headers={'Accept-Encoding': 'identity'}).get_etag()[0]
+    template = page_cache._pages['with_case.html'].template
+
+    path = os.path.join(app.app.root_path, app.app.template_folder, 'with_case.html')
+    stat = os.stat(path)
+    try:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert not template.is_up_to_date
+        client.get('/with-case', headers={'Accept-Encoding': 'identity'})
+        reloaded = page_cache._pages['with_case.html'].template
+        assert reloaded is not template and reloaded.is_up_to_date
+    finally:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    # Содержимое не менялось — ETag тот же
+    assert client.get('/with-case', headers={'Accept-Encoding': 'identity'}).get_etag()[0] == first
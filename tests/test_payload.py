@@ -0,0 +1,47 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from payload import Errors, read_debtor
+
+CASE_RECORD = {
+    'surname': 'Иванов', 'name': 'Иван', 'patronymic': 'Иванович',
+    'inn': '123456789012', 'snils': '123-456-789 00',
+    'registered_address': 'г. Москва, ул. Ленина, д. 5',
+    'total_debt': '270000', 'case_number': 'А41-1/2025', 'judge_name': 'Петрова Анна Сергеевна',
+}
+
+
+@pytest.mark.parametrize('value, expected', [
+    (True, 'yes'), (False, 'no'), ('да', 'yes'), ('No', 'no'), (None, ''),
+])
+def test_flag_normalization(value, expected):
+    errors = Errors()
+    assert read_debtor({'has_marriage': value}, ('has_marriage',), (), errors) == {'has_marriage': expected}
+    assert not errors.total
+
+
+def schema_errors(client, route, record):
+    """Поля с ошибками схемы в ответе JSON-входа (у пакета — из report.json)"""
+    if route == '/api/batch/initial':
+        response = client.post(route, json={'debtors': [record]})
+        assert response.status_code == 200
+        with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+            report = json.loads(archive.read('report.json'))
+        return {error['field'] for error in report['records'][0]['errors']}
+    response = client.post(route, json=record)
+    assert response.status_code == 400, response.data[:500]
+    return {error['field'] for error in response.get_json()['errors']}
+
+
+@pytest.mark.parametrize('route', ['/initial', '/api/batch/initial', '/with-case'])
+def test_every_json_entry_point_applies_schema(client, debtor_record, route):
+    record = debtor_record if route != '/with-case' else dict(CASE_RECORD)
+    # ИНН числом теряет ведущий ноль; дата и флаг — не из допустимых значений
+    record = dict(record, inn=23456789012)
+    if route != '/with-case':
+        record.update(birth_date='31.02.1990', has_children='возможно')
+    expected = {'inn'} if route == '/with-case' else {'inn', 'birth_date', 'has_children'}
+    assert schema_errors(client, route, record) == expected
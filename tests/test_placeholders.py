@@ -0,0 +1,135 @@
+from docx import Document
+from docx.shared import Pt
+from lxml import etree
+
+from placeholders import PlaceholderIndex, Replacer, compile_replacements, replace_in_runs_preserve_formatting
+
+
+def test_longest_key_wins():
+    replacer = Replacer({"{Фамилия}": "короткий", "{Фамилия} ": "длинный"})
+    assert replacer.sub("{Фамилия} Иван") == "длинныйИван"
+    assert replacer.sub("{Фамилия}.") == "короткий."
+
+    replacer = Replacer({"{dd}": "04", "{dd}.{mm}.{yyyy} г.": "4 марта 2025 г."})
+    assert replacer.sub("Дата: {dd}.{mm}.{yyyy} г.") == "Дата: 4 марта 2025 г."
+    assert replacer.sub("{dd}.{mm}") == "04.{mm}"
+
+
+def test_result_does_not_depend_on_key_order():
+    items = [
+        ("{Фамилия}", "Иванов"),
+        ("{Фамилия} ", "Иванов_"),
+        ("{Имя}", "{Фамилия}"),  # значение не заменяется повторно
+        ("Кредитор 1", "ПАО Банк"),
+        ("{dd}", "04"),
+    ]
+    text = "{Имя} {Фамилия} {Фамилия}, Кредитор 1, {dd}"
+    forward = Replacer(dict(items)).sub(text)
+    backward = Replacer(dict(reversed(items))).sub(text)
+    assert forward == backward == "{Фамилия} Иванов_Иванов, ПАО Банк, 04"
+
+
+def test_text_without_brace_is_skipped():
+    replacer = Replacer({"{Фамилия}": "Иванов"})
+    assert replacer.requires_brace
+    assert not replacer.might_match("Фамилия без скобок")
+    text = "Фамилия без скобок"
+    assert replacer.sub(text) is text
+
+
+def test_keys_without_brace_still_match():
+    replacer = Replacer({"{Фамилия}": "Иванов", "Кредитор 1": "ПАО Банк"})
+    assert not replacer.requires_brace
+    assert replacer.sub("Кредитор 1 — без скобок") == "ПАО Банк — без скобок"
+
+
+def test_empty_keys_and_replacements():
+    replacer = Replacer({"": "пусто", "{a}": "1"})
+    assert replacer.sub("{a}") == "1"
+    assert Replacer({}).sub("{a}") == "{a}"
+
+
+def test_compile_replacements_reuses_replacer():
+    replacer = Replacer({"{a}": "1"})
+    assert compile_replacements(replacer) is replacer
+    assert compile_replacements({"{a}": "1"}).sub("{a}") == "1"
+
+
+def test_index_selects_paragraphs_with_matches():
+    document = Document()
+    document.add_paragraph("Должник: {Фамилия}")
+    document.add_paragraph("Без плейсхолдеров")
+    paragraph = document.add_paragraph("{Фами")
+    paragraph.add_run("лия} и {Имя}")
+    index = PlaceholderIndex(document)
+
+    assert index.placeholders == ("{Имя}", "{Фамилия}")
+    assert index.split == ("{Фамилия}",)
+    assert index.prune({"{Фамилия}": "Иванов", "{Отчество}": "Иванович"}) == {"{Фамилия}": "Иванов"}
+
+    replacer = Replacer({"{Фамилия}": "Иванов"})
+    assert [slot.text for slot in index.slots_for(replacer)] == ["Должник: {Фамилия}", "{Фамилия} и {Имя}"]
+    assert index.dependencies(Replacer({"{Фамилия}": "Иванов", "{Отчество}": "-"})) == ("{Фамилия}",)
+
+
+def paragraph_with_runs(*texts):
+    """Параграф из runs с разным форматированием: у run i размер шрифта 10 + i пт"""
+    paragraph = Document().add_paragraph()
+    for number, text in enumerate(texts):
+        run = paragraph.add_run(text)
+        run.font.size = Pt(10 + number)
+        run.bold = number % 2 == 0
+    return paragraph
+
+
+def run_state(paragraph):
+    return [(run.text, etree.tostring(run._r.rPr)) for run in paragraph.runs]
+
+
+def test_placeholder_split_across_two_runs():
+    paragraph = paragraph_with_runs("Должник {Фам", "илия} подал", " заявление")
+    before = run_state(paragraph)
+    replace_in_runs_preserve_formatting(paragraph, {"{Фамилия}": "Иванов"})
+    after = run_state(paragraph)
+
+    assert [text for text, _ in after] == ["Должник Иванов", " подал", " заявление"]
+    assert [rpr for _, rpr in after] == [rpr for _, rpr in before]
+
+
+def test_placeholder_split_across_three_runs_with_empty_runs():
+    paragraph = paragraph_with_runs("{Фа", "", "ми", "", "лия}!", " {Имя}")
+    before = run_state(paragraph)
+    replace_in_runs_preserve_formatting(paragraph, {"{Фамилия}": "Иванов", "{Имя}": "Иван"})
+    after = run_state(paragraph)
+
+    assert [text for text, _ in after] == ["Иванов", "", "", "", "!", " Иван"]
+    assert [rpr for _, rpr in after] == [rpr for _, rpr in before]
+
+
+def test_two_placeholders_in_one_run():
+    paragraph = paragraph_with_runs("Кредитор: ", "{Кредитор} ({ИНН})", ".")
+    before = run_state(paragraph)
+    replace_in_runs_preserve_formatting(paragraph, {"{Кредитор}": "ПАО Банк", "{ИНН}": "7700"})
+    after = run_state(paragraph)
+
+    assert [text for text, _ in after] == ["Кредитор: ", "ПАО Банк (7700)", "."]
+    # Runs без совпадений не переписываются
+    assert after[0] == before[0] and after[2] == before[2]
+    assert after[1][1] == before[1][1]
+
+
+def test_value_with_line_break_and_tab():
+    paragraph = paragraph_with_runs("Адрес: {Адрес}")
+    replace_in_runs_preserve_formatting(paragraph, {"{Адрес}": "г. Москва\nул. Ленина\tд. 5"})
+
+    run = paragraph.runs[0]
+    assert run.text == "Адрес: г. Москва\nул. Ленина\tд. 5"
+    assert len(run._r.xpath("w:br")) == 1
+    assert len(run._r.xpath("w:tab")) == 1
+
+
+def test_paragraph_without_matches_is_untouched():
+    paragraph = paragraph_with_runs("{Фамилия", "} без", " замены")
+    before = etree.tostring(paragraph._p)
+    replace_in_runs_preserve_formatting(paragraph, {"{Имя}": "Иван"})
+    assert etree.tostring(paragraph._p) == before
@@ -0,0 +1,58 @@
+import os
+import threading
+
+from werkzeug.serving import make_server
+
+from cache_server import create_cache_server
+from result_cache import TOKEN_HEADER, DiskCache, RemoteCache
+
+
+def directory_size(directory):
+    return sum(entry.stat().st_size for entry in os.scandir(directory))
+
+
+def wait_for_scan(cache):
+    if cache._scan_thread is not None:
+        cache._scan_thread.join()
+
+
+def test_overwriting_a_key_is_counted_once(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    cache.set('a' * 64, b'x' * 300)
+    for _ in range(10):
+        cache.set('b' * 64, b'y' * 300)
+    wait_for_scan(cache)
+    assert cache._usage == 600
+    assert cache.get('a' * 64) == b'x' * 300
+
+
+def test_limit_is_shared_by_processes_using_one_directory(tmp_path):
+    # Два процесса gunicorn с общим каталогом: каждый видит и чужие записи
+    workers = [DiskCache(str(tmp_path), max_bytes=1000, scan_interval=0) for _ in range(2)]
+    for number in range(20):
+        worker = workers[number % 2]
+        worker.set(f"{number:064x}", b'z' * 100)
+        wait_for_scan(worker)
+        assert directory_size(tmp_path) <= 1000
+    assert workers[0].get(f"{19:064x}") == b'z' * 100
+
+
+def test_cache_server_requires_token(tmp_path):
+    key = 'c' * 64
+    client = create_cache_server(DiskCache(str(tmp_path), max_bytes=1000), 'secret').test_client()
+    assert client.put(f'/{key}', data=b'poisoned').status_code == 401
+    assert client.put(f'/{key}', data=b'poisoned', headers={TOKEN_HEADER: 'other'}).status_code == 401
+    assert client.get(f'/{key}', headers={TOKEN_HEADER: 'secret'}).status_code == 404
+
+
+def test_remote_cache_sends_token(tmp_path):
+    server = make_server('127.0.0.1', 0, create_cache_server(DiskCache(str(tmp_path), max_bytes=1000), 'secret'))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}"
+        RemoteCache(url, 'secret').set('d' * 64, b'document')
+        assert RemoteCache(url, 'secret').get('d' * 64) == b'document'
+        assert RemoteCache(url, 'other').get('d' * 64) is None
+    finally:
+        server.shutdown()
@@ -0,0 +1,40 @@
+from concurrent.futures import Future
+from datetime import datetime
+
+import pytest
+
+import app
+from result_cache import MemoryCache, TieredCache
+
+
+def test_pool_refuses_other_template_version():
+    app.template_cache.get('properties.docx')
+    with pytest.raises(app.TemplateVersionMismatch):
+        app.render_document_bytes('properties.docx', {}, None, digest='0' * 64)
+
+
+class MismatchedPool:
+    """Пул, в процессах которого другая версия шаблонов"""
+
+    def submit(self, func, *args):
+        future = Future()
+        future.set_exception(app.TemplateVersionMismatch(args[0]))
+        return future
+
+
+def test_mismatch_renders_requested_version_in_process(monkeypatch):
+    cache = TieredCache([MemoryCache(64 * 1024 * 1024)])
+    monkeypatch.setattr(app, 'result_cache', cache)
+    monkeypatch.setattr(app, 'get_render_pool', MismatchedPool)
+    documents = [("properties.docx", "properties", "опись имущества", False)]
+    current_date = datetime(2025, 3, 4)
+
+    rendered = dict(app.iter_rendered_documents(documents, {}, None, 'Иванов', 'Иван', current_date))
+    assert len(rendered) == 1
+    document_bytes = bytes(next(iter(rendered.values())))
+
+    # В кэш попал документ версии запроса: повтор берет те же байты из кэша
+    monkeypatch.setattr(app, 'get_render_pool', lambda: None)
+    cached = dict(app.iter_rendered_documents(documents, {}, None, 'Иванов', 'Иван', current_date))
+    assert cache.hits == 1
+    assert bytes(next(iter(cached.values()))) == document_bytes
@@ -0,0 +1,23 @@
+import courts
+import template_snapshot
+from app import DOCUMENT_TEMPLATES
+from template_cache import TemplateCache
+
+
+def test_snapshot_round_trip(tmp_path, monkeypatch):
+    path = str(tmp_path / 'templates.snapshot')
+    template_snapshot.build_snapshot(DOCUMENT_TEMPLATES, path)
+
+    # Чистые кэш шаблонов и выражение судов, как в новом процессе
+    cache = TemplateCache()
+    monkeypatch.setattr(template_snapshot, 'template_cache', cache)
+    monkeypatch.setattr(courts, '_court_pattern', None)
+    report = template_snapshot.warm_start(DOCUMENT_TEMPLATES, path)
+
+    assert report['snapshot'] and report['from_snapshot'] == DOCUMENT_TEMPLATES
+    assert courts._court_pattern is not None
+    for template_path in DOCUMENT_TEMPLATES:
+        template = cache.get(template_path)
+        assert template.from_snapshot and template.index is not None
+    court = courts.resolve_court('Московская обл., г. Одинцово, ул. Ленина, д. 5')
+    assert court.nominative == 'Арбитражный суд Московской области'
@@ -0,0 +1,42 @@
+"""
+Точка входа для production-сервера (gunicorn, см. gunicorn.conf.py)
+
+При preload_app модуль импортируется один раз в главном процессе: шаблоны
+разбираются и индексируются, регулярное выражение судов (courts.py) компилируется
+— все до fork, и рабочие процессы получают эти структуры через copy-on-write.
+Если при сборке образа создан снимок шаблонов (template_snapshot.py), индексы
+берутся из него вместо разбора. После старта за изменениями
+шаблонов на диске следит template_watcher.py.
+"""
+import time
+
+_started = time.perf_counter()
+
+import gc
+import logging
+
+from app import app, DOCUMENT_TEMPLATES, RENDER_BACKEND, template_watcher
+from template_cache import template_cache
+from template_snapshot import warm_start
+
+# Отчет о загрузке шаблонов (см. warm_start) — для журнала и бенчмарка coldstart
+startup = warm_start(DOCUMENT_TEMPLATES)
+
+if RENDER_BACKEND == 'docx':
+    # Бэкенд docx копирует эталонный документ python-docx — разбираем его до fork
+    for template_path in DOCUMENT_TEMPLATES:
+        template = template_cache.get(template_path)
+        if template is not None:
+            template.document
+
+# Все загруженные объекты — в постоянное поколение: сборщик мусора в рабочих
+# процессах их не обходит и не копирует ради этого общие страницы памяти
+gc.freeze()
+
+# Измененные на диске шаблоны подменяются без перезапуска (поток есть и в рабочих процессах)
+template_watcher.start()
+
+logging.getLogger(__name__).info("Приложение готово к работе за %.0f мс после запуска",
+                                 (time.perf_counter() - _started) * 1000)
+
+application = app